@@ -1,22 +1,136 @@
-from flask import Flask, request, jsonify, session, send_from_directory
+from flask import Flask, Request, request, jsonify, session, send_from_directory, g, stream_with_context
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+import click
+from werkzeug.security import safe_join
+from storage import UploadStore, UnsupportedUpload
+from images import ImagePipeline, VARIANTS, variant_path, variant_urls
+from events import EventBroker, TooManySubscribers
+from ingest import IMPORT_FORMATS, PhotoSource, PhotoUnavailable, detect_format, iter_rows
+from profiling import (ProfiledConnection, ProfiledJSONProvider, ProfileSampler, RequestProfile,
+                       activate, deactivate, span)
+from metrics import MetricsRegistry
+from passwords import HasherBusy, PasswordHasher
+from matching import DEFAULT_WEIGHTS, OpenTask, Volunteer, match_tasks
+from phash import BAND_BITS, BANDS, dhash, hamming, hash_bands
+from rollups import RollupAggregator, bucket_key, bucket_range, duration_bin, histogram_median
 import sqlite3
 import os
 import html
-from datetime import datetime
+import queue
+import bisect
+import time
+import math
+import re
+import json
+import base64
+import binascii
+import threading
+import hashlib
+import csv
+import io
+import zlib
+import hmac
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 
+class GreenTrackRequest(Request):
+    @property
+    def max_content_length(self):
+        # Bulk imports carry a photo archive; everything else keeps the 5MB cap
+        if self.endpoint == 'import_reports_route':
+            return app.config['IMPORT_MAX_BYTES']
+        return super().max_content_length
+
+
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
+app.request_class = GreenTrackRequest
 app.secret_key = os.environ.get('SECRET_KEY', 'green-track-secret-key-change-in-production')
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), '..', 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size
+app.config['DATABASE'] = os.environ.get('DATABASE_PATH', os.path.join(os.path.dirname(__file__), 'database.db'))
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+app.config['DB_BUSY_TIMEOUT_MS'] = 5000
+app.config['DB_CACHE_SIZE_KB'] = 20 * 1024  # page cache per connection
+app.config['DB_MMAP_SIZE'] = 256 * 1024 * 1024
+app.config['PAGE_SIZE_DEFAULT'] = 20
+app.config['PAGE_SIZE_MAX'] = 100  # hard cap so no request materializes a whole table
+app.config['NEAR_RADIUS_DEFAULT_KM'] = 5.0
+app.config['NEAR_RADIUS_MAX_KM'] = 100.0
+app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', 2))
+# Longest one /api/stats payload is reused; writes from any process invalidate it sooner via table_versions
+app.config['STATS_CACHE_TTL'] = float(os.environ.get('STATS_CACHE_TTL', 30))
+app.config['EVENTS_HEARTBEAT'] = 15  # seconds between keep-alive comments on /api/events
+app.config['EVENTS_REPLAY_SIZE'] = 500  # events kept for Last-Event-ID resume
+app.config['EVENTS_QUEUE_SIZE'] = 100  # per-stream backlog before the client is told to resync
+app.config['EVENTS_MAX_STREAMS'] = int(os.environ.get('EVENTS_MAX_STREAMS', 200))
+app.config['SYNC_PAGE_SIZE'] = 500  # change_log rows per /api/sync response
+app.config['BULK_MAX_ITEMS'] = 5000  # per /api/reports/bulk/* request
+# Bulk changes touching more reports than this push one reset to dashboards
+# instead of an event per report
+app.config['BULK_EVENT_LIMIT'] = 50
+app.config['IMPORT_MAX_BYTES'] = 512 * 1024 * 1024  # data file plus photo archive
+app.config['IMPORT_CHUNK_SIZE'] = 500  # rows per transaction
+# Off by default; when on, photos are fetched only from public addresses (see ingest.py)
+app.config['IMPORT_ALLOW_PHOTO_URLS'] = os.environ.get('IMPORT_ALLOW_PHOTO_URLS', '0') == '1'
+app.config['IMPORT_MAX_ERRORS'] = 100  # row errors listed in the summary
+app.config['EXPORT_FETCH_SIZE'] = 500  # rows held in memory at once while exporting
+app.config['HEATMAP_MAX_CELLS'] = 5000  # densest cells returned per /api/stats/heatmap response
+# Opt-in request profiling (see profiling.py); read once at startup
+app.config['PROFILING'] = os.environ.get('PROFILING') == '1'
+app.config['PROFILE_SLOW_MS'] = float(os.environ.get('PROFILE_SLOW_MS', 500))  # log requests slower than this
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # share of requests run under cProfile
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+app.config['PROFILE_MAX_STATEMENTS'] = 200  # statements kept per request for the slow log
+# Werkzeug method string; hashes made with other parameters are upgraded at the user's next login
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+# Hash jobs queued plus running; login/register answer 503 beyond this instead of tying up threads
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+app.config['PASSWORD_HASH_RETRY_AFTER'] = 2  # seconds
+# Off by default: on, every connection times its statements and /metrics answers (behind METRICS_TOKEN if set)
+app.config['METRICS'] = os.environ.get('METRICS', '0') == '1'
+# Directory shared by all worker processes so /metrics reports their sum; unset for a single process
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # if set, scrapes need "Authorization: Bearer <token>"
+# Automatic task matching (POST /api/tasks/match, flask match-tasks); see matching.py
+app.config['MATCH_MAX_DISTANCE_KM'] = 10.0  # volunteers farther away are never offered a task
+# Off: tasks and volunteers without a location are never matched automatically. On: they are
+# paired by load alone, as if MATCH_MAX_DISTANCE_KM apart, so any distance is possible
+app.config['MATCH_UNLOCATED'] = False
+app.config['MATCH_MAX_LOAD'] = 3  # assigned plus in-progress tasks per volunteer
+app.config['MATCH_CANDIDATES'] = 8  # nearest volunteers scored per task
+app.config['MATCH_AGE_HORIZON_DAYS'] = 14.0  # reports waiting this long get the full age bonus
+app.config['MATCH_WEIGHTS'] = dict(DEFAULT_WEIGHTS)  # distance, load, severity, age
+# Time-series rollups (GET /api/stats/timeseries); see rollups.py
+# Seconds between background folds of the event queue; 0 leaves it to `flask aggregate-stats`
+app.config['ROLLUP_INTERVAL'] = float(os.environ.get('ROLLUP_INTERVAL', 60))
+app.config['ROLLUP_BATCH_SIZE'] = 5000  # queued events folded per write transaction
+app.config['TIMESERIES_MAX_BUCKETS'] = 1000  # hours or days per /api/stats/timeseries response
+# Near-duplicate reports (see phash.py): a similar photo of a spot this close, filed this recently
+app.config['DUPLICATE_RADIUS_M'] = 50
+app.config['DUPLICATE_WINDOW_DAYS'] = 7
+# Differing hash bits still counted as the same photo; found exhaustively up to phash.BANDS - 1
+app.config['DUPLICATE_MAX_DISTANCE'] = 3
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 CORS(app, supports_credentials=True)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
+EARTH_RADIUS_KM = 6371.0088
+
+# Hotspot grid levels, named after the web-map zoom they suit: level z has cells
+# 360 / 2**(z + 2) degrees on a side (about 2.4 km at 12, 600 m at 14). Written
+# to hotspot_levels by migration 013; changing them needs a new migration.
+HOTSPOT_LEVELS = (10, 12, 14, 16)
+HOTSPOT_TOP_LEVEL = 14  # cells ranked for the /api/stats hotspot list
+# Grid level the photo hash index is partitioned by (cells of about 150 m); fixed by migration 015
+DUPLICATE_CELL_LEVEL = 16
+
+
+def hotspot_cell_deg(level):
+    return 360 / 2 ** (level + 2)
+
 REWARD_TIERS = [
     {
         'tier': 1,
@@ -68,6 +182,8 @@ REWARD_TIERS = [
         'description': 'Flat 100 off on pizza orders.'
     }
 ]
+REWARD_TIERS.sort(key=lambda tier: tier['threshold'])
+REWARD_THRESHOLDS = [tier['threshold'] for tier in REWARD_TIERS]
 
 
 def sanitize_text(value):
@@ -82,17 +198,329 @@ def to_float(value):
     except (TypeError, ValueError):
         return None
 
+def haversine_km(lat1, lng1, lat2, lng2):
+    if None in (lat1, lng1, lat2, lng2):
+        return None
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """(south, north, west, east) box enclosing the circle, for the R*Tree prefilter"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(180.0, dlat / cos_lat)
+    return max(-90.0, lat - dlat), min(90.0, lat + dlat), max(-180.0, lng - dlng), min(180.0, lng + dlng)
+
+
+def read_near_args():
+    """Return (lat, lng, radius_km) from ?lat=&lng=&radius_km=, None if absent.
+    Raises ValueError when the coordinates are out of range."""
+    if not request.args.get('lat') and not request.args.get('lng'):
+        return None
+    lat = to_float(request.args.get('lat'))
+    lng = to_float(request.args.get('lng'))
+    radius_km = to_float(request.args.get('radius_km')) or app.config['NEAR_RADIUS_DEFAULT_KM']
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180 or radius_km <= 0:
+        raise ValueError('Invalid location')
+    return lat, lng, min(radius_km, app.config['NEAR_RADIUS_MAX_KM'])
+
+
+SEVERITIES = ('low', 'medium', 'high')
+REPORT_STATUSES = ('pending', 'valid', 'invalid', 'assigned', 'in_progress', 'completed')
+
+
+def read_report_fields(source):
+    """Sanitized report fields from a form or an import row; returns (fields, error)"""
+    fields = {
+        'category': sanitize_text(source.get('category') or ''),
+        'description': sanitize_text(source.get('description') or ''),
+        'severity': (source.get('severity') or 'medium').strip().lower(),
+        'location_text': sanitize_text(source.get('location_text') or ''),
+        'latitude': to_float(source.get('latitude')),
+        'longitude': to_float(source.get('longitude')),
+        'is_anonymous': 1 if (source.get('is_anonymous') or 'false').lower() == 'true' else 0,
+    }
+    if not fields['category'] or not fields['description'] or not fields['location_text']:
+        return None, 'Category, description, and location are required'
+    if fields['severity'] not in SEVERITIES:
+        return None, 'Severity must be low, medium or high'
+    return fields, None
+
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_db():
-    """Get database connection"""
-    db_path = os.path.join(os.path.dirname(__file__), 'database.db')
-    conn = sqlite3.connect(db_path)
+
+def get_upload_store():
+    return UploadStore(app.config['UPLOAD_FOLDER'])
+
+
+def save_upload(file):
+    """Stream an uploaded image into the content-addressed store; None if it is not a JPG/PNG"""
+    started = time.perf_counter()
+    try:
+        with span('upload'):
+            stored = get_upload_store().save(file.stream)
+    except UnsupportedUpload:
+        return None
+    upload_seconds.observe(time.perf_counter() - started)
+    upload_bytes.observe(stored.size)
+    return stored
+
+
+def register_upload(cursor, stored):
+    """Record a stored file; reference counts are then kept by triggers on reports/proofs.
+    Returns True the first time this content is seen."""
+    cursor.execute('''
+        INSERT OR IGNORE INTO uploads (sha256, path, size)
+        VALUES (?, ?, ?)
+    ''', (stored.sha256, stored.path, stored.size))
+    return cursor.rowcount == 1
+
+
+def record_image_metadata(sha256, width, height):
+    with app.app_context():
+        conn = get_db()
+        with conn:
+            conn.execute('''
+                UPDATE uploads
+                SET width = ?, height = ?, processed_at = CURRENT_TIMESTAMP, process_error = NULL
+                WHERE sha256 = ?
+            ''', (width, height, sha256))
+
+
+def record_image_error(sha256, exc):
+    with app.app_context():
+        conn = get_db()
+        with conn:
+            conn.execute('UPDATE uploads SET process_error = ? WHERE sha256 = ?', (str(exc)[:200], sha256))
+
+
+image_pipeline = ImagePipeline(app.config['IMAGE_WORKERS'], record_image_metadata, record_image_error)
+
+
+def with_photo_variants(item):
+    """Attach thumbnail/medium URLs next to photo_path and proof_photo_path"""
+    if 'photo_path' in item:
+        item['photo_variants'] = variant_urls(item['photo_path'])
+    if 'proof_photo_path' in item:
+        item['proof_photo_variants'] = variant_urls(item['proof_photo_path'])
+    return item
+
+def _connect(db_path):
+    """Open a tuned SQLite connection (WAL, relaxed fsync, larger cache, mmap)"""
+    conn = sqlite3.connect(db_path, timeout=app.config['DB_BUSY_TIMEOUT_MS'] / 1000,
+                           check_same_thread=False,
+                           factory=ProfiledConnection if app.config['PROFILING'] or app.config['METRICS']
+                           else sqlite3.Connection)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f"PRAGMA cache_size = -{int(app.config['DB_CACHE_SIZE_KB'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(app.config['DB_MMAP_SIZE'])}")
+    conn.execute(f"PRAGMA busy_timeout = {int(app.config['DB_BUSY_TIMEOUT_MS'])}")
+    conn.execute('PRAGMA temp_store = MEMORY')
     conn.execute('PRAGMA foreign_keys = ON')
+    conn.create_function('geo_distance_km', 4, haversine_km, deterministic=True)
     return conn
 
+
+class ConnectionPool:
+    """Keeps idle connections around so requests reuse them instead of reconnecting.
+
+    A connection is checked out by one worker thread at a time and handed
+    back at teardown; at most ``size`` idle connections are retained.
+    """
+
+    def __init__(self, db_path, size):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+
+    def acquire(self):
+        with self._lock:
+            self.in_use += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return _connect(self.db_path)
+        except BaseException:
+            with self._lock:
+                self.in_use -= 1
+            raise
+
+    def idle_count(self):
+        return self._idle.qsize()
+
+    def release(self, conn):
+        with self._lock:
+            self.in_use -= 1
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the pool for the configured database, replacing it if the path changed"""
+    pool = app.extensions.get('db_pool')
+    if pool is None or pool.db_path != app.config['DATABASE']:
+        with _pool_lock:
+            pool = app.extensions.get('db_pool')
+            if pool is None or pool.db_path != app.config['DATABASE']:
+                if pool is not None:
+                    pool.close_all()
+                pool = ConnectionPool(app.config['DATABASE'], app.config['DB_POOL_SIZE'])
+                app.extensions['db_pool'] = pool
+    return pool
+
+
+def get_db():
+    """Get the database connection bound to the current app context"""
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+profile_sampler = ProfileSampler(app.config['PROFILE_DIR'], app.config['PROFILE_SAMPLE_RATE'])
+if app.config['PROFILING']:
+    app.json = ProfiledJSONProvider(app)
+
+
+def pool_connections():
+    pool = app.extensions.get('db_pool')
+    if pool is None:
+        return {('idle',): 0, ('in_use',): 0}
+    return {('idle',): pool.idle_count(), ('in_use',): pool.in_use}
+
+
+def reports_by_status():
+    cursor = get_db().cursor()
+    cursor.execute(f"SELECT name, value FROM stat_counters WHERE name IN ({', '.join('?' * len(REPORT_STATUSES))})",
+                   [f'status_{status}' for status in REPORT_STATUSES])
+    return {(row['name'][len('status_'):],): row['value'] for row in cursor.fetchall()}
+
+
+def rollup_backlog():
+    return get_db().execute('SELECT count(*) FROM rollup_events').fetchone()[0]
+
+
+# Labels are bounded: routes by URL rule, methods from a fixed set, statement kinds by keyword
+METRIC_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+STATEMENT_KINDS = {'select', 'insert', 'update', 'delete', 'with'}
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+UPLOAD_SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 2 * 1024 * 1024, 4 * 1024 * 1024,
+                       5 * 1024 * 1024)
+
+metrics = MetricsRegistry(app.config['METRICS_DIR'])
+http_request_seconds = metrics.histogram(
+    'greentrack_http_request_duration_seconds', 'Request latency, including streamed bodies',
+    ('route', 'method', 'status'))
+db_query_seconds = metrics.histogram(
+    'greentrack_db_query_duration_seconds', 'Statement time, execute plus fetches, made while serving requests',
+    ('kind',), DB_BUCKETS)
+metrics.gauge('greentrack_db_connections', 'Pooled SQLite connections', ('state',), function=pool_connections)
+upload_bytes = metrics.histogram('greentrack_upload_bytes', 'Size of stored photo uploads',
+                                 buckets=UPLOAD_SIZE_BUCKETS)
+upload_seconds = metrics.histogram('greentrack_upload_duration_seconds', 'Time to hash and store a photo upload')
+rewards_granted = metrics.counter('greentrack_rewards_granted_total', 'Reward tiers granted', ('tier',))
+tasks_auto_assigned = metrics.counter('greentrack_tasks_auto_assigned_total', 'Tasks assigned by the matching engine')
+metrics.gauge('greentrack_password_hash_jobs', 'Password hash jobs queued or running',
+              function=lambda: password_hasher.pending)
+metrics.gauge('greentrack_event_streams', 'Open /api/events streams', function=lambda: event_broker.subscriber_count())
+metrics.gauge('greentrack_reports', 'Reports by status; pending, valid and assigned are the work queues',
+              ('status',), function=reports_by_status, shared=True)
+metrics.gauge('greentrack_rollup_events_pending', 'Events queued for the time-series rollups',
+              function=rollup_backlog, shared=True)
+
+
+def statement_kind(sql):
+    keyword = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ''
+    return keyword if keyword in STATEMENT_KINDS else 'other'
+
+
+@app.before_request
+def start_profile():
+    if not (app.config['PROFILING'] or app.config['METRICS']):
+        return
+    g.profile = RequestProfile(app.config['PROFILE_MAX_STATEMENTS'])
+    g.profile_token = activate(g.profile)
+    if app.config['PROFILING']:
+        g.profiler = profile_sampler.start()
+
+
+@app.after_request
+def add_server_timing(response):
+    profile = g.get('profile')
+    if profile is not None:
+        g.response_status = response.status_code
+        if app.config['PROFILING']:
+            response.headers['Server-Timing'] = profile.server_timing()
+    return response
+
+
+def record_request_metrics(profile, exc):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    method = request.method if request.method in METRIC_METHODS else 'other'
+    status = 500 if exc is not None else g.get('response_status', 500)
+    http_request_seconds.observe(profile.elapsed(), route=route, method=method, status=status)
+    for sql, _, seconds in profile.statements:
+        db_query_seconds.observe(seconds, kind=statement_kind(sql))
+
+
+@app.teardown_request
+def finish_profile(exc):
+    """Record request metrics, log slow requests with their statements and write any cProfile sample.
+
+    Runs after a streamed body has been sent, so its SQL time is included.
+    """
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    deactivate(g.pop('profile_token'))
+    if app.config['METRICS']:
+        record_request_metrics(profile, exc)
+    if not app.config['PROFILING']:
+        return
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        path = profile_sampler.stop(profiler, request.endpoint)
+        app.logger.info('Profile of %s %s written to %s', request.method, request.path, path)
+    elapsed_ms = profile.elapsed() * 1000
+    if elapsed_ms >= app.config['PROFILE_SLOW_MS']:
+        app.logger.warning('Slow request %s %s: %.1f ms, %d queries, %.1f ms in SQL, spans %s\n%s',
+                           request.method, request.full_path.rstrip('?'), elapsed_ms, profile.query_count,
+                           profile.sql_seconds * 1000,
+                           {name: round(seconds * 1000, 1) for name, seconds in profile.spans.items()},
+                           profile.format_statements())
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    """Return the context's connection to the pool, rolling back unfinished work"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
 def init_db():
     """Initialize database with tables"""
     conn = get_db()
@@ -174,30 +602,856 @@ def init_db():
     ''')
     
     conn.commit()
-    conn.close()
+    migrate_db(conn)
+    conn.execute('PRAGMA optimize')
 
 
-def award_rewards_for_citizen(citizen_id, conn):
-    """Award rewards to a citizen based on their non-invalid reports."""
-    cursor = conn.cursor()
+def _migration_001_indexes(cursor):
+    """Secondary indexes for the per-user, per-status and join access paths"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_citizen_created ON reports(citizen_id, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_status_created ON reports(status, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at, id)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_report ON tasks(report_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_volunteer_assigned ON tasks(assigned_volunteer_id, assigned_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, assigned_volunteer_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_proofs_task ON proofs(task_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_rewards_user_tier ON rewards(user_id, tier)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_role_name ON users(role, name)')
+
+
+def _migration_002_reports_fts(cursor):
+    """Full-text index over report text, kept in sync with reports by triggers"""
     cursor.execute('''
-        SELECT COUNT(*) as count
+        CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+            description, location_text, category,
+            content='reports', content_rowid='id', prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_fts_ai AFTER INSERT ON reports BEGIN
+            INSERT INTO reports_fts(rowid, description, location_text, category)
+            VALUES (new.id, new.description, new.location_text, new.category);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_fts_ad AFTER DELETE ON reports BEGIN
+            INSERT INTO reports_fts(reports_fts, rowid, description, location_text, category)
+            VALUES ('delete', old.id, old.description, old.location_text, old.category);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_fts_au
+        AFTER UPDATE OF description, location_text, category ON reports BEGIN
+            INSERT INTO reports_fts(reports_fts, rowid, description, location_text, category)
+            VALUES ('delete', old.id, old.description, old.location_text, old.category);
+            INSERT INTO reports_fts(rowid, description, location_text, category)
+            VALUES (new.id, new.description, new.location_text, new.category);
+        END
+    ''')
+    cursor.execute("INSERT INTO reports_fts(reports_fts) VALUES ('rebuild')")
+
+
+def _migration_003_reports_geo(cursor):
+    """R*Tree over report coordinates, kept in sync with reports by triggers"""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS reports_geo USING rtree(
+            id, min_lat, max_lat, min_lng, max_lng
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_geo_ai AFTER INSERT ON reports
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+            INSERT INTO reports_geo(id, min_lat, max_lat, min_lng, max_lng)
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_geo_ad AFTER DELETE ON reports BEGIN
+            DELETE FROM reports_geo WHERE id = old.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_geo_au AFTER UPDATE OF latitude, longitude ON reports BEGIN
+            DELETE FROM reports_geo WHERE id = old.id;
+            INSERT INTO reports_geo(id, min_lat, max_lat, min_lng, max_lng)
+            SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+        END
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO reports_geo(id, min_lat, max_lat, min_lng, max_lng)
+        SELECT id, latitude, latitude, longitude, longitude
         FROM reports
-        WHERE citizen_id = ?
-          AND status = 'completed'
-    ''', (citizen_id,))
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    ''')
+
+
+def _migration_004_stat_counters(cursor):
+    """Running totals behind /api/stats, maintained by triggers instead of COUNT(*) scans"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stat_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS hotspot_counts (
+            location_text TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_hotspot_counts_count ON hotspot_counts(count)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_reports_ai AFTER INSERT ON reports BEGIN
+            UPDATE stat_counters SET value = value + 1 WHERE name = 'total_reports';
+            UPDATE stat_counters SET value = value + (new.status != 'invalid') WHERE name = 'valid_reports';
+            INSERT INTO hotspot_counts(location_text, count)
+            SELECT new.location_text, 1 WHERE new.status != 'invalid'
+            ON CONFLICT(location_text) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_reports_ad AFTER DELETE ON reports BEGIN
+            UPDATE stat_counters SET value = value - 1 WHERE name = 'total_reports';
+            UPDATE stat_counters SET value = value - (old.status != 'invalid') WHERE name = 'valid_reports';
+            UPDATE hotspot_counts SET count = count - 1
+            WHERE old.status != 'invalid' AND location_text = old.location_text;
+            DELETE FROM hotspot_counts WHERE location_text = old.location_text AND count <= 0;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_reports_au
+        AFTER UPDATE OF status, location_text ON reports BEGIN
+            UPDATE stat_counters SET value = value + (new.status != 'invalid') - (old.status != 'invalid')
+            WHERE name = 'valid_reports';
+            UPDATE hotspot_counts SET count = count - 1
+            WHERE old.status != 'invalid' AND location_text = old.location_text;
+            DELETE FROM hotspot_counts WHERE location_text = old.location_text AND count <= 0;
+            INSERT INTO hotspot_counts(location_text, count)
+            SELECT new.location_text, 1 WHERE new.status != 'invalid'
+            ON CONFLICT(location_text) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_tasks_ai AFTER INSERT ON tasks BEGIN
+            UPDATE stat_counters SET value = value + (new.status = 'completed') WHERE name = 'completed_tasks';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_tasks_ad AFTER DELETE ON tasks BEGIN
+            UPDATE stat_counters SET value = value - (old.status = 'completed') WHERE name = 'completed_tasks';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_tasks_au AFTER UPDATE OF status ON tasks BEGIN
+            UPDATE stat_counters SET value = value + (new.status = 'completed') - (old.status = 'completed')
+            WHERE name = 'completed_tasks';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_users_ai AFTER INSERT ON users BEGIN
+            UPDATE stat_counters SET value = value + (new.role = 'volunteer') WHERE name = 'volunteers_count';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_users_ad AFTER DELETE ON users BEGIN
+            UPDATE stat_counters SET value = value - (old.role = 'volunteer') WHERE name = 'volunteers_count';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_users_au AFTER UPDATE OF role ON users BEGIN
+            UPDATE stat_counters SET value = value + (new.role = 'volunteer') - (old.role = 'volunteer')
+            WHERE name = 'volunteers_count';
+        END
+    ''')
+    rebuild_stat_counters(cursor)
+
+
+def rebuild_stat_counters(cursor):
+    """Recompute every counter from the base tables (used by migration and `flask rebuild-stats`)"""
+    counters = {
+        'total_reports': 'SELECT COUNT(*) FROM reports',
+        'valid_reports': "SELECT COUNT(*) FROM reports WHERE status != 'invalid'",
+        'completed_tasks': "SELECT COUNT(*) FROM tasks WHERE status = 'completed'",
+        'volunteers_count': "SELECT COUNT(*) FROM users WHERE role = 'volunteer'",
+    }
+    for status in REPORT_STATUSES:
+        counters[f'status_{status}'] = f"SELECT COUNT(*) FROM reports WHERE status = '{status}'"
+    for name, sql in counters.items():
+        cursor.execute('''
+            INSERT INTO stat_counters(name, value) VALUES (?, (''' + sql + '''))
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value
+        ''', (name,))
+
+
+def _grid_cell(coordinate, cell_deg):
+    """SQL for floor(coordinate / cell_deg) as an integer; floor() itself is an optional SQLite build feature"""
+    ratio = f'({coordinate}) / {cell_deg}'
+    return f'(CAST({ratio} AS INTEGER) - ({ratio} < CAST({ratio} AS INTEGER)))'
+
+
+def rebuild_hotspot_cells(cursor):
+    """Recount every hotspot cell from reports; labels come from each cell's newest report"""
+    cursor.execute('DELETE FROM hotspot_cells')
+    # With a single max() in the select list, SQLite takes the bare location_text from that row
+    cursor.execute(f'''
+        INSERT INTO hotspot_cells(level, cell_lat, cell_lng, count, lat_sum, lng_sum, label)
+        SELECT level, cell_lat, cell_lng, count, lat_sum, lng_sum, label FROM (
+            SELECT l.level, {_grid_cell('r.latitude', 'l.cell_deg')} AS cell_lat,
+                   {_grid_cell('r.longitude', 'l.cell_deg')} AS cell_lng,
+                   COUNT(*) AS count, SUM(r.latitude) AS lat_sum, SUM(r.longitude) AS lng_sum,
+                   MAX(r.id), r.location_text AS label
+            FROM hotspot_levels l, reports r
+            WHERE r.status != 'invalid' AND r.latitude IS NOT NULL AND r.longitude IS NOT NULL
+            GROUP BY 1, 2, 3
+        )
+    ''')
+
+
+def _migration_005_reward_counters(cursor):
+    """Per-user completed_count plus one reward row per (user, tier)"""
+    cursor.execute('ALTER TABLE users ADD COLUMN completed_count INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('''
+        DELETE FROM rewards
+        WHERE id NOT IN (SELECT MIN(id) FROM rewards GROUP BY user_id, tier)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_rewards_user_tier')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_rewards_user_tier ON rewards(user_id, tier)')
+    backfill_rewards(cursor)
+
+
+def _migration_006_uploads(cursor):
+    """Reference-counted registry for the content-addressed upload store"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS uploads (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_uploads_refcount ON uploads(refcount)')
+    for table, column in (('reports', 'photo_path'), ('proofs', 'proof_photo_path')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS uploads_{table}_ai AFTER INSERT ON {table} BEGIN
+                UPDATE uploads SET refcount = refcount + 1 WHERE path = new.{column};
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS uploads_{table}_ad AFTER DELETE ON {table} BEGIN
+                UPDATE uploads SET refcount = refcount - 1 WHERE path = old.{column};
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS uploads_{table}_au AFTER UPDATE OF {column} ON {table} BEGIN
+                UPDATE uploads SET refcount = refcount - 1 WHERE path = old.{column};
+                UPDATE uploads SET refcount = refcount + 1 WHERE path = new.{column};
+            END
+        ''')
+
+
+def _migration_007_upload_metadata(cursor):
+    """Dimensions and processing state filled in by the image pipeline"""
+    cursor.execute('ALTER TABLE uploads ADD COLUMN width INTEGER')
+    cursor.execute('ALTER TABLE uploads ADD COLUMN height INTEGER')
+    cursor.execute('ALTER TABLE uploads ADD COLUMN processed_at TIMESTAMP')
+    cursor.execute('ALTER TABLE uploads ADD COLUMN process_error TEXT')
+
+
+# Tables whose every write bumps a row in table_versions; see versioned()
+VERSIONED_TABLES = ('users', 'reports', 'tasks', 'proofs', 'rewards')
+
+
+def _migration_008_table_versions(cursor):
+    """Per-table change counters used to build ETags for listings"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.executemany('INSERT OR IGNORE INTO table_versions (name) VALUES (?)',
+                       [(table,) for table in VERSIONED_TABLES])
+    for table in VERSIONED_TABLES:
+        for event, suffix in (('INSERT', 'ai'), ('UPDATE', 'au'), ('DELETE', 'ad')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS version_{table}_{suffix} AFTER {event} ON {table} BEGIN
+                    UPDATE table_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE name = '{table}';
+                END
+            ''')
+
+
+# Entities served by /api/sync
+SYNC_TABLES = ('reports', 'tasks', 'proofs', 'rewards')
+
+
+def _migration_009_change_log(cursor):
+    """Change log behind /api/sync. Each entity has one row, moved to a fresh seq
+    (and marked 'delete' when removed) in the same transaction as the write, so a
+    sync returns each changed entity once no matter how often it changed."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_entity ON change_log(entity, entity_id)')
+    # epoch identifies this database, so tokens from another one are treated as stale;
+    # floor is the oldest seq a token may carry after prune-sync dropped tombstones
+    cursor.execute('CREATE TABLE IF NOT EXISTS sync_meta (name TEXT PRIMARY KEY, value)')
+    cursor.execute('''
+        INSERT OR IGNORE INTO sync_meta (name, value)
+        VALUES ('epoch', lower(hex(randomblob(8)))), ('floor', 0)
+    ''')
+    for table in SYNC_TABLES:
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO change_log (entity, entity_id, op)
+            SELECT '{table}', id, 'upsert' FROM {table} ORDER BY id
+        ''')
+        for event, suffix, row, op in (('INSERT', 'ai', 'NEW', 'upsert'), ('UPDATE', 'au', 'NEW', 'upsert'),
+                                       ('DELETE', 'ad', 'OLD', 'delete')):
+            # DELETE + INSERT rather than INSERT OR REPLACE: an outer INSERT OR IGNORE
+            # (grant_rewards) would override the trigger's conflict clause
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS sync_{table}_{suffix} AFTER {event} ON {table} BEGIN
+                    DELETE FROM change_log WHERE entity = '{table}' AND entity_id = {row}.id;
+                    INSERT INTO change_log (entity, entity_id, op) VALUES ('{table}', {row}.id, '{op}');
+                END
+            ''')
+
+
+def _migration_010_import_keys(cursor):
+    """Idempotency keys for bulk imports, so a retried file does not duplicate reports"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_keys (
+            key TEXT PRIMARY KEY,
+            report_id INTEGER,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migration_011_status_counters(cursor):
+    """Reports per status in stat_counters (status_<name>), read by /metrics as queue depths"""
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_reports_status_ai AFTER INSERT ON reports BEGIN
+            UPDATE stat_counters SET value = value + 1 WHERE name = 'status_' || new.status;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_reports_status_ad AFTER DELETE ON reports BEGIN
+            UPDATE stat_counters SET value = value - 1 WHERE name = 'status_' || old.status;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_reports_status_au AFTER UPDATE OF status ON reports
+        WHEN new.status != old.status BEGIN
+            UPDATE stat_counters SET value = value + 1 WHERE name = 'status_' || new.status;
+            UPDATE stat_counters SET value = value - 1 WHERE name = 'status_' || old.status;
+        END
+    ''')
+    rebuild_stat_counters(cursor)
+
+
+def _migration_012_home_area(cursor):
+    """Optional home location a volunteer is matched from (PUT /api/me/home)"""
+    cursor.execute('ALTER TABLE users ADD COLUMN home_latitude REAL')
+    cursor.execute('ALTER TABLE users ADD COLUMN home_longitude REAL')
+
+
+def _migration_013_hotspot_cells(cursor):
+    """Hotspots by coordinate grid cell at each HOTSPOT_LEVELS zoom, replacing hotspot_counts"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS hotspot_levels (
+            level INTEGER PRIMARY KEY,
+            cell_deg REAL NOT NULL
+        )
+    ''')
+    cursor.executemany('INSERT OR REPLACE INTO hotspot_levels(level, cell_deg) VALUES (?, ?)',
+                       [(level, hotspot_cell_deg(level)) for level in HOTSPOT_LEVELS])
+    # lat_sum/lng_sum give each cell's centroid; label is the newest report's location_text
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS hotspot_cells (
+            level INTEGER NOT NULL,
+            cell_lat INTEGER NOT NULL,
+            cell_lng INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            lat_sum REAL NOT NULL,
+            lng_sum REAL NOT NULL,
+            label TEXT,
+            PRIMARY KEY (level, cell_lat, cell_lng)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_hotspot_cells_count ON hotspot_cells(level, count)')
+
+    # The report counters stay as they were, minus the location_text grouping
+    for name in ('stats_reports_ai', 'stats_reports_ad', 'stats_reports_au'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    cursor.execute('''
+        CREATE TRIGGER stats_reports_ai AFTER INSERT ON reports BEGIN
+            UPDATE stat_counters SET value = value + 1 WHERE name = 'total_reports';
+            UPDATE stat_counters SET value = value + (new.status != 'invalid') WHERE name = 'valid_reports';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER stats_reports_ad AFTER DELETE ON reports BEGIN
+            UPDATE stat_counters SET value = value - 1 WHERE name = 'total_reports';
+            UPDATE stat_counters SET value = value - (old.status != 'invalid') WHERE name = 'valid_reports';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER stats_reports_au AFTER UPDATE OF status ON reports BEGIN
+            UPDATE stat_counters SET value = value + (new.status != 'invalid') - (old.status != 'invalid')
+            WHERE name = 'valid_reports';
+        END
+    ''')
+    cursor.execute('DROP TABLE IF EXISTS hotspot_counts')
+
+    # A report counts in one cell per level while it has coordinates and is not invalid
+    counted = "{row}.status != 'invalid' AND {row}.latitude IS NOT NULL AND {row}.longitude IS NOT NULL"
+    add = f'''
+        INSERT INTO hotspot_cells(level, cell_lat, cell_lng, count, lat_sum, lng_sum, label)
+        SELECT level, {_grid_cell('new.latitude', 'cell_deg')}, {_grid_cell('new.longitude', 'cell_deg')},
+               1, new.latitude, new.longitude, new.location_text
+        FROM hotspot_levels
+        WHERE {counted.format(row='new')}
+        ON CONFLICT(level, cell_lat, cell_lng) DO UPDATE SET
+            count = count + 1, lat_sum = lat_sum + excluded.lat_sum, lng_sum = lng_sum + excluded.lng_sum,
+            label = excluded.label;
+    '''
+    old_cells = f'''(level, cell_lat, cell_lng) IN (
+            SELECT level, {_grid_cell('old.latitude', 'cell_deg')}, {_grid_cell('old.longitude', 'cell_deg')}
+            FROM hotspot_levels)'''
+    remove = f'''
+        UPDATE hotspot_cells
+        SET count = count - 1, lat_sum = lat_sum - old.latitude, lng_sum = lng_sum - old.longitude
+        WHERE {counted.format(row='old')} AND {old_cells};
+        DELETE FROM hotspot_cells WHERE count <= 0 AND {old_cells};
+    '''
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS hotspot_reports_ai AFTER INSERT ON reports BEGIN {add} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS hotspot_reports_ad AFTER DELETE ON reports BEGIN {remove} END')
+    # Only invalidation (or its reversal) and moved coordinates change the counts
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS hotspot_reports_au AFTER UPDATE OF status, latitude, longitude ON reports
+        WHEN (new.status = 'invalid') != (old.status = 'invalid')
+          OR new.latitude IS NOT old.latitude OR new.longitude IS NOT old.longitude
+        BEGIN {remove} {add} END
+    ''')
+    rebuild_hotspot_cells(cursor)
+
+
+ROLLUP_TABLES = {'hour': 'rollup_hourly', 'day': 'rollup_daily'}
+# Report fields counted per bucket, keyed by value
+ROLLUP_FIELDS = ('category', 'severity')
+# Completion-time histograms, named after where the interval starts
+COMPLETION_METRICS = ('assigned_to_completed', 'reported_to_completed')
+TIMESERIES_METRICS = ROLLUP_FIELDS + ('transition',) + COMPLETION_METRICS
+
+
+def _migration_014_rollups(cursor):
+    """Event queue and hourly/daily rollup tables behind /api/stats/timeseries (see rollups.py)"""
+    # seconds is set for completion events, which are binned when folded; key otherwise
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_events (
+            id INTEGER PRIMARY KEY,
+            occurred_at TIMESTAMP NOT NULL,
+            metric TEXT NOT NULL,
+            key TEXT NOT NULL DEFAULT '',
+            seconds REAL
+        )
+    ''')
+    for table in ROLLUP_TABLES.values():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                key TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, metric, key)
+            ) WITHOUT ROWID
+        ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS rollup_reports_ai AFTER INSERT ON reports BEGIN
+            INSERT INTO rollup_events (occurred_at, metric, key) VALUES
+                (coalesce(new.created_at, CURRENT_TIMESTAMP), 'category', new.category),
+                (coalesce(new.created_at, CURRENT_TIMESTAMP), 'severity', new.severity);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS rollup_reports_au AFTER UPDATE OF status ON reports
+        WHEN new.status != old.status BEGIN
+            INSERT INTO rollup_events (occurred_at, metric, key)
+            VALUES (CURRENT_TIMESTAMP, 'transition', old.status || '>' || new.status);
+        END
+    ''')
+    completed = '''
+        INSERT INTO rollup_events (occurred_at, metric, seconds)
+        SELECT new.completed_at, 'assigned_to_completed',
+               (julianday(new.completed_at) - julianday(new.assigned_at)) * 86400
+        WHERE new.assigned_at IS NOT NULL;
+        INSERT INTO rollup_events (occurred_at, metric, seconds)
+        SELECT new.completed_at, 'reported_to_completed', (julianday(new.completed_at) - julianday(r.created_at)) * 86400
+        FROM reports r WHERE r.id = new.report_id AND r.created_at IS NOT NULL;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_tasks_ai AFTER INSERT ON tasks
+        WHEN new.completed_at IS NOT NULL BEGIN {completed} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_tasks_au AFTER UPDATE OF completed_at ON tasks
+        WHEN new.completed_at IS NOT NULL AND old.completed_at IS NULL BEGIN {completed} END
+    ''')
+    backfill_rollups(cursor)
+
+
+def backfill_rollups(cursor):
+    """Rollups for the reports and tasks already there. Report counts are grouped here
+    directly; completions are queued for the aggregator to bin. Past status changes
+    were never recorded, so transition counts start from this point."""
+    buckets = {'hour': "substr(created_at, 1, 13) || ':00'", 'day': 'substr(created_at, 1, 10)'}
+    for granularity, table in ROLLUP_TABLES.items():
+        for field in ROLLUP_FIELDS:
+            cursor.execute(f'''
+                INSERT INTO {table} (bucket, metric, key, count)
+                SELECT {buckets[granularity]}, '{field}', {field}, count(*)
+                FROM reports WHERE created_at IS NOT NULL
+                GROUP BY 1, 3
+            ''')
+    cursor.execute('''
+        INSERT INTO rollup_events (occurred_at, metric, seconds)
+        SELECT completed_at, 'assigned_to_completed', (julianday(completed_at) - julianday(assigned_at)) * 86400
+        FROM tasks WHERE completed_at IS NOT NULL AND assigned_at IS NOT NULL
+    ''')
+    cursor.execute('''
+        INSERT INTO rollup_events (occurred_at, metric, seconds)
+        SELECT t.completed_at, 'reported_to_completed', (julianday(t.completed_at) - julianday(r.created_at)) * 86400
+        FROM tasks t JOIN reports r ON r.id = t.report_id
+        WHERE t.completed_at IS NOT NULL AND r.created_at IS NOT NULL
+    ''')
+
+
+def fold_rollup_events(cursor, batch):
+    """Add up to ``batch`` of the oldest queued events to the rollups and dequeue them; returns how many"""
+    rows = cursor.execute('SELECT id, occurred_at, metric, key, seconds FROM rollup_events ORDER BY id LIMIT ?',
+                          (batch,)).fetchall()
+    if not rows:
+        return 0
+    counts = {granularity: Counter() for granularity in ROLLUP_TABLES}
+    for _, occurred_at, metric, key, seconds in rows:
+        if seconds is not None:
+            key = str(duration_bin(max(seconds, 0.0)))
+        for granularity, bucket_counts in counts.items():
+            bucket_counts[(bucket_key(occurred_at, granularity), metric, key)] += 1
+    for granularity, table in ROLLUP_TABLES.items():
+        cursor.executemany(f'''
+            INSERT INTO {table} (bucket, metric, key, count) VALUES (?, ?, ?, ?)
+            ON CONFLICT (bucket, metric, key) DO UPDATE SET count = count + excluded.count
+        ''', [(*group, count) for group, count in counts[granularity].items()])
+    cursor.execute('DELETE FROM rollup_events WHERE id <= ?', (rows[-1][0],))
+    return len(rows)
+
+
+def aggregate_rollups(conn):
+    """Drain the rollup event queue, one write transaction per ROLLUP_BATCH_SIZE events.
+    Safe to run from several processes at once. Returns the number of events folded."""
+    batch = app.config['ROLLUP_BATCH_SIZE']
+    folded = 0
+    while True:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            count = fold_rollup_events(cursor, batch)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        folded += count
+        if count < batch:
+            return folded
+
+
+def _migration_015_photo_hashes(cursor):
+    """Perceptual photo hashes and the multi-index behind duplicate detection (see phash.py)"""
+    cursor.execute('ALTER TABLE reports ADD COLUMN photo_phash INTEGER')
+    # Set on a report that looks like one still open; reviewing that one closes this one too
+    cursor.execute('ALTER TABLE reports ADD COLUMN duplicate_of INTEGER REFERENCES reports(id)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reports_duplicate_of ON reports(duplicate_of)
+        WHERE duplicate_of IS NOT NULL
+    ''')
+    # One row per band of each hashed report with coordinates, filed under its grid
+    # cell, so a lookup reads only the band values it needs in the cells nearby
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS photo_hash_bands (
+            band INTEGER NOT NULL,
+            value INTEGER NOT NULL,
+            cell_lat INTEGER NOT NULL,
+            cell_lng INTEGER NOT NULL,
+            report_id INTEGER NOT NULL,
+            PRIMARY KEY (band, value, cell_lat, cell_lng, report_id)
+        ) WITHOUT ROWID
+    ''')
+    cell_deg = hotspot_cell_deg(DUPLICATE_CELL_LEVEL)
+    band_numbers = ' UNION ALL '.join(f'SELECT {band} AS band' for band in range(BANDS))
+    entries = f'''
+        SELECT band, ({{row}}.photo_phash >> (band * {BAND_BITS})) & {(1 << BAND_BITS) - 1},
+               {_grid_cell('{row}.latitude', cell_deg)}, {_grid_cell('{row}.longitude', cell_deg)}, {{row}}.id
+        FROM ({band_numbers})
+        WHERE {{row}}.photo_phash IS NOT NULL AND {{row}}.latitude IS NOT NULL AND {{row}}.longitude IS NOT NULL
+    '''
+    add = f'''
+        INSERT OR IGNORE INTO photo_hash_bands (band, value, cell_lat, cell_lng, report_id)
+        {entries.format(row='new')};
+    '''
+    remove = f'''
+        DELETE FROM photo_hash_bands
+        WHERE (band, value, cell_lat, cell_lng, report_id) IN ({entries.format(row='old')});
+    '''
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS photo_hash_reports_ai AFTER INSERT ON reports BEGIN {add} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS photo_hash_reports_ad AFTER DELETE ON reports BEGIN {remove} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS photo_hash_reports_au AFTER UPDATE OF photo_phash, latitude, longitude ON reports
+        WHEN new.photo_phash IS NOT old.photo_phash
+          OR new.latitude IS NOT old.latitude OR new.longitude IS NOT old.longitude
+        BEGIN {remove} {add} END
+    ''')
+    # The moderator's first decision on a report settles its pending duplicates as well
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS duplicate_reports_au AFTER UPDATE OF status ON reports
+        WHEN old.status = 'pending' AND new.status != 'pending' BEGIN
+            UPDATE reports
+            SET status = 'invalid', moderator_notes = 'Duplicate of report #' || new.id,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE duplicate_of = new.id AND status = 'pending';
+        END
+    ''')
+
+
+# Rows a change hides from someone, as (entity, SELECT of the row ids, audience,
+# condition) per trigger. The audience is the user who could see the old row, or
+# 0 for every volunteer (open tasks and the reports and proofs seen through them).
+TASK_ROWS = (('tasks', 'SELECT old.id AS id'), ('reports', 'SELECT old.report_id AS id'),
+             ('proofs', 'SELECT id FROM proofs WHERE task_id = old.id'))
+REPORT_ROWS = (('reports', 'SELECT old.id AS id'), ('tasks', 'SELECT id FROM tasks WHERE report_id = old.id'),
+               ('proofs', 'SELECT p.id FROM proofs p JOIN tasks t ON t.id = p.task_id WHERE t.report_id = old.id'))
+OPEN_TASK = "{row}.status = 'pending' AND {row}.assigned_volunteer_id IS NULL"
+SYNC_HIDES = {
+    ('tasks', 'au'): [
+        *((entity, ids, '0', f"{OPEN_TASK.format(row='old')} AND NOT ({OPEN_TASK.format(row='new')})")
+          for entity, ids in TASK_ROWS),
+        *((entity, ids, 'old.assigned_volunteer_id', 'old.assigned_volunteer_id IS NOT new.assigned_volunteer_id')
+          for entity, ids in TASK_ROWS),
+    ],
+    ('tasks', 'ad'): [
+        *((entity, ids, '0', OPEN_TASK.format(row='old')) for entity, ids in TASK_ROWS[:2]),
+        *((entity, ids, 'old.assigned_volunteer_id', '1') for entity, ids in TASK_ROWS[:2]),
+        ('tasks', TASK_ROWS[0][1], '(SELECT citizen_id FROM reports WHERE id = old.report_id)', '1'),
+    ],
+    ('reports', 'au'): [
+        (entity, ids, '0', "old.status = 'valid' AND new.status != 'valid'") for entity, ids in REPORT_ROWS
+    ],
+    ('reports', 'ad'): [
+        ('reports', REPORT_ROWS[0][1], 'old.citizen_id', '1'),
+        ('reports', REPORT_ROWS[0][1], '0', "old.status = 'valid'"),
+        ('reports', REPORT_ROWS[0][1], '(SELECT assigned_volunteer_id FROM tasks WHERE report_id = old.id)', '1'),
+    ],
+    ('proofs', 'ad'): [
+        ('proofs', 'SELECT old.id AS id', '(SELECT assigned_volunteer_id FROM tasks WHERE id = old.task_id)', '1'),
+        ('proofs', 'SELECT old.id AS id',
+         '(SELECT r.citizen_id FROM tasks t JOIN reports r ON r.id = t.report_id WHERE t.id = old.task_id)', '1'),
+    ],
+    ('rewards', 'ad'): [
+        ('rewards', 'SELECT old.id AS id', 'old.user_id', '1'),
+    ],
+}
+
+
+def _migration_016_sync_hidden(cursor):
+    """Who stopped seeing which synced row, and at which change_log seq, so /api/sync
+    removes only rows the caller could see instead of every change outside its scope"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_hidden (
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            audience INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (entity, entity_id, audience)
+        ) WITHOUT ROWID
+    ''')
+    for (table, suffix), hides in SYNC_HIDES.items():
+        event, row, op = ('UPDATE', 'NEW', 'upsert') if suffix == 'au' else ('DELETE', 'OLD', 'delete')
+        # DELETE + INSERT for the same reason as the change_log rows (see migration 009)
+        statements = ''.join(f'''
+            DELETE FROM sync_hidden
+            WHERE entity = '{entity}' AND audience = {audience} AND entity_id IN ({ids}) AND ({when});
+            INSERT INTO sync_hidden (entity, entity_id, audience, seq)
+            SELECT '{entity}', id, {audience}, (SELECT MAX(seq) FROM change_log)
+            FROM ({ids}) WHERE id IS NOT NULL AND {audience} IS NOT NULL AND ({when});
+        ''' for entity, ids, audience, when in hides)
+        # Replaces the change_log trigger, so the hides run after it and share its seq
+        cursor.execute(f'DROP TRIGGER IF EXISTS sync_{table}_{suffix}')
+        cursor.execute(f'''
+            CREATE TRIGGER sync_{table}_{suffix} AFTER {event} ON {table} BEGIN
+                DELETE FROM change_log WHERE entity = '{table}' AND entity_id = {row}.id;
+                INSERT INTO change_log (entity, entity_id, op) VALUES ('{table}', {row}.id, '{op}');
+                {statements}
+            END
+        ''')
+
+
+def _migration_017_reports_category(cursor):
+    """tasks/manage filtered by category walks that category's reports newest first"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_category_created ON reports(category, created_at, id)')
+
+
+# Applied in order by migrate_db(); PRAGMA user_version stores how many have run.
+# Append new steps at the end and never edit one that has shipped.
+MIGRATIONS = [
+    _migration_001_indexes,
+    _migration_002_reports_fts,
+    _migration_003_reports_geo,
+    _migration_004_stat_counters,
+    _migration_005_reward_counters,
+    _migration_006_uploads,
+    _migration_007_upload_metadata,
+    _migration_008_table_versions,
+    _migration_009_change_log,
+    _migration_010_import_keys,
+    _migration_011_status_counters,
+    _migration_012_home_area,
+    _migration_013_hotspot_cells,
+    _migration_014_rollups,
+    _migration_015_photo_hashes,
+    _migration_016_sync_hidden,
+    _migration_017_reports_category,
+]
+
+
+def migrate_db(conn):
+    """Bring the schema up to the latest migration, one transaction per step"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS, start=1):
+        if target <= version:
+            continue
+        conn.execute('BEGIN')
+        try:
+            migration(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def record_completion(cursor, citizen_id):
+    """Count one more completed report for the citizen and grant any tier it crosses.
+
+    Runs inside the completing transaction; the UNIQUE (user_id, tier) index makes a
+    concurrent duplicate grant a no-op.
+    """
+    cursor.execute('UPDATE users SET completed_count = completed_count + 1 WHERE id = ?', (citizen_id,))
+    cursor.execute('SELECT completed_count FROM users WHERE id = ?', (citizen_id,))
     row = cursor.fetchone()
-    valid_count = row['count'] if row else 0
+    if not row:
+        return []
+    count = row['completed_count']
+    crossed = REWARD_TIERS[bisect.bisect_right(REWARD_THRESHOLDS, count - 1):
+                           bisect.bisect_right(REWARD_THRESHOLDS, count)]
+    grant_rewards(cursor, citizen_id, crossed)
+    return crossed
 
-    cursor.execute('SELECT tier FROM rewards WHERE user_id = ?', (citizen_id,))
-    awarded_tiers = {r['tier'] for r in cursor.fetchall()}
 
+def grant_rewards(cursor, user_id, tiers):
+    for tier in tiers:
+        cursor.execute('''
+            INSERT OR IGNORE INTO rewards (user_id, tier, brand, code, description)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, tier['tier'], tier['brand'], tier['code'], tier['description']))
+        if cursor.rowcount:
+            rewards_granted.inc(tier=tier['tier'])
+
+
+def backfill_rewards(cursor):
+    """Recompute completed_count for every user and grant any tiers they are owed"""
+    cursor.execute('''
+        UPDATE users
+        SET completed_count = (
+            SELECT COUNT(*) FROM reports
+            WHERE reports.citizen_id = users.id AND reports.status = 'completed'
+        )
+    ''')
     for tier in REWARD_TIERS:
-        if valid_count >= tier['threshold'] and tier['tier'] not in awarded_tiers:
-            cursor.execute('''
-                INSERT INTO rewards (user_id, tier, brand, code, description)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (citizen_id, tier['tier'], tier['brand'], tier['code'], tier['description']))
+        cursor.execute('''
+            INSERT OR IGNORE INTO rewards (user_id, tier, brand, code, description)
+            SELECT id, ?, ?, ?, ?
+            FROM users
+            WHERE completed_count >= ?
+        ''', (tier['tier'], tier['brand'], tier['code'], tier['description'], tier['threshold']))
+
+
+class StatsCache:
+    """Holds the last /api/stats payload.
+
+    The payload is stored with a ``key`` (the versions of the tables it was
+    read from), and a lookup with any other key recomputes it. Writes made by
+    other worker processes therefore show up at once, and the ETag built from
+    the same versions never labels a stale body. Write paths in this process
+    also call invalidate() after committing. The generation counter keeps a
+    payload computed before an invalidation from being stored after it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._key = None
+        self._expires_at = 0.0
+        self._generation = 0
+
+    def get_or_compute(self, compute, ttl, key=None):
+        with self._lock:
+            if self._value is not None and self._key == key and time.monotonic() < self._expires_at:
+                return self._value
+            generation = self._generation
+        value = compute()
+        with self._lock:
+            if generation == self._generation:
+                self._value = value
+                self._key = key
+                self._expires_at = time.monotonic() + ttl
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+
+stats_cache = StatsCache()
+password_hasher = PasswordHasher(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'],
+                                 app.config['PASSWORD_HASH_MAX_PENDING'])
+event_broker = EventBroker(app.config['EVENTS_REPLAY_SIZE'], app.config['EVENTS_QUEUE_SIZE'],
+                           app.config['EVENTS_MAX_STREAMS'])
+
+
+def aggregate_rollups_in_background():
+    with app.app_context():
+        return aggregate_rollups(get_db())
+
+
+rollup_aggregator = RollupAggregator(app.config['ROLLUP_INTERVAL'], aggregate_rollups_in_background)
+
+
+@app.before_request
+def start_rollup_aggregator():
+    # On the first request rather than at import, so each forked worker process runs its own thread
+    rollup_aggregator.start()
+
 
 def require_login(f):
     """Decorator to require login"""
@@ -221,6 +1475,612 @@ def require_role(*roles):
         return decorated_function
     return decorator
 
+def listing_validators(tables):
+    """ETag and Last-Modified for the current request, from the versions of ``tables``.
+
+    The ETag also covers the URL (filters, cursor) and the session's user, since
+    most listings are per-user.
+    """
+    placeholders = ','.join('?' * len(tables))
+    rows = get_db().execute(f'''
+        SELECT name, version, updated_at FROM table_versions
+        WHERE name IN ({placeholders}) ORDER BY name
+    ''', tables).fetchall()
+    key = json.dumps([
+        len(MIGRATIONS), request.full_path, session.get('user_id'), session.get('user_role'),
+        [[row['name'], row['version']] for row in rows],
+    ])
+    etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+    last_modified = max((row['updated_at'] for row in rows), default=None)
+    if last_modified:
+        last_modified = datetime.strptime(last_modified, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return etag, last_modified
+
+
+def versioned(*tables):
+    """Decorator for GET listings: reply 304 without running the view when none of
+    ``tables`` changed since the client's copy. Goes below the auth decorators."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Read before the view runs, so a write racing the query only ever
+            # makes the ETag older than the body, never newer
+            etag, last_modified = listing_validators(tables)
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorator
+
+
+# Current state of one report and its task, as pushed on /api/events. Carries the
+# columns of every dashboard listing so the client can patch any of them.
+CHANGE_EVENT_SQL = '''
+    SELECT r.*, u.name as citizen_name, u.email as citizen_email,
+           t.id as task_id, t.status as task_status, t.assigned_volunteer_id,
+           t.assigned_at, t.completed_at, v.name as volunteer_name,
+           p.proof_photo_path, p.notes as proof_notes
+    FROM reports r
+    JOIN users u ON r.citizen_id = u.id
+    LEFT JOIN tasks t ON t.report_id = r.id
+    LEFT JOIN users v ON t.assigned_volunteer_id = v.id
+    LEFT JOIN proofs p ON p.task_id = t.id
+    WHERE r.id = ?
+'''
+# Columns of CHANGE_EVENT_SQL that /api/tasks/available does not show
+CHANGE_EVENT_PRIVATE = {'citizen_email', 'assigned_volunteer_id', 'assigned_at', 'completed_at', 'volunteer_name',
+                        'proof_photo_path', 'proof_notes', 'proof_photo_variants'}
+
+def publish_change(event_type, report_id):
+    """Push the committed state of a report to moderators, its citizen and its assigned
+    volunteer. Other volunteers get only what /api/tasks/available shows while the task
+    is open, and a bare removal once it is not. Call after commit."""
+    row = get_db().execute(CHANGE_EVENT_SQL, (report_id,)).fetchone()
+    if row is None:
+        return
+    item = with_photo_variants(dict(row))
+    if item['task_id'] is not None:
+        if item['status'] == 'valid' and item['task_status'] == 'pending' and item['assigned_volunteer_id'] is None:
+            available = {key: value for key, value in item.items() if key not in CHANGE_EVENT_PRIVATE}
+            event_broker.publish(event_type, {'item': available}, ['volunteer'])
+        else:
+            # Published first, so the assigned volunteer's own copy below lands after it
+            event_broker.publish(event_type, {'item': {'task_id': item['task_id'], 'removed': True}},
+                                 ['volunteer'])
+    if item['status'] != 'pending':
+        # Only the moderators' pending list shows the email
+        del item['citizen_email']
+    user_ids = [item['citizen_id']]
+    if item['assigned_volunteer_id'] is not None:
+        user_ids.append(item['assigned_volunteer_id'])
+    event_broker.publish(event_type, {'item': item}, ['moderator', 'admin'], user_ids)
+
+
+def publish_changes(event_type, report_ids):
+    """publish_change() for a batch; large batches tell every dashboard to reload instead"""
+    if len(report_ids) > app.config['BULK_EVENT_LIMIT']:
+        event_broker.publish('reset', {}, ['citizen', 'volunteer', 'moderator', 'admin'])
+        return
+    for report_id in report_ids:
+        publish_change(event_type, report_id)
+
+
+def publish_task_change(task_id):
+    row = get_db().execute('SELECT report_id FROM tasks WHERE id = ?', (task_id,)).fetchone()
+    if row:
+        publish_change('task.updated', row['report_id'])
+
+
+# Route SQL. Kept at module level so check_query_plans() explains exactly what the
+# routes run.
+MY_REPORTS_SQL = '''
+    SELECT r.*, t.status as task_status, t.id as task_id
+    FROM reports r
+    LEFT JOIN tasks t ON r.id = t.report_id
+    WHERE r.citizen_id = ?
+'''
+
+MY_TASKS_SQL = '''
+    SELECT r.*, t.id as task_id, t.status as task_status,
+           t.assigned_at, t.completed_at,
+           p.proof_photo_path, p.notes as proof_notes
+    FROM reports r
+    JOIN tasks t ON r.id = t.report_id
+    LEFT JOIN proofs p ON p.task_id = t.id
+    WHERE t.assigned_volunteer_id = ?
+'''
+
+VOLUNTEERS_SQL = '''
+    SELECT id, name, email
+    FROM users
+    WHERE role = 'volunteer'
+'''
+
+USER_REWARDS_SQL = '''
+    SELECT u.completed_count, w.tier, w.brand, w.code, w.description, w.created_at
+    FROM users u
+    LEFT JOIN rewards w ON w.user_id = u.id
+    WHERE u.id = ?
+    ORDER BY w.tier ASC
+'''
+
+HOTSPOTS_SQL = '''
+    SELECT label, count, lat_sum / count AS latitude, lng_sum / count AS longitude
+    FROM hotspot_cells
+    WHERE level = ?
+    ORDER BY count DESC
+    LIMIT 10
+'''
+
+MATCH_OPEN_TASKS_SQL = '''
+    SELECT t.id AS task_id, t.report_id, r.latitude, r.longitude, r.severity,
+           julianday('now') - julianday(r.created_at) AS age_days
+    FROM tasks t
+    JOIN reports r ON r.id = t.report_id
+    WHERE t.status = 'pending' AND t.assigned_volunteer_id IS NULL AND r.status = 'valid'
+'''
+
+# Located by their home area if set, else by the report of the latest-assigned
+# task they completed
+MATCH_VOLUNTEERS_SQL = '''
+    SELECT u.id,
+           COALESCE(u.home_latitude, recent.latitude) AS latitude,
+           COALESCE(u.home_longitude, recent.longitude) AS longitude,
+           (SELECT COUNT(*) FROM tasks o
+            WHERE o.assigned_volunteer_id = u.id AND o.status IN ('assigned', 'in_progress')) AS load
+    FROM users u
+    LEFT JOIN reports recent ON recent.id = (
+        SELECT c.report_id FROM tasks c
+        WHERE c.assigned_volunteer_id = u.id AND c.status = 'completed'
+        ORDER BY c.assigned_at DESC
+        LIMIT 1
+    )
+    WHERE u.role = 'volunteer'
+'''
+
+
+
+def encode_cursor(sort_value, row_id):
+    """Opaque keyset cursor for the last row of a page"""
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor(); raises ValueError for anything it did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    if not isinstance(row_id, int) or isinstance(sort_value, (list, dict)):
+        raise ValueError('Invalid cursor')
+    return sort_value, row_id
+
+
+def read_page_args():
+    """Return (limit, after) from ?limit=&cursor=, or None if the cursor is malformed"""
+    limit = request.args.get('limit', type=int) or app.config['PAGE_SIZE_DEFAULT']
+    limit = max(1, min(limit, app.config['PAGE_SIZE_MAX']))
+    token = request.args.get('cursor', '').strip()
+    if not token:
+        return limit, None
+    try:
+        return limit, decode_cursor(token)
+    except ValueError:
+        return None
+
+
+def keyset(query, params, sort_column, id_column, after, descending=True):
+    """Append the keyset condition and ORDER BY for a (sort, id) page walk"""
+    if after is not None:
+        query += f" AND ({sort_column}, {id_column}) {'<' if descending else '>'} (?, ?)"
+        params.extend(after)
+    direction = 'DESC' if descending else 'ASC'
+    query += f' ORDER BY {sort_column} {direction}, {id_column} {direction}'
+    return query, params
+
+
+def fetch_page(cursor, query, params, limit, sort_key, id_key):
+    """Run a keyset query for one page; returns (rows, next_cursor)"""
+    cursor.execute(query + ' LIMIT ?', [*params, limit + 1])
+    rows = cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][sort_key], rows[-1][id_key])
+    return rows, next_cursor
+
+
+def build_my_reports_query(citizen_id, after=None):
+    return keyset(MY_REPORTS_SQL, [citizen_id], 'r.created_at', 'r.id', after)
+
+
+def build_my_tasks_query(volunteer_id, after=None):
+    return keyset(MY_TASKS_SQL, [volunteer_id], 't.assigned_at', 't.id', after)
+
+
+def build_volunteers_query(after=None):
+    return keyset(VOLUNTEERS_SQL, [], 'name', 'id', after, descending=False)
+
+
+def build_timeseries_query(granularity, first, last, metrics=()):
+    """Rollup rows for buckets ``first``..``last``, optionally only some metrics"""
+    where, params = ['bucket BETWEEN ? AND ?'], [first, last]
+    if metrics:
+        where.append(f"metric IN ({', '.join('?' * len(metrics))})")
+        params += list(metrics)
+    query = f'''
+        SELECT bucket, metric, key, count
+        FROM {ROLLUP_TABLES[granularity]}
+        WHERE {' AND '.join(where)}
+    '''
+    return query, params
+
+
+def build_duplicate_query(phash, lat, lng, radius_km, window_days):
+    """Open, unflagged reports from the last ``window_days`` in the grid cells around
+    (lat, lng) whose photo hash matches ``phash`` exactly on at least one band"""
+    south, north, west, east = bounding_box(lat, lng, radius_km)
+    cell_deg = hotspot_cell_deg(DUPLICATE_CELL_LEVEL)
+    cells = [math.floor(south / cell_deg), math.floor(north / cell_deg),
+             math.floor(west / cell_deg), math.floor(east / cell_deg)]
+    # One OR term per band so each is a single range seek on the primary key
+    terms, params = [], []
+    for band, value in enumerate(hash_bands(phash)):
+        terms.append('(b.band = ? AND b.value = ? AND b.cell_lat BETWEEN ? AND ? AND b.cell_lng BETWEEN ? AND ?)')
+        params += [band, value, *cells]
+    query = f'''
+        SELECT DISTINCT r.id, r.status, r.latitude, r.longitude, r.photo_phash
+        FROM photo_hash_bands b
+        JOIN reports r ON r.id = b.report_id
+        WHERE ({' OR '.join(terms)})
+          AND r.status IN ('pending', 'valid', 'assigned', 'in_progress') AND r.duplicate_of IS NULL
+          AND r.created_at >= datetime('now', ?)
+    '''
+    return query, params + [f'-{window_days} days']
+
+
+def build_heatmap_query(level, bbox, limit):
+    """Cells of one hotspot level, densest first; ``bbox`` is (west, south, east, north) or None"""
+    where, params = ['level = ?'], [level]
+    if bbox:
+        west, south, east, north = bbox
+        cell_deg = hotspot_cell_deg(level)
+        where.append('cell_lat BETWEEN ? AND ? AND cell_lng BETWEEN ? AND ?')
+        params += [math.floor(south / cell_deg), math.floor(north / cell_deg),
+                   math.floor(west / cell_deg), math.floor(east / cell_deg)]
+    query = f'''
+        SELECT cell_lat, cell_lng, count, lat_sum / count AS latitude, lng_sum / count AS longitude, label
+        FROM hotspot_cells
+        WHERE {' AND '.join(where)}
+        ORDER BY count DESC
+        LIMIT ?
+    '''
+    return query, params + [limit]
+
+
+def fts_query(search):
+    """Turn free text into an FTS5 query where every word must match as a prefix"""
+    terms = re.findall(r'\w+', search)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def listing_sort_key(search='', near=None):
+    """Row key fetch_page() reads the cursor from, matching compose_listing()'s ORDER BY"""
+    if near:
+        return 'distance_km'
+    if fts_query(search):
+        return 'search_rank'
+    return 'created_at'
+
+
+def compose_listing(select, joins, where, params, search='', near=None, after=None):
+    """Build a reports listing: newest first by default, best FTS match first when
+    searching, nearest first when near=(lat, lng, radius_km) is given"""
+    select = list(select)
+    where = list(where)
+    params = list(params)
+    select_params = []
+    sources = ['reports r']
+    sort_column, descending = 'r.created_at', True
+
+    match = fts_query(search)
+    if match:
+        sources.append('JOIN reports_fts f ON f.rowid = r.id')
+        select.append('f.rank as search_rank')
+        where.append('reports_fts MATCH ?')
+        params.append(match)
+        sort_column, descending = 'f.rank', False
+
+    if near:
+        lat, lng, radius_km = near
+        south, north, west, east = bounding_box(lat, lng, radius_km)
+        # CROSS JOIN pins the R*Tree as the outer loop so only rows inside the box are visited
+        sources[0] = 'reports_geo g CROSS JOIN reports r ON r.id = g.id'
+        select.append('geo_distance_km(r.latitude, r.longitude, ?, ?) as distance_km')
+        select_params.extend([lat, lng])
+        where.extend(['g.max_lat >= ?', 'g.min_lat <= ?', 'g.max_lng >= ?', 'g.min_lng <= ?',
+                      'distance_km <= ?'])
+        params.extend([south, north, west, east, radius_km])
+        sort_column, descending = 'distance_km', False
+
+    query = f'''
+        SELECT {', '.join(select)}
+        FROM {' '.join(sources)}
+        {joins}
+        WHERE {' AND '.join(where) or '1=1'}
+    '''
+    return keyset(query, select_params + params, sort_column, 'r.id', after, descending)
+
+
+def build_pending_reports_query(after=None, near=None, duplicates=False):
+    """Pending reports; likely duplicates of another pending report only if ``duplicates``"""
+    where = ["r.status = 'pending'"]
+    if not duplicates:
+        where.append('r.duplicate_of IS NULL')
+    return compose_listing(
+        ['r.*', 'u.name as citizen_name', 'u.email as citizen_email'],
+        'JOIN users u ON r.citizen_id = u.id',
+        where, [],
+        near=near, after=after)
+
+
+def build_available_tasks_query(search='', after=None, near=None):
+    return compose_listing(
+        ['r.*', 't.id as task_id', 't.status as task_status', 'u.name as citizen_name'],
+        'JOIN tasks t ON r.id = t.report_id JOIN users u ON r.citizen_id = u.id',
+        ["r.status = 'valid'", "t.status = 'pending'", 't.assigned_volunteer_id IS NULL'], [],
+        search, near, after)
+
+
+def build_manage_tasks_query(status='', category='', search='', after=None, near=None):
+    where = []
+    params = []
+    if status:
+        where.append('t.status = ?')
+        params.append(status)
+    if category:
+        where.append('r.category = ?')
+        params.append(category)
+    return compose_listing(
+        ['t.id as task_id', 't.status', 't.assigned_at', 't.completed_at',
+         'r.id as report_id', 'r.created_at',
+         'r.category', 'r.description', 'r.location_text', 'r.severity',
+         'r.status as report_status', 'r.latitude', 'r.longitude',
+         'v.name as volunteer_name'],
+        'JOIN tasks t ON t.report_id = r.id LEFT JOIN users v ON t.assigned_volunteer_id = v.id',
+        where, params, search, near, after)
+
+
+SYNC_CHANGES_SQL = '''
+    SELECT seq, entity, entity_id, op
+    FROM change_log
+    WHERE seq > ?
+    ORDER BY seq
+    LIMIT ?
+'''
+
+# Current rows for a batch of changed ids. Every query exposes reports as r and
+# tasks as t so sync_scope() can filter all of them the same way.
+SYNC_ENTITY_SQL = {
+    'reports': 'SELECT r.* FROM reports r LEFT JOIN tasks t ON t.report_id = r.id WHERE r.id IN ({ids})',
+    'tasks': 'SELECT t.* FROM tasks t JOIN reports r ON r.id = t.report_id WHERE t.id IN ({ids})',
+    'proofs': '''SELECT p.* FROM proofs p JOIN tasks t ON t.id = p.task_id
+                 JOIN reports r ON r.id = t.report_id WHERE p.id IN ({ids})''',
+    'rewards': 'SELECT w.* FROM rewards w WHERE w.id IN ({ids})',
+}
+
+
+def sync_scope(entity, role, user_id):
+    """WHERE fragment limiting a synced entity to what ``role`` sees in its listings"""
+    if entity == 'rewards':
+        return 'w.user_id = ?', [user_id]
+    if role in ('moderator', 'admin'):
+        return '1', []
+    if role == 'volunteer':
+        return '''(r.citizen_id = ? OR t.assigned_volunteer_id = ?
+                   OR (r.status = 'valid' AND t.status = 'pending' AND t.assigned_volunteer_id IS NULL))''', \
+            [user_id, user_id]
+    return 'r.citizen_id = ?', [user_id]
+
+
+def build_sync_query(entity, ids, role, user_id):
+    scope, scope_params = sync_scope(entity, role, user_id)
+    query = SYNC_ENTITY_SQL[entity].format(ids=','.join('?' * len(ids))) + f' AND {scope}'
+    return query, list(ids) + scope_params
+
+
+def build_sync_hidden_query(entity, ids, role, user_id, since):
+    """Ids among ``ids`` that this user could see at some point after ``since`` (see migration 016)"""
+    audiences = [user_id, 0] if role == 'volunteer' else [user_id]
+    query = f'''
+        SELECT DISTINCT entity_id FROM sync_hidden
+        WHERE entity = ? AND entity_id IN ({','.join('?' * len(ids))})
+          AND audience IN ({','.join('?' * len(audiences))}) AND seq > ?
+    '''
+    return query, [entity, *ids, *audiences, since]
+
+
+def encode_sync_token(epoch, seq, full=False):
+    # A snapshot walk spans several pages; the mode rides along in the token
+    return encode_cursor(f'{epoch}:full' if full else epoch, seq)
+
+
+def read_sync_token(conn, token):
+    """(since, full) for ?since=; unknown, foreign or pruned tokens restart as a full
+    snapshot. Raises ValueError for malformed tokens."""
+    meta = dict(conn.execute('SELECT name, value FROM sync_meta').fetchall())
+    if not token:
+        return 0, True, meta['epoch']
+    mode, since = decode_cursor(token)
+    epoch, _, full = str(mode).partition(':')
+    if epoch != meta['epoch'] or since < meta['floor']:
+        return 0, True, meta['epoch']
+    return since, full == 'full', meta['epoch']
+
+
+# One row per report, task and proof (a task can have several proofs)
+EXPORT_COLUMNS = [
+    ('report_id', 'r.id'), ('created_at', 'r.created_at'), ('updated_at', 'r.updated_at'),
+    ('citizen_id', 'r.citizen_id'), ('category', 'r.category'), ('description', 'r.description'),
+    ('severity', 'r.severity'), ('location_text', 'r.location_text'), ('latitude', 'r.latitude'),
+    ('longitude', 'r.longitude'), ('report_status', 'r.status'), ('is_anonymous', 'r.is_anonymous'),
+    ('moderator_notes', 'r.moderator_notes'), ('photo_path', 'r.photo_path'),
+    ('task_id', 't.id'), ('task_status', 't.status'), ('assigned_volunteer_id', 't.assigned_volunteer_id'),
+    ('assigned_at', 't.assigned_at'), ('completed_at', 't.completed_at'),
+    ('proof_id', 'p.id'), ('proof_photo_path', 'p.proof_photo_path'), ('proof_notes', 'p.notes'),
+    ('proof_uploaded_at', 'p.uploaded_at'),
+]
+
+
+def build_export_query(date_from=None, date_to=None, status='', category=''):
+    """Export rows in (created_at, id) order; ``date_to`` is inclusive"""
+    where = []
+    params = []
+    if status:
+        where.append('r.status = ?')
+        params.append(status)
+    if category:
+        where.append('r.category = ?')
+        params.append(category)
+    if date_from:
+        where.append('r.created_at >= ?')
+        params.append(date_from)
+    if date_to:
+        where.append("r.created_at < date(?, '+1 day')")
+        params.append(date_to)
+    query = f'''
+        SELECT {', '.join(f'{expr} as {name}' for name, expr in EXPORT_COLUMNS)}
+        FROM reports r
+        LEFT JOIN tasks t ON t.report_id = r.id
+        LEFT JOIN proofs p ON p.task_id = t.id
+    '''
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    query += ' ORDER BY r.created_at, r.id, p.id'
+    return query, params
+
+
+# Tables that grow with usage; a SCAN of any of them is a regression unless the
+# query is listed in ORDERED_WALK_QUERIES, where walking an index in order is the point.
+LARGE_TABLES = {'users', 'reports', 'tasks', 'proofs', 'rewards', 'hotspot_cells', 'change_log',
+                'rollup_hourly', 'rollup_daily', 'photo_hash_bands'}
+ORDERED_WALK_QUERIES = {'tasks/manage', 'stats/hotspots', 'export'}
+SAMPLE_CURSOR = ('2024-01-01 00:00:00', 1)
+
+
+def hot_queries():
+    """(name, sql, params) for every route query, with representative parameters"""
+    return [
+        ('reports/my', *build_my_reports_query(1, SAMPLE_CURSOR)),
+        ('reports/pending', *build_pending_reports_query(SAMPLE_CURSOR)),
+        ('tasks/available', *build_available_tasks_query(after=SAMPLE_CURSOR)),
+        ('tasks/my', *build_my_tasks_query(1, SAMPLE_CURSOR)),
+        ('tasks/manage', *build_manage_tasks_query(after=SAMPLE_CURSOR)),
+        ('tasks/manage?status', *build_manage_tasks_query(status='pending', after=SAMPLE_CURSOR)),
+        ('tasks/manage?status&category', *build_manage_tasks_query(status='assigned', category='Litter')),
+        ('tasks/manage?q', *build_manage_tasks_query(search='park', after=(-1.5, 1))),
+        ('tasks/available?q', *build_available_tasks_query('central par', after=(-1.5, 1))),
+        ('tasks/available?near', *build_available_tasks_query(near=(40.75, -73.98, 5.0))),
+        ('reports/pending?near', *build_pending_reports_query(near=(40.75, -73.98, 5.0))),
+        ('tasks/manage?near', *build_manage_tasks_query(status='pending', near=(40.75, -73.98, 5.0))),
+        ('users/volunteers', *build_volunteers_query(('Volunteer', 1))),
+        ('stats/hotspots', HOTSPOTS_SQL, (HOTSPOT_TOP_LEVEL,)),
+        ('stats/heatmap', *build_heatmap_query(12, None, 5000)),
+        ('stats/heatmap?bbox', *build_heatmap_query(16, (-74.02, 40.70, -73.93, 40.80), 5000)),
+        ('stats/timeseries', *build_timeseries_query('day', '2024-01-01', '2024-01-30')),
+        ('reports/duplicates', *build_duplicate_query(-0x123456789abcdef, 40.75, -73.98, 0.05, 7)),
+        ('stats/timeseries?hour&metrics', *build_timeseries_query('hour', '2024-01-01 00:00', '2024-01-02 23:00',
+                                                                   ['category', 'transition'])),
+        ('rewards', USER_REWARDS_SQL, (1,)),
+        ('match/tasks', MATCH_OPEN_TASKS_SQL, ()),
+        ('match/volunteers', MATCH_VOLUNTEERS_SQL, ()),
+        ('login', 'SELECT id, name, email, password_hash, role FROM users WHERE email = ?', ('a@example.com',)),
+        ('tasks by report', 'UPDATE tasks SET status = status WHERE report_id = ?', (1,)),
+        ('sync/changes', SYNC_CHANGES_SQL, (0, 500)),
+        ('export', *build_export_query()),
+        ('export?status&dates', *build_export_query('2024-01-01', '2024-01-31', 'valid')),
+        *((f'sync/{entity}', *build_sync_query(entity, [1, 2, 3], 'volunteer', 1)) for entity in SYNC_TABLES),
+        ('sync/hidden', *build_sync_hidden_query('tasks', [1, 2, 3], 'volunteer', 1, 0)),
+    ]
+
+
+def check_query_plans(conn):
+    """Run EXPLAIN QUERY PLAN over hot_queries() and return the full-scan offenders"""
+    failures = []
+    for name, sql, params in hot_queries():
+        aliases = _table_aliases(sql)
+        for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall():
+            detail = row['detail']
+            parts = detail.split()
+            if len(parts) < 2 or parts[0] != 'SCAN' or 'VIRTUAL' in parts:
+                continue
+            if 'INDEX' in parts and name in ORDERED_WALK_QUERIES:
+                continue
+            if aliases.get(parts[1], parts[1]) in LARGE_TABLES:
+                failures.append((name, detail))
+    return failures
+
+
+def _table_aliases(sql):
+    tokens = sql.replace(',', ' ').split()
+    aliases = {}
+    for i, token in enumerate(tokens[:-1]):
+        if token.upper() in ('FROM', 'JOIN', 'UPDATE') and tokens[i + 1] in LARGE_TABLES:
+            table = tokens[i + 1]
+            aliases[table] = table
+            if i + 2 < len(tokens) and tokens[i + 2].isidentifier() and tokens[i + 2].upper() not in (
+                    'WHERE', 'JOIN', 'LEFT', 'ON', 'SET', 'ORDER', 'GROUP'):
+                aliases[tokens[i + 2]] = table
+    return aliases
+
+
+@app.cli.command('check-plans')
+@click.option('--analyze', is_flag=True, help='Refresh planner statistics first, as a long-running database has them')
+def check_plans_command(analyze):
+    """Fail if any route query regresses to a full table scan."""
+    init_db()
+    conn = get_db()
+    if analyze:
+        # Plans on an empty or never-analyzed database can hide scans real statistics expose
+        conn.execute('ANALYZE')
+        conn.commit()
+    failures = check_query_plans(conn)
+    for name, detail in failures:
+        print(f'FAIL {name}: {detail}')
+    if failures:
+        raise SystemExit(1)
+    print(f'OK: {len(hot_queries())} queries use indexes')
+
+def hasher_busy_response():
+    response = jsonify({'error': 'Too many sign-ins at once, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(app.config['PASSWORD_HASH_RETRY_AFTER'])
+    return response
+
+
+def upgrade_password_hash(conn, user, password):
+    """Re-hash with the configured parameters after a successful login; left for next time if the pool is busy"""
+    try:
+        with span('hash'):
+            new_hash = password_hasher.hash(password)
+    except HasherBusy:
+        return
+    # Compare-and-set, so a password changed meanwhile is not overwritten
+    conn.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                 (new_hash, user['id'], user['password_hash']))
+    conn.commit()
+
+
 # Authentication routes
 @app.route('/api/register', methods=['POST'])
 def register():
@@ -242,11 +2102,14 @@ def register():
     # Check if email exists
     cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
     if cursor.fetchone():
-        conn.close()
         return jsonify({'error': 'Email already registered'}), 400
     
     # Create user
-    password_hash = generate_password_hash(password)
+    try:
+        with span('hash'):
+            password_hash = password_hasher.hash(password)
+    except HasherBusy:
+        return hasher_busy_response()
     cursor.execute('''
         INSERT INTO users (name, email, password_hash, role)
         VALUES (?, ?, ?, ?)
@@ -254,7 +2117,7 @@ def register():
     
     user_id = cursor.lastrowid
     conn.commit()
-    conn.close()
+    stats_cache.invalidate()
     
     return jsonify({'message': 'Registration successful', 'user_id': user_id}), 201
 
@@ -271,10 +2134,19 @@ def login():
     cursor = conn.cursor()
     cursor.execute('SELECT id, name, email, password_hash, role FROM users WHERE email = ?', (email,))
     user = cursor.fetchone()
-    conn.close()
     
-    if not user or not check_password_hash(user['password_hash'], password):
+    # Unknown accounts are answered without taking a hashing slot
+    if user is None:
         return jsonify({'error': 'Invalid credentials'}), 401
+    try:
+        with span('hash'):
+            password_ok = password_hasher.verify(user['password_hash'], password)
+    except HasherBusy:
+        return hasher_busy_response()
+    if not password_ok:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    if password_hasher.needs_rehash(user['password_hash']):
+        upgrade_password_hash(conn, user, password)
     
     session['user_id'] = user['id']
     session['user_name'] = user['name']
@@ -307,30 +2179,38 @@ def get_current_user():
     })
 
 
+@app.route('/api/me/home', methods=['PUT'])
+@require_role('volunteer', 'admin')
+def set_home_area():
+    """Where automatic matching looks for tasks for this volunteer; null coordinates clear it"""
+    data = request.get_json(silent=True) or {}
+    lat = to_float(data.get('latitude'))
+    lng = to_float(data.get('longitude'))
+    clearing = data.get('latitude') is None and data.get('longitude') is None
+    if not clearing and (lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180):
+        return jsonify({'error': 'Invalid location'}), 400
+    conn = get_db()
+    conn.execute('UPDATE users SET home_latitude = ?, home_longitude = ? WHERE id = ?',
+                 (lat, lng, session['user_id']))
+    conn.commit()
+    return jsonify({'home_latitude': lat, 'home_longitude': lng})
+
+
 @app.route('/api/rewards', methods=['GET'])
 @require_login
+@versioned('users', 'rewards')
 def get_rewards():
     conn = get_db()
-    award_rewards_for_citizen(session['user_id'], conn)
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT COUNT(*) as count
-        FROM reports
-        WHERE citizen_id = ?
-          AND status = 'completed'
-    ''', (session['user_id'],))
-    row = cursor.fetchone()
-    valid_count = row['count'] if row else 0
+    cursor.execute(USER_REWARDS_SQL, (session['user_id'],))
+    rows = cursor.fetchall()
+    valid_count = rows[0]['completed_count'] if rows else 0
 
-    cursor.execute('''
-        SELECT tier, brand, code, description, created_at
-        FROM rewards
-        WHERE user_id = ?
-        ORDER BY tier ASC
-    ''', (session['user_id'],))
     rewards = []
     awarded_tiers = set()
-    for r in cursor.fetchall():
+    for r in rows:
+        if r['tier'] is None:
+            continue
         rewards.append({
             'tier': r['tier'],
             'brand': r['brand'],
@@ -350,9 +2230,6 @@ def get_rewards():
             }
             break
 
-    conn.commit()
-    conn.close()
-
     return jsonify({
         'valid_reports': valid_count,
         'rewards': rewards,
@@ -373,34 +2250,67 @@ def create_report():
     if file.filename == '' or not allowed_file(file.filename):
         return jsonify({'error': 'Invalid file. Only JPG or PNG allowed'}), 400
     
-    category = sanitize_text(request.form.get('category', ''))
-    description = sanitize_text(request.form.get('description', ''))
-    severity = request.form.get('severity', 'medium')
-    location_text = sanitize_text(request.form.get('location_text', ''))
-    latitude = to_float(request.form.get('latitude'))
-    longitude = to_float(request.form.get('longitude'))
-    is_anonymous = 1 if request.form.get('is_anonymous', 'false').lower() == 'true' else 0
-    
-    if not category or not description or not location_text:
-        return jsonify({'error': 'Category, description, and location are required'}), 400
+    fields, error = read_report_fields(request.form)
+    if error:
+        return jsonify({'error': error}), 400
     
     # Save file
-    filename = secure_filename(file.filename)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-    filename = timestamp + filename
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
-    
-    # Store relative path
-    photo_path = f'uploads/{filename}'
-    
+    stored = save_upload(file)
+    if stored is None:
+        return jsonify({'error': 'Invalid file. Only JPG or PNG allowed'}), 400
+    with span('phash'):
+        phash = dhash(get_upload_store().abspath(stored.path))
+
     conn = get_db()
     cursor = conn.cursor()
+    # Write lock first, so two uploads of the same photo cannot both miss each other
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        duplicate = find_duplicate(cursor, phash, fields['latitude'], fields['longitude'])
+        report_id, is_new_upload = insert_report(cursor, session['user_id'], fields, stored, phash,
+                                                 duplicate['id'] if duplicate else None)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    stats_cache.invalidate()
+    if is_new_upload:
+        image_pipeline.submit(get_upload_store(), stored)
+    publish_change('report.created', report_id)
+    
+    return jsonify({'message': 'Report created successfully', 'report_id': report_id,
+                    'duplicate_of': duplicate['id'] if duplicate else None}), 201
+
+
+def find_duplicate(cursor, phash, lat, lng):
+    """The open report whose photo most likely shows the same thing, or None.
+
+    Candidates come from the photo hash index: close by, recent and matching
+    on a hash band. The nearest hash wins, then the nearest location.
+    """
+    if phash is None or lat is None or lng is None:
+        return None
+    radius_km = app.config['DUPLICATE_RADIUS_M'] / 1000
+    query, params = build_duplicate_query(phash, lat, lng, radius_km, app.config['DUPLICATE_WINDOW_DAYS'])
+    best, best_key = None, None
+    for row in cursor.execute(query, params).fetchall():
+        bits = hamming(phash, row['photo_phash'])
+        if bits > app.config['DUPLICATE_MAX_DISTANCE']:
+            continue
+        distance_km = haversine_km(lat, lng, row['latitude'], row['longitude'])
+        if distance_km <= radius_km and (best_key is None or (bits, distance_km) < best_key):
+            best, best_key = row, (bits, distance_km)
+    return best
+
+def insert_report(cursor, citizen_id, fields, stored, photo_phash=None, duplicate_of=None):
+    """Insert a pending report with its task; returns (report_id, is_new_upload)"""
+    is_new_upload = register_upload(cursor, stored)
     cursor.execute('''
-        INSERT INTO reports (citizen_id, category, description, severity, location_text, latitude, longitude, photo_path, status, is_anonymous)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)
-    ''', (session['user_id'], category, description, severity, location_text, 
-          latitude, longitude, photo_path, is_anonymous))
+        INSERT INTO reports (citizen_id, category, description, severity, location_text, latitude, longitude, photo_path, status, is_anonymous,
+                             photo_phash, duplicate_of)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?, ?)
+    ''', (citizen_id, fields['category'], fields['description'], fields['severity'], fields['location_text'],
+          fields['latitude'], fields['longitude'], stored.path, fields['is_anonymous'], photo_phash, duplicate_of))
     
     report_id = cursor.lastrowid
     
@@ -409,27 +2319,182 @@ def create_report():
         INSERT INTO tasks (report_id, status)
         VALUES (?, 'pending')
     ''', (report_id,))
-    
-    conn.commit()
-    conn.close()
-    
-    return jsonify({'message': 'Report created successfully', 'report_id': report_id}), 201
+    return report_id, is_new_upload
+
+
+def import_key(citizen_id, row):
+    """Idempotency key: the partner's external_id, else a hash of the row itself"""
+    external_id = (row.get('external_id') or '').strip()
+    if not external_id:
+        canonical = json.dumps(row, sort_keys=True, separators=(',', ':'))
+        external_id = 'sha256:' + hashlib.sha256(canonical.encode()).hexdigest()
+    return f'{citizen_id}:{external_id}'
+
+
+class ReportImport:
+    """Imports parsed rows in chunked transactions and keeps the running summary"""
+
+    def __init__(self, conn, photos, citizen_id):
+        self.conn = conn
+        self.photos = photos
+        self.citizen_id = citizen_id
+        self.store = get_upload_store()
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line, error):
+        self.failed += 1
+        if len(self.errors) < app.config['IMPORT_MAX_ERRORS']:
+            self.errors.append({'line': line, 'error': error})
+
+    def run(self, rows):
+        started = time.perf_counter()
+        chunk = []
+        for line, row, error in rows:
+            if error:
+                self.fail(line, error)
+                continue
+            fields, error = read_report_fields(row)
+            if error:
+                self.fail(line, error)
+                continue
+            chunk.append((line, import_key(self.citizen_id, row), fields, row.get('photo')))
+            if len(chunk) >= app.config['IMPORT_CHUNK_SIZE']:
+                self.flush(chunk)
+                chunk = []
+        if chunk:
+            self.flush(chunk)
+        elapsed = time.perf_counter() - started
+        return {
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'failed': self.failed,
+            'errors': self.errors,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round((self.imported + self.duplicates + self.failed) / elapsed, 1) if elapsed else None,
+        }
+
+    def flush(self, chunk):
+        # Rows a previous (retried) import already wrote are skipped before any photo work
+        keys = json.dumps([key for _, key, _, _ in chunk])
+        known = {row['key'] for row in self.conn.execute(
+            'SELECT key FROM import_keys WHERE key IN (SELECT value FROM json_each(?))', (keys,))}
+
+        prepared = []
+        for line, key, fields, photo in chunk:
+            if key in known:
+                self.duplicates += 1
+                continue
+            try:
+                stream = self.photos.open(photo)
+                try:
+                    stored = self.store.save(stream)
+                finally:
+                    stream.close()
+            except (PhotoUnavailable, UnsupportedUpload) as exc:
+                self.fail(line, str(exc))
+                continue
+            prepared.append((key, fields, stored))
+
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN')
+        report_ids, new_uploads, duplicates = [], [], 0
+        try:
+            for key, fields, stored in prepared:
+                # Also catches repeats within one file and concurrent imports
+                cursor.execute('INSERT OR IGNORE INTO import_keys (key) VALUES (?)', (key,))
+                if cursor.rowcount == 0:
+                    duplicates += 1
+                    continue
+                report_id, is_new_upload = insert_report(cursor, self.citizen_id, fields, stored)
+                cursor.execute('UPDATE import_keys SET report_id = ? WHERE key = ?', (report_id, key))
+                report_ids.append(report_id)
+                if is_new_upload:
+                    new_uploads.append(stored)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        self.imported += len(report_ids)
+        self.duplicates += duplicates
+        if report_ids:
+            stats_cache.invalidate()
+            publish_changes('report.created', report_ids)
+        for stored in new_uploads:
+            image_pipeline.submit(self.store, stored)
+
+
+def photo_source(archive=None):
+    return PhotoSource(archive, allow_urls=app.config['IMPORT_ALLOW_PHOTO_URLS'],
+                       max_bytes=app.config['MAX_CONTENT_LENGTH'], allowed_extensions=ALLOWED_EXTENSIONS)
+
+
+@app.route('/api/reports/import', methods=['POST'])
+@require_role('admin')
+def import_reports_route():
+    """Bulk import from a CSV/NDJSON ``file`` plus an optional zip ``archive`` of photos"""
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'Import file is required'}), 400
+    fmt = detect_format(file.filename, request.form.get('format'))
+    if fmt is None:
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+
+    archive = request.files.get('archive')
+    try:
+        photos = photo_source(archive.stream if archive else None)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    with photos:
+        summary = ReportImport(get_db(), photos, session['user_id']).run(iter_rows(file.stream, fmt))
+    return jsonify(summary)
+
+
+@app.cli.command('import-reports')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--as', 'email', required=True, help='Account the reports are filed under')
+@click.option('--archive', type=click.Path(exists=True, dir_okay=False), help='Zip of the photos rows refer to')
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), help='Defaults to the file extension')
+def import_reports_command(path, email, archive, fmt):
+    """Bulk import reports from a CSV or NDJSON file."""
+    init_db()
+    fmt = detect_format(path, fmt)
+    if fmt is None:
+        raise click.UsageError('Cannot tell the format from the extension; pass --format')
+    conn = get_db()
+    user = conn.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()
+    if user is None:
+        raise click.UsageError(f'No user with email {email}')
+
+    with open(path, 'rb') as data, photo_source(archive) as photos:
+        summary = ReportImport(conn, photos, user['id']).run(iter_rows(data, fmt))
+    image_pipeline.shutdown(wait=True)
+
+    print(f"Imported {summary['imported']}, duplicates {summary['duplicates']}, failed {summary['failed']} "
+          f"in {summary['seconds']}s ({summary['rows_per_second']} rows/s)")
+    for error in summary['errors']:
+        print(f"  line {error['line']}: {error['error']}")
+
 
 @app.route('/api/reports/my', methods=['GET'])
 @require_login
+@versioned('reports', 'tasks')
 def get_my_reports():
     conn = get_db()
+    page = read_page_args()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit, after = page
+
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT r.*, t.status as task_status, t.id as task_id
-        FROM reports r
-        LEFT JOIN tasks t ON r.id = t.report_id
-        WHERE r.citizen_id = ?
-        ORDER BY r.created_at DESC
-    ''', (session['user_id'],))
+    query, params = build_my_reports_query(session['user_id'], after)
+    rows, next_cursor = fetch_page(cursor, query, params, limit, 'created_at', 'id')
     
     reports = []
-    for row in cursor.fetchall():
+    for row in rows:
         reports.append({
             'id': row['id'],
             'category': row['category'],
@@ -445,31 +2510,35 @@ def get_my_reports():
             'created_at': row['created_at'],
             'updated_at': row['updated_at'],
             'task_status': row['task_status'],
-            'task_id': row['task_id']
+            'task_id': row['task_id'],
+            'photo_variants': variant_urls(row['photo_path'])
         })
     
-    conn.close()
-    return jsonify(reports)
+    return jsonify({'items': reports, 'next_cursor': next_cursor})
 
 @app.route('/api/reports/pending', methods=['GET'])
 @require_role('moderator', 'admin')
+@versioned('reports')
 def get_pending_reports():
+    page = read_page_args()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit, after = page
+    try:
+        near = read_near_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid location'}), 400
+
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT r.*, u.name as citizen_name, u.email as citizen_email
-        FROM reports r
-        JOIN users u ON r.citizen_id = u.id
-        WHERE r.status = 'pending'
-        ORDER BY r.created_at DESC
-    ''')
+    query, params = build_pending_reports_query(after, near, duplicates=request.args.get('duplicates') == '1')
+    rows, next_cursor = fetch_page(cursor, query, params, limit, listing_sort_key(near=near), 'id')
     
     reports = []
-    for row in cursor.fetchall():
-        reports.append(dict(row))
+    for row in rows:
+        reports.append(with_photo_variants(dict(row)))
     
-    conn.close()
-    return jsonify(reports)
+    return jsonify({'items': reports, 'next_cursor': next_cursor})
 
 @app.route('/api/reports/<int:report_id>/validate', methods=['POST'])
 @require_role('moderator', 'admin')
@@ -484,7 +2553,6 @@ def validate_report(report_id):
     cursor.execute('SELECT citizen_id FROM reports WHERE id = ?', (report_id,))
     report = cursor.fetchone()
     if not report:
-        conn.close()
         return jsonify({'error': 'Report not found'}), 404
     
     new_status = 'valid' if is_valid else 'invalid'
@@ -499,15 +2567,177 @@ def validate_report(report_id):
         SET status = 'pending', assigned_volunteer_id = NULL
         WHERE report_id = ?
     ''', (report_id,))
-
-    if is_valid:
-        award_rewards_for_citizen(report['citizen_id'], conn)
     
     conn.commit()
-    conn.close()
+    stats_cache.invalidate()
+    publish_change('report.updated', report_id)
     
     return jsonify({'message': f'Report marked as {new_status}'})
 
+def read_bulk_items(data, shared_fields):
+    """Items of a bulk request body, or None if the body is malformed.
+
+    Accepts ``{"items": [{"report_id": 1, ...}, ...]}``, or ``{"report_ids": [...]}``
+    with ``shared_fields`` given once at the top level for every report.
+    """
+    if not isinstance(data, dict):
+        return None
+    if 'items' in data:
+        items = data['items']
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return None
+        return items
+    report_ids = data.get('report_ids')
+    if not isinstance(report_ids, list):
+        return None
+    shared = {field: data[field] for field in shared_fields if field in data}
+    return [{**shared, 'report_id': report_id} for report_id in report_ids]
+
+
+def is_row_id(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def index_bulk_items(items, results):
+    """Map report_id -> position for well-formed, first-seen ids; fill results for the rest"""
+    positions = {}
+    for i, item in enumerate(items):
+        report_id = item.get('report_id')
+        if not is_row_id(report_id):
+            results[i] = {'report_id': report_id, 'ok': False, 'error': 'Invalid report ID'}
+        elif report_id in positions:
+            results[i] = {'report_id': report_id, 'ok': False, 'error': 'Duplicate report ID'}
+        else:
+            positions[report_id] = i
+    return positions
+
+
+def bulk_response(results):
+    succeeded = sum(1 for result in results if result['ok'])
+    return jsonify({'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded})
+
+
+def bulk_validate(cursor, items):
+    """Apply moderation decisions with one executemany per table; returns
+    (per-item results in input order, ids of the reports changed)"""
+    results = [None] * len(items)
+    positions = index_bulk_items(items, results)
+    cursor.execute('SELECT id FROM reports WHERE id IN (SELECT value FROM json_each(?))',
+                   (json.dumps(list(positions)),))
+    existing = {row['id'] for row in cursor.fetchall()}
+
+    updates = []
+    for report_id, i in positions.items():
+        if report_id not in existing:
+            results[i] = {'report_id': report_id, 'ok': False, 'error': 'Report not found'}
+            continue
+        new_status = 'valid' if items[i].get('is_valid', True) else 'invalid'
+        notes = str(items[i].get('notes') or '').strip()
+        updates.append((new_status, notes, report_id))
+        results[i] = {'report_id': report_id, 'ok': True, 'status': new_status}
+
+    cursor.executemany('''
+        UPDATE reports
+        SET status = ?, moderator_notes = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', updates)
+    cursor.executemany('''
+        UPDATE tasks
+        SET status = 'pending', assigned_volunteer_id = NULL
+        WHERE report_id = ?
+    ''', [(report_id,) for _, _, report_id in updates])
+    return results, [report_id for _, _, report_id in updates]
+
+
+def bulk_assign(cursor, items):
+    """Assign volunteers to many reports. Runs inside BEGIN IMMEDIATE, so the state
+    read here cannot change before the executemany; the same rules as the
+    single-report compare-and-set apply."""
+    results = [None] * len(items)
+    positions = index_bulk_items(items, results)
+    cursor.execute('''
+        SELECT r.id, r.status, t.status as task_status
+        FROM reports r
+        LEFT JOIN tasks t ON t.report_id = r.id
+        WHERE r.id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(list(positions)),))
+    reports = {row['id']: row for row in cursor.fetchall()}
+    volunteer_ids = {items[i].get('volunteer_id') for i in positions.values()
+                     if is_row_id(items[i].get('volunteer_id'))}
+    cursor.execute('''
+        SELECT id FROM users
+        WHERE id IN (SELECT value FROM json_each(?)) AND role IN ('volunteer', 'admin')
+    ''', (json.dumps(list(volunteer_ids)),))
+    volunteers = {row['id'] for row in cursor.fetchall()}
+
+    assignments = []
+    for report_id, i in positions.items():
+        volunteer_id = items[i].get('volunteer_id')
+        report = reports.get(report_id)
+        error = None
+        if report is None:
+            error = 'Report not found'
+        elif not is_row_id(volunteer_id) or volunteer_id not in volunteers:
+            error = 'Invalid volunteer'
+        elif report['status'] == 'invalid':
+            error = 'Cannot assign an invalid report'
+        elif report['task_status'] is None or report['task_status'] == 'completed':
+            error = 'Report can no longer be assigned'
+        if error:
+            results[i] = {'report_id': report_id, 'ok': False, 'error': error}
+            continue
+        assignments.append((volunteer_id, report_id))
+        results[i] = {'report_id': report_id, 'ok': True, 'volunteer_id': volunteer_id}
+
+    cursor.executemany('''
+        UPDATE tasks
+        SET assigned_volunteer_id = ?, status = 'assigned', assigned_at = CURRENT_TIMESTAMP
+        WHERE report_id = ?
+    ''', assignments)
+    cursor.executemany('''
+        UPDATE reports
+        SET status = 'assigned', updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', [(report_id,) for _, report_id in assignments])
+    return results, [report_id for _, report_id in assignments]
+
+
+def run_bulk(apply, shared_fields, event_type):
+    """Shared body of the bulk routes: parse, apply in one write transaction, publish"""
+    items = read_bulk_items(request.get_json(silent=True), shared_fields)
+    if items is None:
+        return jsonify({'error': 'Expected "items" or "report_ids" list'}), 400
+    if len(items) > app.config['BULK_MAX_ITEMS']:
+        return jsonify({'error': f"At most {app.config['BULK_MAX_ITEMS']} reports per request"}), 400
+
+    conn = get_db()
+    cursor = conn.cursor()
+    # Take the write lock up front: checks and updates see the same state
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        results, changed = apply(cursor, items)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if changed:
+        stats_cache.invalidate()
+        publish_changes(event_type, changed)
+    return bulk_response(results)
+
+
+@app.route('/api/reports/bulk/validate', methods=['POST'])
+@require_role('moderator', 'admin')
+def bulk_validate_reports():
+    return run_bulk(bulk_validate, ('is_valid', 'notes'), 'report.updated')
+
+
+@app.route('/api/reports/bulk/assign', methods=['POST'])
+@require_role('moderator', 'admin')
+def bulk_assign_reports():
+    return run_bulk(bulk_assign, ('volunteer_id',), 'task.updated')
+
+
 @app.route('/api/reports/<int:report_id>/assign', methods=['POST'])
 @require_role('moderator', 'admin')
 def assign_report(report_id):
@@ -523,10 +2753,8 @@ def assign_report(report_id):
     cursor.execute('SELECT status FROM reports WHERE id = ?', (report_id,))
     report = cursor.fetchone()
     if not report:
-        conn.close()
         return jsonify({'error': 'Report not found'}), 404
     if report['status'] == 'invalid':
-        conn.close()
         return jsonify({'error': 'Cannot assign an invalid report'}), 400
     
     # Verify volunteer exists and is a volunteer
@@ -535,6 +2763,19 @@ def assign_report(report_id):
     if not volunteer or volunteer['role'] not in ['volunteer', 'admin']:
         return jsonify({'error': 'Invalid volunteer'}), 400
     
+    # Compare-and-set on the task: loses cleanly if the report was invalidated or
+    # the task completed since the checks above
+    cursor.execute('''
+        UPDATE tasks
+        SET assigned_volunteer_id = ?, status = 'assigned', assigned_at = CURRENT_TIMESTAMP
+        WHERE report_id = ?
+          AND status != 'completed'
+          AND EXISTS (SELECT 1 FROM reports WHERE id = ? AND status != 'invalid')
+    ''', (volunteer_id, report_id, report_id))
+    if cursor.rowcount == 0:
+        conn.rollback()
+        return jsonify({'error': 'Report can no longer be assigned'}), 409
+    
     # Update report status
     cursor.execute('''
         UPDATE reports
@@ -542,74 +2783,59 @@ def assign_report(report_id):
         WHERE id = ?
     ''', (report_id,))
     
-    # Update task
-    cursor.execute('''
-        UPDATE tasks
-        SET assigned_volunteer_id = ?, status = 'assigned', assigned_at = CURRENT_TIMESTAMP
-        WHERE report_id = ?
-    ''', (volunteer_id, report_id))
-    
     conn.commit()
-    conn.close()
+    publish_change('task.updated', report_id)
     
     return jsonify({'message': 'Task assigned successfully'})
 
 # Tasks routes
 @app.route('/api/tasks/available', methods=['GET'])
 @require_role('volunteer', 'admin')
+@versioned('reports', 'tasks')
 def get_available_tasks():
+    page = read_page_args()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit, after = page
+    try:
+        near = read_near_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid location'}), 400
+
     conn = get_db()
     cursor = conn.cursor()
     search = sanitize_text(request.args.get('q', ''))
-    query = '''
-        SELECT r.*, t.id as task_id, t.status as task_status,
-               u.name as citizen_name
-        FROM reports r
-        JOIN tasks t ON r.id = t.report_id
-        JOIN users u ON r.citizen_id = u.id
-        WHERE r.status = 'valid'
-        AND t.status = 'pending'
-        AND t.assigned_volunteer_id IS NULL
-    '''
-    params = []
-    if search:
-        query += ' AND (r.location_text LIKE ? OR r.description LIKE ?)'
-        like = f'%{search}%'
-        params.extend([like, like])
-    query += ' ORDER BY r.created_at DESC'
-    cursor.execute(query, params)
+    query, params = build_available_tasks_query(search, after, near)
+    rows, next_cursor = fetch_page(cursor, query, params, limit, listing_sort_key(search, near), 'id')
     
     tasks = []
-    for row in cursor.fetchall():
-        tasks.append(dict(row))
+    for row in rows:
+        tasks.append(with_photo_variants(dict(row)))
     
-    conn.close()
-    return jsonify(tasks)
+    return jsonify({'items': tasks, 'next_cursor': next_cursor})
 
 
 @app.route('/api/tasks/my', methods=['GET'])
 @require_role('volunteer', 'admin')
+@versioned('reports', 'tasks', 'proofs')
 def get_my_tasks():
+    page = read_page_args()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit, after = page
+
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT r.*, t.id as task_id, t.status as task_status,
-               t.assigned_at, t.completed_at,
-               p.proof_photo_path, p.notes as proof_notes
-        FROM reports r
-        JOIN tasks t ON r.id = t.report_id
-        LEFT JOIN proofs p ON p.task_id = t.id
-        WHERE t.assigned_volunteer_id = ?
-        ORDER BY COALESCE(t.assigned_at, r.created_at) DESC
-    ''', (session['user_id'],))
+    query, params = build_my_tasks_query(session['user_id'], after)
+    rows, next_cursor = fetch_page(cursor, query, params, limit, 'assigned_at', 'task_id')
 
-    tasks = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(tasks)
+    tasks = [with_photo_variants(dict(row)) for row in rows]
+    return jsonify({'items': tasks, 'next_cursor': next_cursor})
 
 
 @app.route('/api/tasks/manage', methods=['GET'])
 @require_role('moderator', 'admin')
+@versioned('reports', 'tasks', 'users')
 def manage_tasks():
     status = request.args.get('status', '').strip()
     category = sanitize_text(request.args.get('category', '').strip())
@@ -619,35 +2845,77 @@ def manage_tasks():
     if status and status not in valid_task_statuses:
         status = ''
 
+    page = read_page_args()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit, after = page
+    try:
+        near = read_near_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid location'}), 400
+
     conn = get_db()
     cursor = conn.cursor()
-    query = '''
-        SELECT t.id as task_id, t.status, t.assigned_at, t.completed_at,
-               r.category, r.description, r.location_text, r.severity,
-               r.status as report_status,
-               v.name as volunteer_name
-        FROM tasks t
-        JOIN reports r ON t.report_id = r.id
-        LEFT JOIN users v ON t.assigned_volunteer_id = v.id
-        WHERE 1=1
-    '''
-    params = []
-    if status:
-        query += ' AND t.status = ?'
-        params.append(status)
-    if category:
-        query += ' AND r.category = ?'
-        params.append(category)
-    if search:
-        query += ' AND (r.description LIKE ? OR r.location_text LIKE ?)'
-        like = f'%{search}%'
-        params.extend([like, like])
-    query += ' ORDER BY r.created_at DESC'
+    query, params = build_manage_tasks_query(status, category, search, after, near)
+    rows, next_cursor = fetch_page(cursor, query, params, limit, listing_sort_key(search, near), 'report_id')
+    tasks = [with_photo_variants(dict(row)) for row in rows]
+    return jsonify({'items': tasks, 'next_cursor': next_cursor})
+
+
+def run_matching(dry_run=False):
+    """Match valid, unassigned tasks to volunteers and, unless dry_run, assign them
+    in one write transaction. Returns a summary for the route and the CLI."""
+    started = time.perf_counter()
+    conn = get_db()
+    cursor = conn.cursor()
+    if not dry_run:
+        # As in run_bulk: the loads and open tasks read below cannot change before the updates
+        cursor.execute('BEGIN IMMEDIATE')
+    try:
+        tasks = [OpenTask(row['task_id'], row['report_id'], row['latitude'], row['longitude'],
+                          row['severity'], row['age_days'])
+                 for row in cursor.execute(MATCH_OPEN_TASKS_SQL).fetchall()]
+        volunteers = [Volunteer(row['id'], row['latitude'], row['longitude'], row['load'])
+                      for row in cursor.execute(MATCH_VOLUNTEERS_SQL).fetchall()]
+        assignments = match_tasks(tasks, volunteers, app.config['MATCH_MAX_DISTANCE_KM'],
+                                  app.config['MATCH_MAX_LOAD'], app.config['MATCH_CANDIDATES'],
+                                  app.config['MATCH_WEIGHTS'], app.config['MATCH_AGE_HORIZON_DAYS'],
+                                  app.config['MATCH_UNLOCATED'])
+        if not dry_run:
+            cursor.executemany('''
+                UPDATE tasks
+                SET assigned_volunteer_id = ?, status = 'assigned', assigned_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'pending' AND assigned_volunteer_id IS NULL
+            ''', [(a.volunteer_id, a.task_id) for a in assignments])
+            cursor.executemany('''
+                UPDATE reports
+                SET status = 'assigned', updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'valid'
+            ''', [(a.report_id,) for a in assignments])
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if assignments and not dry_run:
+        tasks_auto_assigned.inc(len(assignments))
+        stats_cache.invalidate()
+        publish_changes('task.updated', [a.report_id for a in assignments])
+    return {
+        'dry_run': dry_run,
+        'open_tasks': len(tasks),
+        'volunteers': len(volunteers),
+        'assigned': len(assignments),
+        'unmatched': len(tasks) - len(assignments),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        'assignments': [a._asdict() for a in assignments],
+    }
+
 
-    cursor.execute(query, params)
-    tasks = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(tasks)
+@app.route('/api/tasks/match', methods=['POST'])
+@require_role('moderator', 'admin')
+def auto_assign_tasks():
+    """Assign open tasks to nearby volunteers with spare capacity; ?dry_run=1 only returns the plan"""
+    return jsonify(run_matching(dry_run=request.args.get('dry_run') == '1'))
 
 @app.route('/api/tasks/<int:task_id>/claim', methods=['POST'])
 @require_role('volunteer', 'admin')
@@ -655,38 +2923,34 @@ def claim_task(task_id):
     conn = get_db()
     cursor = conn.cursor()
     
-    # Check if task exists and is available
-    cursor.execute('''
-        SELECT t.*, r.status as report_status
-        FROM tasks t
-        JOIN reports r ON t.report_id = r.id
-        WHERE t.id = ?
-    ''', (task_id,))
-    
-    task = cursor.fetchone()
-    if not task:
-        return jsonify({'error': 'Task not found'}), 404
-    if task['status'] not in ('pending', 'assigned'):
-        return jsonify({'error': 'Task cannot be claimed'}), 400
-    
-    if task['assigned_volunteer_id'] and task['assigned_volunteer_id'] != session['user_id']:
-        return jsonify({'error': 'Task already assigned'}), 400
-    
-    # Assign to current user
+    # Compare-and-set: the availability check and the assignment are one statement,
+    # so of several concurrent claimers exactly one matches the WHERE clause
     cursor.execute('''
         UPDATE tasks
         SET assigned_volunteer_id = ?, status = 'assigned', assigned_at = CURRENT_TIMESTAMP
         WHERE id = ?
-    ''', (session['user_id'], task_id))
+          AND status IN ('pending', 'assigned')
+          AND (assigned_volunteer_id IS NULL OR assigned_volunteer_id = ?)
+    ''', (session['user_id'], task_id, session['user_id']))
+    
+    if cursor.rowcount == 0:
+        conn.rollback()
+        cursor.execute('SELECT status FROM tasks WHERE id = ?', (task_id,))
+        task = cursor.fetchone()
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+        if task['status'] not in ('pending', 'assigned'):
+            return jsonify({'error': 'Task cannot be claimed'}), 400
+        return jsonify({'error': 'Task already assigned'}), 409
     
     cursor.execute('''
         UPDATE reports
         SET status = 'assigned', updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (task['report_id'],))
+        WHERE id = (SELECT report_id FROM tasks WHERE id = ?)
+    ''', (task_id,))
     
     conn.commit()
-    conn.close()
+    publish_task_change(task_id)
     
     return jsonify({'message': 'Task claimed successfully'})
 
@@ -696,29 +2960,28 @@ def start_task(task_id):
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT report_id, status FROM tasks WHERE id = ? AND assigned_volunteer_id = ?', 
-                   (task_id, session['user_id']))
-    task = cursor.fetchone()
-    
-    if not task:
-        return jsonify({'error': 'Task not found or not assigned to you'}), 404
-    if task['status'] == 'completed':
-        return jsonify({'error': 'Task already completed'}), 400
-    
     cursor.execute('''
         UPDATE tasks
         SET status = 'in_progress'
-        WHERE id = ?
-    ''', (task_id,))
+        WHERE id = ? AND assigned_volunteer_id = ? AND status != 'completed'
+    ''', (task_id, session['user_id']))
+    
+    if cursor.rowcount == 0:
+        conn.rollback()
+        cursor.execute('SELECT status FROM tasks WHERE id = ? AND assigned_volunteer_id = ?',
+                       (task_id, session['user_id']))
+        if not cursor.fetchone():
+            return jsonify({'error': 'Task not found or not assigned to you'}), 404
+        return jsonify({'error': 'Task already completed'}), 400
     
     cursor.execute('''
         UPDATE reports
         SET status = 'in_progress', updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (task['report_id'],))
+        WHERE id = (SELECT report_id FROM tasks WHERE id = ?)
+    ''', (task_id,))
     
     conn.commit()
-    conn.close()
+    publish_task_change(task_id)
     
     return jsonify({'message': 'Task started'})
 
@@ -737,8 +3000,12 @@ def complete_task(task_id):
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT report_id, status FROM tasks WHERE id = ? AND assigned_volunteer_id = ?', 
-                   (task_id, session['user_id']))
+    cursor.execute('''
+        SELECT t.report_id, t.status, r.citizen_id
+        FROM tasks t
+        JOIN reports r ON t.report_id = r.id
+        WHERE t.id = ? AND t.assigned_volunteer_id = ?
+    ''', (task_id, session['user_id']))
     task = cursor.fetchone()
     
     if not task:
@@ -747,13 +3014,21 @@ def complete_task(task_id):
         return jsonify({'error': 'Task is not in a completable state'}), 400
     
     # Save proof photo
-    filename = secure_filename(file.filename)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-    filename = timestamp + filename
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    stored = save_upload(file)
+    if stored is None:
+        return jsonify({'error': 'Invalid file. Only JPG or PNG allowed'}), 400
+    proof_photo_path = stored.path
+    is_new_upload = register_upload(cursor, stored)
     
-    proof_photo_path = f'uploads/{filename}'
+    # Update task; compare-and-set so a concurrent completion of the same task loses
+    cursor.execute('''
+        UPDATE tasks
+        SET status = 'completed', completed_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND assigned_volunteer_id = ? AND status IN ('assigned', 'in_progress')
+    ''', (task_id, session['user_id']))
+    if cursor.rowcount == 0:
+        conn.rollback()
+        return jsonify({'error': 'Task is not in a completable state'}), 409
     
     # Create proof record
     cursor.execute('''
@@ -761,106 +3036,638 @@ def complete_task(task_id):
         VALUES (?, ?, ?, ?)
     ''', (task_id, session['user_id'], proof_photo_path, notes))
     
-    # Update task
-    cursor.execute('''
-        UPDATE tasks
-        SET status = 'completed', completed_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (task_id,))
-    
     # Update report
     cursor.execute('''
         UPDATE reports
         SET status = 'completed', updated_at = CURRENT_TIMESTAMP
         WHERE id = ?
     ''', (task['report_id'],))
+
+    record_completion(cursor, task['citizen_id'])
     
     conn.commit()
-    conn.close()
+    stats_cache.invalidate()
+    if is_new_upload:
+        image_pipeline.submit(get_upload_store(), stored)
+    publish_change('task.updated', task['report_id'])
     
     return jsonify({'message': 'Task completed successfully'})
 
 # Analytics routes
+STATS_TABLES = ('reports', 'tasks', 'users')
+
+
 @app.route('/api/stats', methods=['GET'])
 @require_role('moderator', 'admin')
+@versioned(*STATS_TABLES)
 def get_stats():
+    # Keyed on the versions the ETag is built from, so a cached body never outlives them
+    versions = tuple(row['version'] for row in get_db().execute(
+        'SELECT version FROM table_versions WHERE name IN (?, ?, ?) ORDER BY name', STATS_TABLES).fetchall())
+    return jsonify(stats_cache.get_or_compute(compute_stats, app.config['STATS_CACHE_TTL'], versions))
+
+
+def compute_stats():
+    """Read the trigger-maintained counters; O(1) regardless of table sizes"""
+    cursor = get_db().cursor()
+    cursor.execute('SELECT name, value FROM stat_counters')
+    counters = {row['name']: row['value'] for row in cursor.fetchall()}
+
+    cursor.execute(HOTSPOTS_SQL, (HOTSPOT_TOP_LEVEL,))
+    hotspots = [{'location': row['label'], 'count': row['count'],
+                 'latitude': round(row['latitude'], 6), 'longitude': round(row['longitude'], 6)}
+                for row in cursor.fetchall()]
+
+    return {
+        'total_reports': counters.get('total_reports', 0),
+        'valid_reports': counters.get('valid_reports', 0),
+        'completed_tasks': counters.get('completed_tasks', 0),
+        'volunteers_count': counters.get('volunteers_count', 0),
+        'hotspots': hotspots
+    }
+
+
+def read_bbox_arg():
+    """(west, south, east, north) from ?bbox=, None if absent; raises ValueError if malformed"""
+    raw = request.args.get('bbox', '').strip()
+    if not raw:
+        return None
+    west, south, east, north = (float(part) for part in raw.split(','))
+    if not (-180 <= west <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError('Invalid bbox')
+    return west, south, east, north
+
+
+@app.route('/api/stats/heatmap', methods=['GET'])
+@require_role('moderator', 'admin')
+@versioned('reports')
+def hotspot_heatmap():
+    """GeoJSON heatmap: one point per grid cell holding reports, weighted by ``count``.
+
+    ``?zoom=`` selects the finest HOTSPOT_LEVELS level at or below it (default 12);
+    ``?bbox=west,south,east,north`` limits the area. Reads the trigger-maintained
+    hotspot_cells, so the cost follows the number of cells returned, not of reports.
+    """
+    zoom = request.args.get('zoom', 12, type=int)
+    level = max([level for level in HOTSPOT_LEVELS if level <= zoom], default=HOTSPOT_LEVELS[0])
+    try:
+        bbox = read_bbox_arg()
+    except ValueError:
+        return jsonify({'error': 'bbox must be west,south,east,north in degrees'}), 400
+
+    limit = app.config['HEATMAP_MAX_CELLS']
+    query, params = build_heatmap_query(level, bbox, limit + 1)
+    rows = get_db().execute(query, params).fetchall()
+    cell_deg = hotspot_cell_deg(level)
+    features = [{
+        'type': 'Feature',
+        'bbox': [row['cell_lng'] * cell_deg, row['cell_lat'] * cell_deg,
+                 (row['cell_lng'] + 1) * cell_deg, (row['cell_lat'] + 1) * cell_deg],
+        'geometry': {'type': 'Point', 'coordinates': [round(row['longitude'], 6), round(row['latitude'], 6)]},
+        'properties': {'count': row['count'], 'label': row['label']},
+    } for row in rows[:limit]]
+    response = jsonify({
+        'type': 'FeatureCollection',
+        'zoom': level,
+        'cell_deg': cell_deg,
+        'truncated': len(rows) > limit,
+        'features': features,
+    })
+    response.mimetype = 'application/geo+json'
+    return response
+
+
+# Days covered when ?from is not given
+TIMESERIES_DEFAULT_DAYS = {'hour': 2, 'day': 30}
+
+
+@app.route('/api/stats/timeseries', methods=['GET'])
+@require_role('moderator', 'admin')
+def stats_timeseries():
+    """Activity per hour or day from the rollup tables; cost follows the range, not the table sizes.
+
+    ``?granularity=hour|day`` (default day), ``?from=`` and ``?to=`` (YYYY-MM-DD,
+    inclusive; default the last 30 days, or 2 for hours) and
+    ``?metrics=category,severity,...`` (default all). Counts come back as
+    arrays aligned with ``buckets``; completion times as per-bucket and overall
+    medians in minutes. Events not folded yet by the aggregator are left out;
+    ``pending_since`` is the oldest of them.
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ROLLUP_TABLES:
+        return jsonify({'error': f"granularity must be one of {', '.join(ROLLUP_TABLES)}"}), 400
+    metrics_arg = [name.strip() for name in request.args.get('metrics', '').split(',') if name.strip()]
+    unknown = [name for name in metrics_arg if name not in TIMESERIES_METRICS]
+    if unknown:
+        return jsonify({'error': f"Unknown metrics: {', '.join(unknown)}"}), 400
+    try:
+        date_from, date_to = parse_date_arg('from'), parse_date_arg('to')
+    except ValueError:
+        return jsonify({'error': 'from and to must be YYYY-MM-DD'}), 400
+
+    last_day = datetime.strptime(date_to, '%Y-%m-%d') if date_to \
+        else datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    first_day = datetime.strptime(date_from, '%Y-%m-%d') if date_from \
+        else last_day - timedelta(days=TIMESERIES_DEFAULT_DAYS[granularity] - 1)
+    if first_day > last_day:
+        return jsonify({'error': 'from must not be after to'}), 400
+    days = (last_day - first_day).days + 1
+    max_buckets = app.config['TIMESERIES_MAX_BUCKETS']
+    if days * (24 if granularity == 'hour' else 1) > max_buckets:
+        return jsonify({'error': f'At most {max_buckets} {granularity} buckets per request'}), 400
+    buckets = bucket_range(first_day, last_day + timedelta(days=1, seconds=-1), granularity)
+
+    cursor = get_db().cursor()
+    query, params = build_timeseries_query(granularity, buckets[0], buckets[-1], metrics_arg)
+    index = {bucket: i for i, bucket in enumerate(buckets)}
+    selected = metrics_arg or TIMESERIES_METRICS
+    series = {name: {} for name in selected if name not in COMPLETION_METRICS}
+    histograms = {name: [{} for _ in buckets] for name in selected if name in COMPLETION_METRICS}
+    for bucket, metric, key, count in cursor.execute(query, params).fetchall():
+        if metric in histograms:
+            histograms[metric][index[bucket]][int(key)] = count
+        elif metric in series:
+            series[metric].setdefault(key, [0] * len(buckets))[index[bucket]] = count
+
+    def minutes(seconds):
+        return None if seconds is None else round(seconds / 60, 1)
+
+    completion = {}
+    for metric, per_bucket in histograms.items():
+        overall = Counter()
+        for bins in per_bucket:
+            overall.update(bins)
+        completion[metric] = {
+            'count': [sum(bins.values()) for bins in per_bucket],
+            'median_minutes': [minutes(histogram_median(bins)) for bins in per_bucket],
+            'overall_median_minutes': minutes(histogram_median(overall)),
+        }
+    pending = cursor.execute('SELECT occurred_at FROM rollup_events ORDER BY id LIMIT 1').fetchone()
+    return jsonify({
+        'granularity': granularity,
+        'from': first_day.strftime('%Y-%m-%d'),
+        'to': last_day.strftime('%Y-%m-%d'),
+        'buckets': buckets,
+        'series': series,
+        'completion': completion,
+        'pending_since': pending['occurred_at'] if pending else None,
+    })
+
+
+@app.cli.command('backfill-rewards')
+def backfill_rewards_command():
+    """Rebuild users.completed_count and grant any missing reward tiers."""
+    init_db()
+    conn = get_db()
+    with conn:
+        backfill_rewards(conn.cursor())
+    print('Reward counters rebuilt')
+
+
+def repoint_upload(cursor, old_path, stored):
+    """Point every report and proof photo at ``old_path`` to ``stored`` instead"""
+    register_upload(cursor, stored)
+    cursor.execute('UPDATE reports SET photo_path = ? WHERE photo_path = ?', (stored.path, old_path))
+    cursor.execute('UPDATE proofs SET proof_photo_path = ? WHERE proof_photo_path = ?',
+                   (stored.path, old_path))
+
+
+@app.cli.command('migrate-uploads')
+def migrate_uploads_command():
+    """Move photos saved under the old flat naming into the content-addressed store."""
+    init_db()
     conn = get_db()
+    store = get_upload_store()
     cursor = conn.cursor()
-    
-    # Total reports
-    cursor.execute('SELECT COUNT(*) as count FROM reports')
-    total_reports = cursor.fetchone()['count']
-    
-    # Valid reports
-    cursor.execute("SELECT COUNT(*) as count FROM reports WHERE status != 'invalid'")
-    valid_reports = cursor.fetchone()['count']
-    
-    # Completed tasks
-    cursor.execute("SELECT COUNT(*) as count FROM tasks WHERE status = 'completed'")
-    completed_tasks = cursor.fetchone()['count']
-    
-    # Volunteers count
-    cursor.execute("SELECT COUNT(*) as count FROM users WHERE role = 'volunteer'")
-    volunteers_count = cursor.fetchone()['count']
-    
-    # Area hotspots (group by location_text)
     cursor.execute('''
-        SELECT location_text, COUNT(*) as count
-        FROM reports
-        WHERE status != 'invalid'
-        GROUP BY location_text
-        ORDER BY count DESC
-        LIMIT 10
+        SELECT photo_path AS path FROM reports
+        UNION
+        SELECT proof_photo_path FROM proofs WHERE proof_photo_path IS NOT NULL
     ''')
-    hotspots = [{'location': row['location_text'], 'count': row['count']} 
-                for row in cursor.fetchall()]
-    
-    conn.close()
-    
+    legacy = [row['path'] for row in cursor.fetchall() if not store.is_stored(row['path'])]
+    migrated = 0
+    for old_path in legacy:
+        source = store.abspath(old_path)
+        if not os.path.isfile(source):
+            print(f'missing: {old_path}')
+            continue
+        with open(source, 'rb') as f:
+            try:
+                stored = store.save(f)
+            except UnsupportedUpload:
+                print(f'not an image: {old_path}')
+                continue
+        with conn:
+            repoint_upload(cursor, old_path, stored)
+        # Files in subfolders (uploads/seed/) are checked into the repo; only
+        # old flat uploads are removed once their rows point at the store.
+        if '/' not in old_path[len('uploads/'):]:
+            os.remove(source)
+        migrated += 1
+    print(f'Migrated {migrated} of {len(legacy)} legacy upload paths')
+
+
+@app.cli.command('strip-upload-metadata')
+def strip_upload_metadata_command():
+    """Re-store photos uploaded before metadata stripping, so their EXIF/GPS is no longer served."""
+    init_db()
+    conn = get_db()
+    store = get_upload_store()
+    cursor = conn.cursor()
+    rows = cursor.execute('SELECT sha256, path FROM uploads WHERE refcount > 0').fetchall()
+    rewritten = 0
+    for row in rows:
+        source = store.abspath(row['path'])
+        if not os.path.isfile(source):
+            print(f'missing: {row["path"]}')
+            continue
+        with open(source, 'rb') as f:
+            try:
+                stored = store.save(f)
+            except UnsupportedUpload as exc:
+                print(f'{exc}: {row["path"]}')
+                continue
+        if stored.sha256 == row['sha256']:
+            continue  # nothing was stripped
+        with conn:
+            repoint_upload(cursor, row['path'], stored)
+        if image_pipeline.enabled:
+            image_pipeline.process(store, stored.sha256, stored.path)
+        rewritten += 1
+    print(f'Stripped metadata from {rewritten} of {len(rows)} uploads; '
+          'run gc-uploads to delete the originals')
+
+
+@app.cli.command('process-images')
+def process_images_command():
+    """Render missing thumbnail/medium variants synchronously."""
+    init_db()
+    if not image_pipeline.enabled:
+        print('Pillow is not installed; nothing to do')
+        return
+    rows = get_db().execute('SELECT sha256, path FROM uploads WHERE processed_at IS NULL').fetchall()
+    store = get_upload_store()
+    done = sum(1 for row in rows if image_pipeline.process(store, row['sha256'], row['path']))
+    print(f'Processed {done} of {len(rows)} uploads')
+
+
+@app.cli.command('gc-uploads')
+def gc_uploads_command():
+    """Delete stored files that no report or proof references any more."""
+    init_db()
+    conn = get_db()
+    store = get_upload_store()
+    with conn:
+        rows = conn.execute('SELECT path FROM uploads WHERE refcount <= 0').fetchall()
+        conn.execute('DELETE FROM uploads WHERE refcount <= 0')
+    for row in rows:
+        store.delete(row['path'])
+        for variant in VARIANTS:
+            store.delete(variant_path(row['path'], variant))
+    # Files younger than an hour may belong to a request that has not committed yet
+    known = {row['path'] for row in conn.execute('SELECT path FROM uploads')}
+    cutoff = time.time() - 3600
+    strays = [path for path in store.iter_stored()
+              if path not in known and os.path.getmtime(store.abspath(path)) < cutoff]
+    for path in strays:
+        store.delete(path)
+    print(f'Removed {len(rows)} unreferenced and {len(strays)} unregistered files')
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the /api/stats counters from scratch."""
+    init_db()
+    conn = get_db()
+    with conn:
+        rebuild_stat_counters(conn.cursor())
+        rebuild_hotspot_cells(conn.cursor())
+    stats_cache.invalidate()
+    print('Stats counters rebuilt')
+
+
+@app.cli.command('match-tasks')
+@click.option('--dry-run', is_flag=True, help='Print the plan without assigning anything')
+@click.option('--every', type=float, default=0, help='Keep running, matching every this many seconds')
+def match_tasks_command(dry_run, every):
+    """Assign open tasks to volunteers; run from cron, or with --every as a worker."""
+    init_db()
+    while True:
+        try:
+            summary = run_matching(dry_run)
+            print(f"{'Would assign' if dry_run else 'Assigned'} {summary['assigned']} of "
+                  f"{summary['open_tasks']} open tasks to {summary['volunteers']} volunteers "
+                  f"in {summary['elapsed_ms']:.0f} ms")
+        except sqlite3.OperationalError as e:
+            if every <= 0:
+                raise
+            print(f'Matching skipped: {e}')  # e.g. the database stayed locked; retried next round
+        if every <= 0:
+            return
+        time.sleep(every)
+
+
+@app.cli.command('aggregate-stats')
+@click.option('--every', type=float, default=0, help='Keep running, folding every this many seconds')
+def aggregate_stats_command(every):
+    """Fold queued events into the time-series rollups; with ROLLUP_INTERVAL=0 run this as a worker."""
+    init_db()
+    while True:
+        try:
+            print(f'Folded {aggregate_rollups(get_db())} events into the rollups')
+        except sqlite3.OperationalError as e:
+            if every <= 0:
+                raise
+            print(f'Aggregation skipped: {e}')  # e.g. the database stayed locked; retried next round
+        if every <= 0:
+            return
+        time.sleep(every)
+
+
+def _csv_cell(value):
+    # Keep spreadsheets from evaluating user-supplied text as a formula
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+
+def export_chunks(query, params, fmt):
+    """Yield the export as text chunks, holding EXPORT_FETCH_SIZE rows at a time"""
+    cursor = get_db().execute(query, params)
+    names = [name for name, _ in EXPORT_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(names)
+    while True:
+        rows = cursor.fetchmany(app.config['EXPORT_FETCH_SIZE'])
+        if not rows:
+            break
+        for row in rows:
+            if fmt == 'csv':
+                writer.writerow([_csv_cell(value) for value in row])
+            else:
+                buffer.write(json.dumps(dict(zip(names, row)), separators=(',', ':')) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    cursor.close()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def parse_date_arg(name):
+    """YYYY-MM-DD query argument, '' if absent; raises ValueError if malformed"""
+    value = request.args.get(name, '').strip()
+    if value:
+        datetime.strptime(value, '%Y-%m-%d')
+    return value
+
+
+@app.route('/api/export', methods=['GET'])
+@require_role('admin')
+def export_reports():
+    """Stream reports joined with tasks and proofs as CSV or NDJSON (?gzip=1 to compress)"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    status = request.args.get('status', '').strip()
+    category = sanitize_text(request.args.get('category', '').strip())
+    query, params = build_export_query(date_from, date_to, status, category)
+
+    # stream_with_context keeps the request's connection checked out until the
+    # last row is sent; the single SELECT reads one consistent snapshot
+    chunks = stream_with_context(export_chunks(query, params, fmt))
+    filename = f"greentrack-export-{datetime.now(timezone.utc):%Y%m%d}.{fmt}"
+    if request.args.get('gzip') == '1':
+        chunks = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    else:
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = app.response_class(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/api/sync', methods=['GET'])
+@require_login
+def sync_changes():
+    """Reports, tasks, proofs and rewards changed since ?since=<token>.
+
+    Without a token (or with a stale one) the response starts a full snapshot:
+    ``reset`` is true and the client should drop its local copy. Keep calling with
+    the returned token while ``has_more`` is true.
+    """
+    conn = get_db()
+    try:
+        since, full, epoch = read_sync_token(conn, request.args.get('since', '').strip())
+    except ValueError:
+        return jsonify({'error': 'Invalid sync token'}), 400
+
+    limit = app.config['SYNC_PAGE_SIZE']
+    rows = conn.execute(SYNC_CHANGES_SQL, (since, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changed = {entity: [] for entity in SYNC_TABLES}
+    for row in rows:
+        changed[row['entity']].append(row['entity_id'])
+
+    result = {}
+    for entity, ids in changed.items():
+        upserted = []
+        if ids:
+            query, params = build_sync_query(entity, ids, session['user_role'], session['user_id'])
+            upserted = [with_photo_variants(dict(row)) for row in conn.execute(query, params)]
+        # Deleted, or no longer visible to this user (e.g. a task someone else claimed).
+        # A snapshot starts from nothing, so there is nothing to remove.
+        visible = {item['id'] for item in upserted}
+        removed = [] if full else [entity_id for entity_id in ids if entity_id not in visible]
+        if removed and session['user_role'] not in ('moderator', 'admin'):
+            # Only rows this user could have synced, not every change outside their scope
+            query, params = build_sync_hidden_query(entity, removed, session['user_role'], session['user_id'], since)
+            seen = {row['entity_id'] for row in conn.execute(query, params)}
+            removed = [entity_id for entity_id in removed if entity_id in seen]
+        result[entity] = {'upserted': upserted, 'removed': removed}
+
+    next_seq = rows[-1]['seq'] if rows else since
     return jsonify({
-        'total_reports': total_reports,
-        'valid_reports': valid_reports,
-        'completed_tasks': completed_tasks,
-        'volunteers_count': volunteers_count,
-        'hotspots': hotspots
+        **result,
+        'reset': full and since == 0,
+        'has_more': has_more,
+        'token': encode_sync_token(epoch, next_seq, full and has_more),
     })
 
 
+@app.cli.command('prune-sync')
+@click.option('--days', default=30, show_default=True, help='Keep delete markers this many days')
+def prune_sync_command(days):
+    """Drop old delete markers from the sync change log."""
+    init_db()
+    conn = get_db()
+    with conn:
+        cutoff = conn.execute('''
+            SELECT MAX(seq) FROM change_log
+            WHERE op = 'delete' AND changed_at < datetime('now', ?)
+        ''', (f'-{days} days',)).fetchone()[0]
+        if cutoff is None:
+            print('Nothing to prune')
+            return
+        removed = conn.execute("DELETE FROM change_log WHERE op = 'delete' AND seq <= ?", (cutoff,)).rowcount
+        conn.execute('DELETE FROM sync_hidden WHERE seq <= ?', (cutoff,))
+        # Tokens older than the last dropped marker could miss a delete
+        conn.execute("UPDATE sync_meta SET value = ? WHERE name = 'floor'", (cutoff,))
+    print(f'Pruned {removed} delete markers; tokens before seq {cutoff} now get a full snapshot')
+
+
+@app.route('/api/events', methods=['GET'])
+@require_login
+def event_stream():
+    """Server-Sent Events feed of report/task changes visible to the current user"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        subscriber = event_broker.subscribe(session['user_id'], session['user_role'], last_event_id)
+    except TooManySubscribers:
+        response = jsonify({'error': 'Too many open event streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    response = app.response_class(
+        event_broker.stream(subscriber, app.config['EVENTS_HEARTBEAT']),
+        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx would otherwise hold events back
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of the registry, summed over worker processes when METRICS_DIR is set"""
+    if not app.config['METRICS']:
+        return jsonify({'error': 'Not found'}), 404
+    token = app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Authentication required'}), 401
+    metrics.flush()
+    response = app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
 @app.route('/api/users/volunteers', methods=['GET'])
 @require_role('moderator', 'admin')
+@versioned('users')
 def list_volunteers():
+    page = read_page_args()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit, after = page
+
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT id, name, email
-        FROM users
-        WHERE role = 'volunteer'
-        ORDER BY name
-    ''')
-    volunteers = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(volunteers)
+    query, params = build_volunteers_query(after)
+    rows, next_cursor = fetch_page(cursor, query, params, limit, 'name', 'id')
+    volunteers = [dict(row) for row in rows]
+    return jsonify({'items': volunteers, 'next_cursor': next_cursor})
 
 # Serve uploaded files
+UPLOAD_MAX_AGE = 365 * 24 * 3600
+VARIANT_PENDING_MAX_AGE = 60
+
+_asset_etags = {}
+_asset_etags_lock = threading.Lock()
+
+
+def cacheable(response, immutable):
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def asset_etag(file_path):
+    """SHA-256 of a frontend file, recomputed only when its mtime or size changes"""
+    stat = os.stat(file_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _asset_etags_lock:
+        cached = _asset_etags.get(file_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+    with _asset_etags_lock:
+        _asset_etags[file_path] = (signature, etag)
+    return etag
+
+
+def send_asset(filename):
+    """Serve a frontend file that browsers revalidate on every load (cheap 304s)"""
+    file_path = safe_join(app.static_folder, filename)
+    etag = asset_etag(file_path) if file_path and os.path.isfile(file_path) else True
+    return send_from_directory(app.static_folder, filename, etag=etag, max_age=0)
+
+
+@app.after_request
+def revalidate_static(response):
+    """Give Flask's own static route (which answers first with static_url_path='') the same headers as send_asset"""
+    if request.endpoint != 'static' or response.status_code != 200:
+        return response
+    file_path = safe_join(app.static_folder, request.view_args['filename'])
+    if file_path and os.path.isfile(file_path):
+        response.set_etag(asset_etag(file_path))
+    response.cache_control.no_cache = True
+    response.cache_control.max_age = 0
+    return response.make_conditional(request)
+
+
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    folder = app.config['UPLOAD_FOLDER']
+    # Content-addressed files (and variants rendered from them) never change
+    immutable = get_upload_store().is_stored(f'uploads/{filename}')
+    variant = request.args.get('variant')
+    if variant in VARIANTS:
+        rendered = variant_path(filename, variant)
+        if os.path.isfile(os.path.join(folder, rendered)):
+            return cacheable(send_from_directory(folder, rendered, max_age=UPLOAD_MAX_AGE), immutable)
+        # Not rendered yet (or Pillow unavailable): serve the original briefly
+        return send_from_directory(folder, filename, max_age=VARIANT_PENDING_MAX_AGE)
+    return cacheable(send_from_directory(folder, filename, max_age=UPLOAD_MAX_AGE if immutable else None), immutable)
 
 # Serve frontend files
 @app.route('/')
 def index():
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_asset('index.html')
 
 @app.route('/<path:path>')
 def serve_frontend(path):
     file_path = os.path.join(app.static_folder, path)
     if os.path.isfile(file_path):
-        return send_from_directory(app.static_folder, path)
-    return send_from_directory(app.static_folder, 'index.html')
+        return send_asset(path)
+    return send_asset('index.html')
 
 if __name__ == '__main__':
     # Initialize database
-    init_db()
+    with app.app_context():
+        init_db()
     
     # Run app
     app.run(debug=True, host='0.0.0.0', port=5000)
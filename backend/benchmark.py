@@ -0,0 +1,257 @@
+"""Per-route latency benchmarks against databases seeded at several sizes.
+
+Each size gets its own database, generated once by seed_db.seed_synthetic and
+reused on later runs from --data-dir. Every route is called through the Flask
+test client; the median (p50) latency of each route is what --compare checks
+against a saved baseline.
+
+    python benchmark.py --sizes 10000,100000 --output baseline.json
+    python benchmark.py --sizes 10000,100000 --compare baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+from app import app, init_db, stats_cache
+from load_test import login, make_png, percentile
+from seed_db import HOTSPOTS, SYNTHETIC_EPOCH, seed_synthetic
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+UPLOAD_SLACK_BYTES = 16 * 1024  # room for the multipart envelope under MAX_CONTENT_LENGTH
+
+
+def items(response):
+    return len(response.get_json()['items'])
+
+
+def sync_rows(response):
+    body = response.get_json()
+    return sum(len(body[entity]['upserted']) for entity in ('reports', 'tasks', 'proofs', 'rewards'))
+
+
+def features(response):
+    return len(response.get_json()['features'])
+
+
+def export_rows(response):
+    return max(0, response.get_data().count(b'\n') - 1)  # minus the header line
+
+
+def upload_form(photo):
+    return {
+        'category': 'Litter',
+        'description': 'Benchmark upload',
+        'severity': 'low',
+        'location_text': 'Benchmark Street',
+        'photo': (BytesIO(photo), 'photo.png'),
+    }
+
+
+def near_limit_png():
+    """Largest noise PNG that still fits in one request under MAX_CONTENT_LENGTH"""
+    edge = int(((app.config['MAX_CONTENT_LENGTH'] - UPLOAD_SLACK_BYTES) / 3) ** 0.5)
+    while True:
+        png = make_png(edge, random.Random(edge))
+        if len(png) <= app.config['MAX_CONTENT_LENGTH'] - UPLOAD_SLACK_BYTES:
+            return png
+        edge -= 8
+
+
+def build_routes():
+    """(name, role, method, url, kwargs factory, rows counter, expected status) for every benchmarked call"""
+    _, lat, lng, _ = HOTSPOTS[0]
+    month_start = (SYNTHETIC_EPOCH - timedelta(days=30)).strftime('%Y-%m-%d')
+    month_end = SYNTHETIC_EPOCH.strftime('%Y-%m-%d')
+    photo = near_limit_png()
+    too_big = photo + b'\0' * (2 * UPLOAD_SLACK_BYTES)
+    no_args = dict
+    return [
+        ('rewards', 'citizen', 'GET', '/api/rewards', no_args, None, 200),
+        ('reports/my', 'citizen', 'GET', '/api/reports/my', no_args, items, 200),
+        ('reports/pending', 'moderator', 'GET', '/api/reports/pending', no_args, items, 200),
+        ('reports/pending?near', 'moderator', 'GET', f'/api/reports/pending?lat={lat}&lng={lng}', no_args, items, 200),
+        ('tasks/available', 'volunteer', 'GET', '/api/tasks/available', no_args, items, 200),
+        ('tasks/available?q', 'volunteer', 'GET', '/api/tasks/available?q=plastic', no_args, items, 200),
+        ('tasks/available?near', 'volunteer', 'GET', f'/api/tasks/available?lat={lat}&lng={lng}',
+         no_args, items, 200),
+        ('tasks/my', 'volunteer', 'GET', '/api/tasks/my', no_args, items, 200),
+        ('tasks/manage', 'moderator', 'GET', '/api/tasks/manage', no_args, items, 200),
+        ('tasks/manage?status&category', 'moderator', 'GET', '/api/tasks/manage?status=assigned&category=Litter',
+         no_args, items, 200),
+        ('tasks/manage?q', 'moderator', 'GET', '/api/tasks/manage?q=park', no_args, items, 200),
+        ('stats', 'moderator', 'GET', '/api/stats', no_args, None, 200),
+        ('stats/heatmap', 'moderator', 'GET', '/api/stats/heatmap?zoom=12', no_args, features, 200),
+        ('stats/heatmap?bbox', 'moderator', 'GET',
+         f'/api/stats/heatmap?zoom=16&bbox={lng - 0.05},{lat - 0.05},{lng + 0.05},{lat + 0.05}',
+         no_args, features, 200),
+        ('users/volunteers', 'moderator', 'GET', '/api/users/volunteers', no_args, items, 200),
+        ('sync (first page)', 'volunteer', 'GET', '/api/sync', no_args, sync_rows, 200),
+        ('export (30 days)', 'admin', 'GET', f'/api/export?from={month_start}&to={month_end}',
+         no_args, export_rows, 200),
+        ('upload 5 MB', 'citizen', 'POST', '/api/reports', lambda: {'data': upload_form(photo)}, None, 201),
+        ('upload over limit', 'citizen', 'POST', '/api/reports', lambda: {'data': upload_form(too_big)}, None, 413),
+    ]
+
+
+def prepare_database(data_dir, size):
+    """Path of a database holding at least ``size`` reports, seeding it if needed"""
+    db_path = os.path.join(data_dir, f'reports-{size}.db')
+    app.config['DATABASE'] = db_path
+    count = 0
+    if os.path.exists(db_path):
+        with app.app_context():
+            init_db()
+        conn = sqlite3.connect(db_path)
+        count = conn.execute('SELECT COUNT(*) FROM reports').fetchone()[0]
+        conn.close()
+    if count < size:
+        seed_synthetic(users=max(200, size // 100), reports=size)
+    return db_path
+
+
+def pick_users(db_path):
+    """The busiest account of each role, so per-user routes see the most rows"""
+    conn = sqlite3.connect(db_path)
+    users = {
+        'citizen': conn.execute('SELECT citizen_id FROM reports GROUP BY citizen_id '
+                                'ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0],
+        'volunteer': conn.execute('SELECT assigned_volunteer_id FROM tasks WHERE assigned_volunteer_id IS NOT NULL '
+                                  'GROUP BY assigned_volunteer_id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0],
+        'moderator': conn.execute("SELECT id FROM users WHERE role = 'moderator' LIMIT 1").fetchone()[0],
+    }
+    admin = conn.execute("SELECT id FROM users WHERE role = 'admin' LIMIT 1").fetchone()
+    if admin is None:
+        cursor = conn.execute('''
+            INSERT INTO users (name, email, password_hash, role)
+            VALUES ('Benchmark Admin', 'bench-admin@example.com', 'x', 'admin')
+        ''')
+        conn.commit()
+        admin = (cursor.lastrowid,)
+    users['admin'] = admin[0]
+    conn.close()
+    return users
+
+
+def time_route(client, method, url, kwargs, count_rows, expected, repeat):
+    client.open(url, method=method, **kwargs())  # warm the page cache and the pool
+    samples = []
+    rows = upload_bytes = None
+    for _ in range(repeat):
+        args = kwargs()
+        if 'data' in args:
+            upload_bytes = len(args['data']['photo'][0].getvalue())
+        started = time.perf_counter()
+        response = client.open(url, method=method, **args)
+        body = response.get_data()  # streamed responses do their work here
+        samples.append(time.perf_counter() - started)
+        if response.status_code != expected:
+            raise RuntimeError(f'{method} {url} returned {response.status_code}: {body[:200]!r}')
+        if count_rows is not None:
+            rows = count_rows(response)
+    samples.sort()
+    p50 = percentile(samples, 50)
+    result = {
+        'p50_ms': p50 * 1000,
+        'p90_ms': percentile(samples, 90) * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'min_ms': samples[0] * 1000,
+        'repeat': repeat,
+    }
+    if rows is not None:
+        result['rows'] = rows
+        result['rows_per_second'] = rows / p50 if p50 else 0.0
+    if upload_bytes is not None:
+        result['upload_bytes'] = upload_bytes
+        result['mb_per_second'] = upload_bytes / (1024 * 1024) / p50 if p50 else 0.0
+    return result
+
+
+def run_benchmarks(sizes, repeat, data_dir):
+    os.makedirs(data_dir, exist_ok=True)
+    app.config['UPLOAD_FOLDER'] = os.path.join(data_dir, 'uploads')
+    app.config['STATS_CACHE_TTL'] = 0  # measure the computation, not the cache
+    results = {}
+    for size in sizes:
+        started = time.perf_counter()
+        db_path = prepare_database(data_dir, size)
+        users = pick_users(db_path)
+        clients = {}
+        for role, user_id in users.items():
+            clients[role] = app.test_client()
+            login(clients[role], user_id, role)
+        stats_cache.invalidate()
+
+        results[str(size)] = {}
+        for name, role, method, url, kwargs, count_rows, expected in build_routes():
+            results[str(size)][name] = time_route(clients[role], method, url, kwargs, count_rows, expected, repeat)
+            print(f"{size:>9} {name:<30} p50 {results[str(size)][name]['p50_ms']:>9.2f} ms")
+        print(f'{size:>9} done in {time.perf_counter() - started:.1f}s\n')
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    """Rows of (size, route, base p50, current p50, change); regressions are those over the threshold"""
+    rows, regressions = [], []
+    for size, routes in current['results'].items():
+        for name, result in routes.items():
+            base = baseline['results'].get(size, {}).get(name)
+            if base is None:
+                continue
+            change = result['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+            row = (size, name, base['p50_ms'], result['p50_ms'], change)
+            rows.append(row)
+            # The absolute floor keeps sub-millisecond jitter from failing the run
+            if change > threshold and result['p50_ms'] - base['p50_ms'] > min_delta_ms:
+                regressions.append(row)
+    return rows, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark every API route at several database sizes')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated report counts')
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per route and size')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'greentrack-bench'),
+                        help='where the seeded databases are kept between runs')
+    parser.add_argument('--output', help='write results to this JSON file (e.g. a new baseline)')
+    parser.add_argument('--compare', help='baseline JSON to check the results against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed p50 slowdown, 0.25 = 25%%')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    current = run_benchmarks(sizes, args.repeat, args.data_dir)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(baseline, current, args.threshold, args.min_delta_ms)
+        print(f"\n{'size':>9} {'route':<30} {'base ms':>9} {'now ms':>9} {'change':>8}")
+        for size, name, base_ms, now_ms, change in rows:
+            flag = '  REGRESSION' if (size, name, base_ms, now_ms, change) in regressions else ''
+            print(f'{size:>9} {name:<30} {base_ms:>9.2f} {now_ms:>9.2f} {change:>+8.0%}{flag}')
+        if regressions:
+            print(f'\nFAIL: {len(regressions)} route(s) slower than baseline by more than {args.threshold:.0%}')
+            raise SystemExit(1)
+        print(f'\nOK: no route slower than baseline by more than {args.threshold:.0%}')
@@ -0,0 +1,132 @@
+"""In-process publish/subscribe behind the /api/events Server-Sent Events stream.
+
+Routes publish small change events after they commit; every open stream whose
+user or role is in the event's audience receives it. Events are numbered
+``<epoch>-<seq>`` so a reconnecting client's ``Last-Event-ID`` can be replayed
+from a bounded buffer. If the id is from another process lifetime, or has
+already fallen out of the buffer, the client gets a ``reset`` event and refetches.
+
+Delivery is in-process only: with several worker processes each one has its own
+broker, so run the app as one process with threads when streams are in use.
+"""
+import json
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+Event = namedtuple('Event', ['seq', 'type', 'data', 'roles', 'user_ids'])
+
+
+class TooManySubscribers(Exception):
+    """Raised when the broker already has ``max_subscribers`` open streams"""
+
+
+class Subscriber:
+    def __init__(self, user_id, role, max_queue):
+        self.user_id = user_id
+        self.role = role
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.needs_reset = False
+        # Set when the client falls more than max_queue events behind; its
+        # stream then sends a reset and closes instead of buffering without bound
+        self.overflowed = False
+
+    def wants(self, event):
+        return self.role in event.roles or self.user_id in event.user_ids
+
+    def offer(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+
+class EventBroker:
+    def __init__(self, replay_size=500, max_queue=100, max_subscribers=200):
+        # Distinguishes event ids across restarts, so a stale Last-Event-ID forces a reset
+        self.epoch = format(int(time.time()), 'x')
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._seq = 0
+        self._replay = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data, roles=(), user_ids=()):
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, event_type, data, frozenset(roles), frozenset(user_ids))
+            self._replay.append(event)
+            # Delivered under the lock so every subscriber sees events in seq order
+            for subscriber in self._subscribers:
+                if subscriber.wants(event):
+                    subscriber.offer(event)
+        return event
+
+    def subscribe(self, user_id, role, last_event_id=None):
+        subscriber = Subscriber(user_id, role, self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            missed = self._missed_since(last_event_id)
+            if missed is None:
+                subscriber.needs_reset = True
+            else:
+                for event in missed:
+                    if subscriber.wants(event):
+                        subscriber.offer(event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _missed_since(self, last_event_id):
+        """Buffered events after ``last_event_id``, or None if some may have been lost"""
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._replay[0].seq if self._replay else self._seq + 1
+        if seq < oldest - 1:
+            return None
+        return [event for event in self._replay if event.seq > seq]
+
+    def _format(self, seq, event_type, data):
+        return f'id: {self.epoch}-{seq}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+
+    def _reset(self):
+        # Carries the latest id, so the client's reconnect replays only what follows
+        with self._lock:
+            seq = self._seq
+        return self._format(seq, 'reset', {})
+
+    def stream(self, subscriber, heartbeat=15):
+        """Generator of SSE frames for ``subscriber``; unsubscribes when the client goes away"""
+        try:
+            yield 'retry: 3000\n\n'
+            if subscriber.needs_reset:
+                yield self._reset()
+            while True:
+                if subscriber.overflowed:
+                    yield self._reset()
+                    return
+                try:
+                    event = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment frame: keeps proxies from timing out and surfaces dead clients
+                    yield ': heartbeat\n\n'
+                    continue
+                yield self._format(event.seq, event.type, event.data)
+        finally:
+            self.unsubscribe(subscriber)
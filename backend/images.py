@@ -0,0 +1,96 @@
+"""Background generation of resized, metadata-free variants of uploaded photos.
+
+Variants sit next to the original in the content-addressed store as
+``<sha256>.<variant>.jpg``. Requests never wait on this work: the upload is
+committed first and the job is queued afterwards. Without Pillow installed the
+pipeline does nothing and every variant URL falls back to the original file.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each variant
+VARIANTS = {
+    'thumb': 320,
+    'medium': 1280,
+}
+JPEG_QUALITY = 82
+
+
+def variant_path(path, variant):
+    """``uploads/ab/cd/<sha>.png`` -> ``uploads/ab/cd/<sha>.thumb.jpg``"""
+    base = path.rsplit('.', 1)[0]
+    return f'{base}.{variant}.jpg'
+
+
+def variant_urls(path):
+    """URLs the frontend should use for each variant of a stored photo"""
+    if not path:
+        return None
+    return {variant: f'{path}?variant={variant}' for variant in VARIANTS}
+
+
+def render_variants(store, path):
+    """Write every variant of ``path`` and return its (width, height) after EXIF rotation.
+
+    Variants are re-encoded from pixel data only, so EXIF (including GPS tags)
+    is not carried over.
+    """
+    with Image.open(store.abspath(path)) as original:
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+        if image.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        for variant, edge in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge))
+            target = store.abspath(variant_path(path, variant))
+            tmp_target = target + '.part'
+            resized.save(tmp_target, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+            os.replace(tmp_target, target)
+    return width, height
+
+
+class ImagePipeline:
+    """Bounded worker pool that renders variants and reports back through ``on_done``.
+
+    ``on_done(sha256, width, height)`` runs on the worker thread after the
+    variants are on disk; ``on_error(sha256, exc)`` runs if rendering fails.
+    """
+
+    def __init__(self, workers, on_done, on_error=None):
+        self.enabled = Image is not None and workers > 0
+        self.on_done = on_done
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images') \
+            if self.enabled else None
+
+    def submit(self, store, stored):
+        if not self.enabled:
+            return None
+        return self._executor.submit(self.process, store, stored.sha256, stored.path)
+
+    def process(self, store, sha256, path):
+        try:
+            width, height = render_variants(store, path)
+        except Exception as exc:
+            logger.exception('Could not render variants for %s', path)
+            if self.on_error:
+                self.on_error(sha256, exc)
+            return None
+        self.on_done(sha256, width, height)
+        return width, height
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,209 @@
+"""Streaming readers for bulk report imports from partner feeds.
+
+Rows come from CSV (with a header line) or NDJSON (one JSON object per line) and
+are read one at a time, so file size does not bound memory. Each row names its
+photo either as a member of an attached zip archive or, when allowed, as an
+http(s) URL.
+
+URL fetches only connect to public addresses: every address the host resolves
+to is checked, the connection goes to a checked address (so a second DNS
+answer cannot swap in an internal one), and each redirect is checked again.
+"""
+import csv
+import http.client
+import io
+import ipaddress
+import json
+import socket
+import urllib.error
+import urllib.parse
+import urllib.request
+import zipfile
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+class PhotoUnavailable(ValueError):
+    """Raised when a row's photo cannot be read"""
+
+
+def detect_format(filename, declared=None):
+    """'csv' or 'ndjson' from an explicit choice or the file extension; None if unknown"""
+    if declared:
+        return declared if declared in IMPORT_FORMATS else None
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if ext == 'csv':
+        return 'csv'
+    if ext in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    return None
+
+
+def _as_text(value):
+    # NDJSON may carry numbers and booleans; the form-field helpers expect strings
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def iter_rows(stream, fmt):
+    """Yield (line_number, row, error) for each record; row is None when error is set"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        try:
+            for row in reader:
+                if None in row:
+                    yield reader.line_num, None, 'Too many columns'
+                    continue
+                yield reader.line_num, row, None
+        except csv.Error as exc:
+            yield reader.line_num, None, f'Malformed CSV: {exc}'
+        return
+
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'Malformed JSON'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Expected a JSON object'
+            continue
+        yield line_number, {key: _as_text(value) for key, value in row.items()}, None
+
+
+class _CappedReader:
+    """File-like wrapper that fails once more than ``limit`` bytes have been read"""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.remaining = limit
+
+    def read(self, size=-1):
+        chunk = self.stream.read(size if size and size > 0 else self.remaining + 1)
+        self.remaining -= len(chunk)
+        if self.remaining < 0:
+            raise PhotoUnavailable('Photo is larger than the upload limit')
+        return chunk
+
+    def close(self):
+        self.stream.close()
+
+
+def _public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """socket.create_connection() that refuses private, loopback, link-local and other non-public hosts"""
+    host, port = address
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as exc:
+        raise PhotoUnavailable(f'Could not resolve {host}: {exc}')
+    for *_, sockaddr in infos:
+        ip = ipaddress.ip_address(sockaddr[0].split('%', 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise PhotoUnavailable(f'{host} is not a public address')
+    # Connect to the address just checked rather than resolving the name again
+    return socket.create_connection(infos[0][4][:2], timeout, source_address)
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _HTTPRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not newurl.startswith(('http://', 'https://')):
+            raise PhotoUnavailable('Photo URL redirects outside http(s)')
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def _url_opener():
+    # No proxies: the address checks must apply to the host actually connected to
+    return urllib.request.build_opener(urllib.request.ProxyHandler({}), _PublicHTTPHandler,
+                                       _PublicHTTPSHandler, _HTTPRedirectHandler)
+
+
+class PhotoSource:
+    """Opens the photo a row refers to, capped at ``max_bytes``"""
+
+    def __init__(self, archive=None, allow_urls=False, max_bytes=5 * 1024 * 1024, timeout=10,
+                 allowed_extensions=None):
+        try:
+            self.archive = zipfile.ZipFile(archive) if archive is not None else None
+        except zipfile.BadZipFile:
+            raise ValueError('Photo archive is not a zip file')
+        self.allow_urls = allow_urls
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.allowed_extensions = allowed_extensions
+        self._opener = _url_opener() if allow_urls else None
+
+    def _check_extension(self, name):
+        if self.allowed_extensions is None:
+            return
+        ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+        if ext not in self.allowed_extensions:
+            raise PhotoUnavailable('Photo must be a PNG or JPG file')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.archive is not None:
+            self.archive.close()
+
+    def open(self, ref):
+        """Readable stream for ``ref``; raises PhotoUnavailable"""
+        if not ref:
+            raise PhotoUnavailable('Photo is required')
+        if ref.startswith(('http://', 'https://')):
+            return self._fetch(ref)
+        if self.archive is None:
+            raise PhotoUnavailable('Photo must be a URL when no archive is attached')
+        self._check_extension(ref)
+        try:
+            info = self.archive.getinfo(ref)
+        except KeyError:
+            raise PhotoUnavailable(f'{ref} is not in the archive')
+        if info.file_size > self.max_bytes:
+            raise PhotoUnavailable('Photo is larger than the upload limit')
+        # The declared size can lie; the cap applies to what is actually inflated too
+        return _CappedReader(self.archive.open(info), self.max_bytes)
+
+    def _fetch(self, url):
+        if not self.allow_urls:
+            raise PhotoUnavailable('Photo URLs are disabled')
+        self._check_extension(urllib.parse.urlsplit(url).path)
+        try:
+            with self._opener.open(url, timeout=self.timeout) as response:
+                declared = response.headers.get('Content-Length')
+                if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                    raise PhotoUnavailable('Photo is larger than the upload limit')
+                data = _CappedReader(response, self.max_bytes).read()
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            if isinstance(exc, PhotoUnavailable):
+                raise
+            raise PhotoUnavailable(f'Could not fetch photo: {exc}')
+        return io.BytesIO(data)
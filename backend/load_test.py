@@ -0,0 +1,275 @@
+"""Mixed-workload load test: citizens submit, moderators review, volunteers clean up.
+
+Each worker thread drives its own test clients (one session per role) against the
+app in-process, so the numbers measure the app and SQLite rather than a network
+stack. Without --database a throwaway database is filled by seed_db.seed_synthetic.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import defaultdict
+from io import BytesIO
+
+from app import app, init_db, password_hasher
+from seed_db import CATEGORY_WEIGHTS, HOTSPOTS, seed_synthetic
+
+# Relative frequency of each user journey
+SCENARIO_WEIGHTS = {
+    'citizen_submit': 30,
+    'moderator_review': 20,
+    'volunteer_cleanup': 20,
+    'dashboard_poll': 30,
+}
+OK_STATUSES = (200, 201, 304)
+# Losing a race with another worker is normal: the task was claimed or started meanwhile
+CLAIM_STATUSES = OK_STATUSES + (400, 409)
+# A saturated password hasher sheds logins with 503 by design
+LOGIN_STATUSES = (200, 503)
+
+
+def make_png(edge, rng):
+    """A valid ``edge`` x ``edge`` RGB PNG of noise, so every upload is new content"""
+    raw = b''.join(b'\x00' + rng.randbytes(edge * 3) for _ in range(edge))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', edge, edge, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 1))
+            + chunk(b'IEND', b''))
+
+
+class Recorder:
+    """Latencies and status codes per endpoint label, shared by all workers"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def call(self, label, send, expected=OK_STATUSES):
+        started = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[label].append(elapsed)
+            self.statuses[label][response.status_code] += 1
+            if response.status_code not in expected:
+                self.errors[label] += 1
+        return response
+
+    def summary(self, duration):
+        endpoints = {}
+        for label in sorted(self.latencies):
+            samples = sorted(self.latencies[label])
+            endpoints[label] = {
+                'requests': len(samples),
+                'errors': self.errors[label],
+                'statuses': dict(self.statuses[label]),
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p90_ms': percentile(samples, 90) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+                'max_ms': samples[-1] * 1000,
+            }
+        total = sum(e['requests'] for e in endpoints.values())
+        return {
+            'duration_s': duration,
+            'requests': total,
+            'requests_per_second': total / duration if duration else 0.0,
+            'errors': sum(e['errors'] for e in endpoints.values()),
+            'endpoints': endpoints,
+        }
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(samples) - 1, round(pct / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+def login(client, user_id, role):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['user_name'] = f'Load {role.title()} {user_id}'
+        sess['user_email'] = f'load-{role}{user_id}@example.com'
+        sess['user_role'] = role
+
+
+class Worker:
+    def __init__(self, recorder, users, seed, photo_edge):
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.photo_edge = photo_edge
+        self.clients = {}
+        for role, ids in users.items():
+            client = app.test_client()
+            login(client, self.rng.choice(ids), role)
+            self.clients[role] = client
+
+    def call(self, label, role, method, url, expected=OK_STATUSES, **kwargs):
+        client = self.clients[role]
+        return self.recorder.call(label, lambda: client.open(url, method=method, **kwargs), expected)
+
+    def citizen_submit(self):
+        category = self.rng.choices(list(CATEGORY_WEIGHTS), weights=list(CATEGORY_WEIGHTS.values()))[0]
+        place, lat, lng, _ = self.rng.choice(HOTSPOTS)
+        data = {
+            'category': category,
+            'description': f'{category} spotted near {place}',
+            'severity': self.rng.choice(['low', 'medium', 'high']),
+            'location_text': place,
+            'latitude': str(lat + self.rng.gauss(0, 0.003)),
+            'longitude': str(lng + self.rng.gauss(0, 0.003)),
+            'photo': (BytesIO(make_png(self.photo_edge, self.rng)), 'photo.png'),
+        }
+        self.call('POST /api/reports', 'citizen', 'POST', '/api/reports',
+                  data=data, content_type='multipart/form-data')
+        self.call('GET /api/reports/my', 'citizen', 'GET', '/api/reports/my')
+
+    def moderator_review(self):
+        response = self.call('GET /api/reports/pending', 'moderator', 'GET', '/api/reports/pending?limit=20')
+        items = response.get_json()['items'] if response.status_code == 200 else []
+        if items:
+            report = self.rng.choice(items)
+            self.call('POST /api/reports/<id>/validate', 'moderator', 'POST',
+                      f"/api/reports/{report['id']}/validate",
+                      json={'is_valid': self.rng.random() < 0.85, 'notes': 'Reviewed under load'})
+
+    def volunteer_cleanup(self):
+        place, lat, lng, _ = self.rng.choice(HOTSPOTS)
+        response = self.call('GET /api/tasks/available', 'volunteer', 'GET',
+                             f'/api/tasks/available?limit=20&lat={lat}&lng={lng}')
+        items = response.get_json()['items'] if response.status_code == 200 else []
+        if not items:
+            return
+        task_id = self.rng.choice(items)['task_id']
+        claimed = self.call('POST /api/tasks/<id>/claim', 'volunteer', 'POST', f'/api/tasks/{task_id}/claim',
+                            expected=CLAIM_STATUSES)
+        if claimed.status_code != 200:
+            return
+        self.call('POST /api/tasks/<id>/start', 'volunteer', 'POST', f'/api/tasks/{task_id}/start')
+        self.call('POST /api/tasks/<id>/complete', 'volunteer', 'POST', f'/api/tasks/{task_id}/complete',
+                  data={'notes': 'Cleaned during load test',
+                        'proof_photo': (BytesIO(make_png(self.photo_edge, self.rng)), 'proof.png')},
+                  content_type='multipart/form-data')
+
+    def dashboard_poll(self):
+        role = self.rng.choice(list(self.clients))
+        if role == 'citizen':
+            self.call('GET /api/rewards', role, 'GET', '/api/rewards')
+        elif role == 'volunteer':
+            self.call('GET /api/tasks/my', role, 'GET', '/api/tasks/my')
+        else:
+            self.call('GET /api/stats', role, 'GET', '/api/stats')
+            self.call('GET /api/tasks/manage', role, 'GET', '/api/tasks/manage?status=assigned')
+
+    def login_loop(self, deadline, emails, password):
+        """Sign in over and over, as during a campaign launch"""
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            self.recorder.call('POST /api/login',
+                               lambda: client.post('/api/login', json={'email': self.rng.choice(emails),
+                                                                        'password': password}),
+                               LOGIN_STATUSES)
+
+    def run(self, deadline):
+        names = list(SCENARIO_WEIGHTS)
+        weights = list(SCENARIO_WEIGHTS.values())
+        while time.perf_counter() < deadline:
+            getattr(self, self.rng.choices(names, weights=weights)[0])()
+
+
+def load_users(db_path):
+    conn = sqlite3.connect(db_path)
+    users = {}
+    for role in ('citizen', 'moderator', 'volunteer'):
+        users[role] = [row[0] for row in conn.execute('SELECT id FROM users WHERE role = ? LIMIT 1000', (role,))]
+        if not users[role]:
+            raise SystemExit(f'No {role} accounts in {db_path}; seed it first')
+    conn.close()
+    return users
+
+
+def load_emails(db_path, limit=200):
+    conn = sqlite3.connect(db_path)
+    emails = [row[0] for row in conn.execute("SELECT email FROM users WHERE role = 'citizen' LIMIT ?", (limit,))]
+    conn.close()
+    return emails
+
+
+def run_load(duration=30, workers=8, database=None, users=500, reports=20000, seed=42, photo_edge=128,
+             login_workers=0, password='password123'):
+    """Run the scenario mix for ``duration`` seconds and return the summary dict.
+
+    ``login_workers`` extra threads do nothing but sign in, to find the login
+    throughput ceiling and show what a login storm does to the other routes.
+    """
+    tmp = tempfile.mkdtemp(prefix='greentrack-load-')
+    app.config['UPLOAD_FOLDER'] = os.path.join(tmp, 'uploads')
+    if database:
+        app.config['DATABASE'] = database
+        with app.app_context():
+            init_db()
+    else:
+        app.config['DATABASE'] = os.path.join(tmp, 'load.db')
+        seed_synthetic(users, reports, seed=seed)
+
+    accounts = load_users(app.config['DATABASE'])
+    recorder = Recorder()
+    pool = [Worker(recorder, accounts, seed + i, photo_edge) for i in range(workers)]
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker.run, args=(started + duration,)) for worker in pool]
+    if login_workers:
+        emails = load_emails(app.config['DATABASE'])
+        threads += [threading.Thread(target=Worker(recorder, accounts, seed - i - 1, photo_edge).login_loop,
+                                     args=(started + duration, emails, password))
+                    for i in range(login_workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    password_hasher.shutdown()
+    return recorder.summary(elapsed)
+
+
+def print_summary(summary):
+    print(f"\n{'endpoint':<34} {'reqs':>7} {'errs':>5} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for label, e in summary['endpoints'].items():
+        print(f"{label:<34} {e['requests']:>7} {e['errors']:>5} {e['p50_ms']:>8.1f} {e['p90_ms']:>8.1f} "
+              f"{e['p99_ms']:>8.1f} {e['max_ms']:>8.1f}")
+    print(f"\nRequests: {summary['requests']} in {summary['duration_s']:.1f}s "
+          f"({summary['requests_per_second']:.0f}/s), errors: {summary['errors']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mixed citizen/moderator/volunteer load test')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent simulated users')
+    parser.add_argument('--database', help='existing database to load (default: fresh synthetic one)')
+    parser.add_argument('--users', type=int, default=500, help='synthetic users when seeding')
+    parser.add_argument('--reports', type=int, default=20000, help='synthetic reports when seeding')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--photo-edge', type=int, default=128, help='edge in pixels of uploaded photos')
+    parser.add_argument('--login-workers', type=int, default=0,
+                        help='extra threads that only sign in (compare runs with and without)')
+    parser.add_argument('--password', default='password123', help='password of the accounts used to sign in')
+    parser.add_argument('--json', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    summary = run_load(args.duration, args.workers, args.database, args.users, args.reports,
+                       args.seed, args.photo_edge, args.login_workers, args.password)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if summary['errors']:
+        raise SystemExit(1)
@@ -0,0 +1,210 @@
+"""Batch assignment of open cleanup tasks to volunteers.
+
+Volunteers with spare capacity go into a k-d tree. Each task is offered to
+its nearest volunteers within ``max_distance_km``. The offers are then taken
+greedily, best score first, from a heap with one entry per volunteer, keyed
+by that volunteer's best offer still open. Taking a task raises the
+volunteer's load, which lowers the score of all their other offers at once,
+so an entry is re-scored when it is popped and pushed back if it has fallen
+behind. Scores only ever fall, so the entry on top is always the best offer
+left.
+
+Nothing here touches the database: the caller loads the rows and applies the
+resulting assignments.
+"""
+import heapq
+import math
+from collections import namedtuple
+
+OpenTask = namedtuple('OpenTask', ['task_id', 'report_id', 'lat', 'lng', 'severity', 'age_days'])
+# lat/lng is the volunteer's home area, else their last cleanup, else None
+Volunteer = namedtuple('Volunteer', ['id', 'lat', 'lng', 'load'])
+Assignment = namedtuple('Assignment', ['task_id', 'report_id', 'volunteer_id', 'distance_km', 'score'])
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.radians(EARTH_RADIUS_KM)  # along a meridian
+SEVERITY_SCORES = {'low': 0.0, 'medium': 0.5, 'high': 1.0}
+DEFAULT_WEIGHTS = {'distance': 1.0, 'load': 0.5, 'severity': 0.6, 'age': 0.4}
+LEAF_SIZE = 16  # volunteers per k-d tree leaf
+TILES_PER_RADIUS = 40  # tasks within max_distance_km / 40 of each other share a tree search
+
+
+class _Node:
+    __slots__ = ('south', 'north', 'west', 'east', 'points', 'children')
+
+    def __init__(self, points):
+        lats = [point[0] for point in points]
+        lngs = [point[1] for point in points]
+        self.south, self.north, self.west, self.east = min(lats), max(lats), min(lngs), max(lngs)
+        self.points = points  # leaves only
+        self.children = ()
+
+
+class VolunteerTree:
+    """k-d tree over volunteer coordinates for k-nearest lookups.
+
+    Leaves hold up to LEAF_SIZE volunteers and every node knows its bounding
+    box, so a best-first search opens only the boxes that could still hold a
+    nearer volunteer. Distances are equirectangular, scaled at the query's
+    latitude: within 0.1% of haversine over the few kilometres a match spans,
+    and much cheaper.
+    """
+
+    def __init__(self, volunteers):
+        points = [(volunteer.lat, volunteer.lng, volunteer) for volunteer in volunteers]
+        self.root = self._build(points) if points else None
+        self._tiles = {}
+
+    def _build(self, points):
+        node = _Node(points)
+        if len(points) <= LEAF_SIZE:
+            return node
+        node.points = ()
+        # Split the longer side of the box (longitude shrinks towards the poles)
+        lng_scale = math.cos(math.radians((node.south + node.north) / 2))
+        axis = 0 if node.north - node.south >= (node.east - node.west) * lng_scale else 1
+        points.sort(key=lambda point: point[axis])
+        middle = len(points) // 2
+        node.children = (self._build(points[:middle]), self._build(points[middle:]))
+        return node
+
+    def nearest(self, lat, lng, k, max_km):
+        """Up to ``k`` (distance_km, volunteer) pairs within ``max_km``, nearest first"""
+        if self.root is None:
+            return []
+        km_per_degree_lng = KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-3)
+
+        def box_distance(node):
+            dlat = max(node.south - lat, 0.0, lat - node.north)
+            dlng = max(node.west - lng, 0.0, lng - node.east)
+            return math.hypot(dlng * km_per_degree_lng, dlat * KM_PER_DEGREE)
+
+        found = []  # max-heap of the best k so far: (-distance, id, volunteer)
+        bound = max_km
+        nodes = [(box_distance(self.root), 0, self.root)]
+        counter = 1
+        while nodes:
+            distance, _, node = heapq.heappop(nodes)
+            if distance > bound:
+                break
+            if not node.children:
+                for v_lat, v_lng, volunteer in node.points:
+                    distance = math.hypot((v_lng - lng) * km_per_degree_lng, (v_lat - lat) * KM_PER_DEGREE)
+                    if distance > bound:
+                        continue
+                    if len(found) < k:
+                        heapq.heappush(found, (-distance, volunteer.id, volunteer))
+                    else:
+                        heapq.heapreplace(found, (-distance, volunteer.id, volunteer))
+                    if len(found) == k:
+                        bound = -found[0][0]
+                continue
+            for child in node.children:
+                distance = box_distance(child)
+                if distance <= bound:
+                    heapq.heappush(nodes, (distance, counter, child))
+                    counter += 1
+        return [(-negative, volunteer) for negative, _, volunteer in sorted(found, reverse=True)]
+
+    def nearest_in_tile(self, lat, lng, k, max_km, tile_km):
+        """Like nearest(), with one tree search per ``tile_km`` square shared by every point in it.
+
+        The shared search runs from the tile's centre, keeps twice as many
+        volunteers and reaches a tile width further; each point then takes its
+        own nearest ``k`` from those. Open tasks cluster, so this saves most
+        searches, and the picks can differ from nearest() only among
+        volunteers at nearly the same distance.
+        """
+        tile_deg = tile_km / KM_PER_DEGREE
+        tile = (math.floor(lat / tile_deg), math.floor(lng / tile_deg))
+        shared = self._tiles.get((tile, k, max_km, tile_km))
+        if shared is None:
+            shared = self.nearest((tile[0] + 0.5) * tile_deg, (tile[1] + 0.5) * tile_deg, 2 * k, max_km + tile_km)
+            self._tiles[(tile, k, max_km, tile_km)] = shared
+        km_per_degree_lng = KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-3)
+        found = []
+        for _, volunteer in shared:
+            distance = math.hypot((volunteer.lng - lng) * km_per_degree_lng, (volunteer.lat - lat) * KM_PER_DEGREE)
+            if distance <= max_km:
+                found.append((distance, volunteer.id, volunteer))
+        return [(distance, volunteer) for distance, _, volunteer in heapq.nsmallest(k, found)]
+
+
+def task_priority(task, weights, age_horizon_days):
+    """Severity and waiting time; the part of the score that does not depend on the volunteer"""
+    age = min(max(task.age_days, 0.0) / age_horizon_days, 1.0) if age_horizon_days > 0 else 0.0
+    return weights['severity'] * SEVERITY_SCORES.get(task.severity, 0.0) + weights['age'] * age
+
+
+def match_tasks(tasks, volunteers, max_distance_km=10.0, max_load=3, candidates=8,
+                weights=None, age_horizon_days=14.0, match_unlocated=False):
+    """Assign each task to at most one volunteer; returns a list of Assignment.
+
+    A volunteer ends up with at most ``max_load`` open tasks, counting the ones
+    they already hold. Each task is offered to its ``candidates`` nearest
+    volunteers within ``max_distance_km``. Tasks and volunteers without a
+    location are left out, unless ``match_unlocated`` is set: then the task
+    goes to volunteers with the fewest open tasks instead, scored as if they
+    were ``max_distance_km`` away, so a known nearby volunteer always wins. A
+    task whose candidates all fill up stays open for the next run.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    load = {volunteer.id: volunteer.load for volunteer in volunteers}
+    available = [volunteer for volunteer in volunteers if volunteer.load < max_load]
+    located = [volunteer for volunteer in available if volunteer.lat is not None and volunteer.lng is not None]
+    least_loaded, unlocated = [], []
+    if match_unlocated:
+        least_loaded = heapq.nsmallest(candidates, available, key=lambda volunteer: volunteer.load)
+        unlocated = heapq.nsmallest(candidates, [v for v in available if v.lat is None or v.lng is None],
+                                    key=lambda volunteer: volunteer.load)
+    tree = VolunteerTree(located)
+
+    # Per volunteer, the tasks they were offered as (static score, task index, distance_km).
+    # The static part leaves out the load penalty, which is the same for all of them.
+    offers = {}
+    for index, task in enumerate(tasks):
+        priority = task_priority(task, weights, age_horizon_days)
+        if task.lat is None or task.lng is None:
+            pairs = [(max_distance_km, volunteer) for volunteer in least_loaded]
+        else:
+            pairs = tree.nearest_in_tile(task.lat, task.lng, candidates, max_distance_km,
+                                         max_distance_km / TILES_PER_RADIUS)
+            pairs += [(max_distance_km, volunteer) for volunteer in unlocated]
+        for distance, volunteer in pairs:
+            static = priority - weights['distance'] * distance / max_distance_km
+            offers.setdefault(volunteer.id, []).append((static, index, distance))
+
+    def load_penalty(volunteer_id):
+        return weights['load'] * load[volunteer_id] / max_load
+
+    # One heap entry per volunteer: (-score of their best offer, volunteer id, offer position).
+    # Keys are only ever too optimistic, so a popped entry is re-scored and pushed
+    # back when it has fallen behind.
+    heap = []
+    for volunteer_id, options in offers.items():
+        options.sort(key=lambda option: (-option[0], option[1]))
+        heap.append((load_penalty(volunteer_id) - options[0][0], volunteer_id, 0))
+    heapq.heapify(heap)
+
+    assigned = set()
+    assignments = []
+    while heap and len(assigned) < len(tasks):
+        negative_score, volunteer_id, position = heapq.heappop(heap)
+        options = offers[volunteer_id]
+        while position < len(options) and options[position][1] in assigned:
+            position += 1
+        if position == len(options) or load[volunteer_id] >= max_load:
+            continue
+        static, index, distance = options[position]
+        current = load_penalty(volunteer_id) - static
+        if current > negative_score:
+            # A better offer was taken by someone else, or the volunteer's load went up
+            heapq.heappush(heap, (current, volunteer_id, position))
+            continue
+        task = tasks[index]
+        assigned.add(index)
+        load[volunteer_id] += 1
+        assignments.append(Assignment(task.task_id, task.report_id, volunteer_id,
+                                      round(distance, 3), round(-current, 4)))
+        heapq.heappush(heap, (current, volunteer_id, position + 1))
+    return assignments
@@ -0,0 +1,340 @@
+"""In-process metrics registry rendered in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in memory and are updated under a lock
+per metric. With several worker processes, pass ``directory`` (shared by every
+worker): each process writes a snapshot of its metrics there every few seconds
+and on exit, and whichever process serves the scrape merges all snapshots.
+Counters and histograms are summed, including those from processes that have
+exited, so totals never go backwards. Per-process gauges are summed over live
+processes only. Gauges created with ``shared=True`` describe the database rather
+than a process; they are computed once at scrape time and never written out.
+
+Snapshots are named by pid and process start time, so a worker that reuses
+an old pid never overwrites the totals of the one before it. At scrape time
+the snapshots of exited processes are folded into ``retired.json`` and
+removed, which keeps the directory from growing with every restart.
+"""
+import atexit
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: exited snapshots are then kept, not folded
+    fcntl = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def family(self):
+        """Snapshot as a plain dict: samples maps label-value tuples to values"""
+        with self._lock:
+            samples = {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+        return {'type': self.type, 'help': self.documentation, 'labelnames': self.labelnames, 'samples': samples}
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at collection time by ``function``.
+
+    ``function`` returns a number for an unlabelled gauge, or a dict mapping
+    label-value tuples to numbers.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None, shared=False):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self.shared = shared
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def family(self):
+        if self.function is None:
+            return super().family()
+        value = self.function()
+        samples = value if isinstance(value, dict) else {(): value}
+        return {'type': self.type, 'help': self.documentation, 'labelnames': self.labelnames, 'samples': samples}
+
+
+class Histogram(_Metric):
+    """Per label set: one count per bucket (the last is +Inf), then the sum, then the count"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def family(self):
+        family = super().family()
+        family['buckets'] = self.buckets
+        return family
+
+
+class MetricsRegistry:
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._owner = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), function=None, shared=False):
+        return self._register(Gauge(name, documentation, labelnames, function, shared))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _process_families(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: m.family() for m in metrics if not getattr(m, 'shared', False)}
+
+    def _process_owner(self):
+        """(pid, start time) of this process; a forked child gets its own"""
+        owner = self._owner
+        if owner is None or owner[0] != os.getpid():
+            owner = self._owner = (os.getpid(), time.time_ns())
+        return owner
+
+    def _locked(self, mode):
+        """Open lock file held in ``mode`` (fcntl.LOCK_SH or LOCK_EX) until it is closed"""
+        lock_file = open(os.path.join(self.directory, '.lock'), 'a')
+        if fcntl is not None:
+            fcntl.flock(lock_file, mode)
+        return lock_file
+
+    def flush(self):
+        """Write this process's snapshot for the other workers to merge"""
+        if not self.directory:
+            return
+        pid, started = self._process_owner()
+        path = os.path.join(self.directory, f'metrics-{pid}-{started}.json')
+        _write_json(path, {'pid': pid, 'started': started,
+                           'families': _dump_families(self._process_families())})
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass  # retried on the next tick
+
+    def _read_snapshots(self):
+        """Yield (filename, alive, families) for every other process's snapshot and the retired totals"""
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            snapshot = _read_json(os.path.join(self.directory, filename))
+            if snapshot is not None:
+                snapshots.append((filename, snapshot))
+        # Only the newest process with a given pid can still be running
+        owner = self._process_owner()
+        newest = {owner[0]: owner[1]}
+        for _, snapshot in snapshots:
+            newest[snapshot['pid']] = max(newest.get(snapshot['pid'], 0), snapshot.get('started', 0))
+        for filename, snapshot in snapshots:
+            if (snapshot['pid'], snapshot.get('started', 0)) == owner:
+                continue
+            alive = snapshot.get('started', 0) == newest[snapshot['pid']] and _pid_alive(snapshot['pid'])
+            yield filename, alive, _load_families(snapshot['families'])
+        retired = _read_json(os.path.join(self.directory, 'retired.json'))
+        if retired is not None:
+            yield None, False, _load_families(retired['families'])
+
+    def _retire(self, filenames):
+        """Fold the counters and histograms of exited processes into retired.json, then drop their files"""
+        if fcntl is None:
+            return
+        retired_path = os.path.join(self.directory, 'retired.json')
+        with self._locked(fcntl.LOCK_EX):
+            retired = _read_json(retired_path)
+            totals = _load_families(retired['families']) if retired else {}
+            folded = []
+            for filename in filenames:
+                snapshot = _read_json(os.path.join(self.directory, filename))
+                if snapshot is None:
+                    continue  # retired by another worker meanwhile
+                _merge(totals, _load_families(snapshot['families']), gauges=False)
+                folded.append(filename)
+            if not folded:
+                return
+            _write_json(retired_path, {'families': _dump_families(totals)})
+            for filename in folded:
+                os.remove(os.path.join(self.directory, filename))
+
+    def collect(self):
+        """Every family, merged across processes when a directory is configured"""
+        merged = self._process_families()
+        if self.directory:
+            exited = []
+            # Shared lock: a scrape never sees an exited snapshot both on its own and in retired.json
+            with self._locked(fcntl.LOCK_SH if fcntl else None):
+                for filename, alive, families in self._read_snapshots():
+                    _merge(merged, families, gauges=alive)
+                    if filename is not None and not alive:
+                        exited.append(filename)
+            if exited:
+                self._retire(exited)
+        with self._lock:
+            shared = [m for m in self._metrics.values() if getattr(m, 'shared', False)]
+        for metric in shared:
+            merged[metric.name] = metric.family()
+        return merged
+
+    def render(self):
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {_escape_help(family['help'])}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            labelnames = family['labelnames']
+            for key, value in sorted(family['samples'].items()):
+                labels = list(zip(labelnames, key))
+                if family['type'] != 'histogram':
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                bounds = [_number(bound) for bound in family['buckets']] + ['+Inf']
+                for bound, count in zip(bounds, value[:-2]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', bound)])} {cumulative}")
+                lines.append(f'{name}_sum{_labels(labels)} {_number(value[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(target, families, gauges):
+    """Add ``families`` into ``target`` in place; gauges only if ``gauges`` is true"""
+    for name, family in families.items():
+        if family['type'] == 'gauge' and not gauges:
+            continue
+        merged = target.setdefault(name, {**family, 'samples': {}})
+        for key, value in family['samples'].items():
+            current = merged['samples'].get(key)
+            if current is None:
+                merged['samples'][key] = value
+            elif isinstance(value, list):
+                merged['samples'][key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged['samples'][key] = current + value
+
+
+def _dump_families(families):
+    return {
+        name: {**family, 'labelnames': list(family['labelnames']),
+               'samples': [[list(key), value] for key, value in family['samples'].items()]}
+        for name, family in families.items()
+    }
+
+
+def _load_families(raw):
+    families = {}
+    for name, family in raw.items():
+        family['labelnames'] = tuple(family['labelnames'])
+        family['samples'] = {tuple(key): value for key, value in family['samples']}
+        families[name] = family
+    return families
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # half-written or removed meanwhile
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
@@ -0,0 +1,90 @@
+"""Password hashing and verification off the request threads.
+
+Werkzeug's KDFs are deliberately slow and CPU-bound, so a burst of logins run
+inline would hold every worker thread. PasswordHasher runs them in a small
+process pool and admits at most ``max_pending`` jobs (queued plus running).
+Past that it raises HasherBusy at once, and the route answers 503 instead of
+queueing without bound.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when ``max_pending`` hash jobs are already queued or running"""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+    """Bounded process pool for ``generate_password_hash``/``check_password_hash``.
+
+    ``method`` is a Werkzeug method string such as ``scrypt:32768:8:1`` or
+    ``pbkdf2:sha256:600000``. With ``workers`` set to 0 the work runs inline
+    on the calling thread, but the admission limit still applies.
+    """
+
+    def __init__(self, method, workers, max_pending):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._prefix = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the parent has threads (pool, image workers) that fork would copy mid-state
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise HasherBusy()
+            self.pending += 1
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            try:
+                return self._pool().submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool and retry once
+                with self._lock:
+                    self._executor = None
+                return self._pool().submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(_verify, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if ``pwhash`` was made with other parameters than the configured method"""
+        if self._prefix is None:
+            # Werkzeug expands short names ("scrypt") to their full parameters; learn the
+            # expanded form once from a throwaway hash rather than hard-coding its defaults
+            self._prefix = generate_password_hash('', method=self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
@@ -0,0 +1,55 @@
+"""Perceptual hashes of report photos, for spotting the same scene reported twice.
+
+dhash() shrinks a photo to 9x8 grey pixels and keeps one bit per pair of
+horizontal neighbours: whether brightness rises or falls between them.
+Re-encoding, resizing and mild colour changes flip few of the 64 bits, so
+near-duplicates are a small Hamming distance apart.
+
+To find them without comparing against every report, the hash is cut into
+BANDS bands that are indexed separately (multi-index hashing). Two hashes at
+most BANDS - 1 bits apart must agree exactly on at least one band, so one
+exact lookup per band finds all of them.
+
+Hashes are stored as signed 64-bit integers, the range SQLite can hold.
+Without Pillow installed, dhash() returns None and no duplicates are looked
+up.
+"""
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional
+    Image = None
+
+HASH_SIZE = 8  # 8 x 8 = 64 bits
+BANDS = 4
+BAND_BITS = HASH_SIZE * HASH_SIZE // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+HASH_MASK = (1 << HASH_SIZE * HASH_SIZE) - 1
+
+
+def dhash(path):
+    """Difference hash of the image at ``path``; None without Pillow or if it cannot be decoded"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as image:
+            # JPEGs decode straight at 1/8 scale or less, which makes hashing a phone photo cheap
+            image.draft('L', (HASH_SIZE * 16, HASH_SIZE * 16))
+            grey = ImageOps.exif_transpose(image).convert('L')
+            pixels = grey.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX).tobytes()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    value = 0
+    for row in range(HASH_SIZE):
+        start = row * (HASH_SIZE + 1)
+        for col in range(start, start + HASH_SIZE):
+            value = value << 1 | (pixels[col + 1] > pixels[col])
+    return value - (1 << 64) if value >> 63 else value
+
+
+def hash_bands(value):
+    """The BANDS band values of a hash, lowest bits first (as the SQL triggers cut them)"""
+    return [(value >> (band * BAND_BITS)) & BAND_MASK for band in range(BANDS)]
+
+
+def hamming(a, b):
+    return bin((a ^ b) & HASH_MASK).count('1')
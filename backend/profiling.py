@@ -0,0 +1,208 @@
+"""Opt-in per-request profiling: wall time, SQL statement timings and cProfile samples.
+
+With profiling on, database connections are opened as ProfiledConnection.
+Their cursors time each statement, including the fetches that actually step
+it, into the RequestProfile of the request running on that thread. Named
+spans (``with span('hash'):``) time other costs such as password hashing,
+upload I/O and JSON serialization. With profiling off, no profile is active,
+the plain connection class is used and ``span`` returns at once.
+"""
+import contextvars
+import cProfile
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+_current = contextvars.ContextVar('greentrack_profile', default=None)
+_WHITESPACE = re.compile(r'\s+')
+PARAM_REPR_LIMIT = 200
+# Parameters of statements mentioning these are not logged
+SENSITIVE_COLUMNS = ('password_hash',)
+
+
+class RequestProfile:
+    """Timings gathered while one request runs"""
+
+    def __init__(self, max_statements=200):
+        self.started = time.perf_counter()
+        self.max_statements = max_statements
+        # [sql, parameters, seconds]; only the first max_statements are kept
+        self.statements = []
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.spans = {}
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def add_statement(self, sql, parameters):
+        self.query_count += 1
+        entry = [sql, parameters, 0.0]
+        if len(self.statements) < self.max_statements:
+            self.statements.append(entry)
+        return entry
+
+    def add_sql_time(self, entry, seconds):
+        entry[2] += seconds
+        self.sql_seconds += seconds
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        """Value for the Server-Timing header; ``app`` is whatever no other entry accounts for"""
+        total = self.elapsed()
+        parts = [f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.query_count} queries"']
+        parts += [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.spans.items()]
+        other = max(0.0, total - self.sql_seconds - sum(self.spans.values()))
+        parts.append(f'app;dur={other * 1000:.2f}')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+    def format_statements(self):
+        lines = []
+        for sql, parameters, seconds in self.statements:
+            params = '<redacted>' if any(column in sql for column in SENSITIVE_COLUMNS) else repr(parameters)
+            if len(params) > PARAM_REPR_LIMIT:
+                params = params[:PARAM_REPR_LIMIT] + '...'
+            lines.append(f'  {seconds * 1000:8.2f} ms  {_WHITESPACE.sub(" ", sql).strip()}  {params}')
+        if self.query_count > len(self.statements):
+            lines.append(f'  ... {self.query_count - len(self.statements)} more statements not recorded')
+        return '\n'.join(lines)
+
+
+def activate(profile):
+    """Make ``profile`` the one statements and spans on this thread are recorded into"""
+    return _current.set(profile)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the current profile under ``name``"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, time.perf_counter() - started)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that charges execute and fetch time to the statement it last ran"""
+
+    _entry = None
+
+    def _timed(self, call, *args):
+        profile = _current.get()
+        if profile is None or self._entry is None:
+            return call(*args)
+        started = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            profile.add_sql_time(self._entry, time.perf_counter() - started)
+
+    def _run(self, call, sql, parameters, recorded):
+        profile = _current.get()
+        if profile is None:
+            self._entry = None
+            return call(sql, parameters)
+        self._entry = profile.add_statement(sql, recorded)
+        return self._timed(call, sql, parameters)
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        recorded = f'<{len(seq_of_parameters)} parameter sets>'
+        return self._run(super().executemany, sql, seq_of_parameters, recorded)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors, including those behind conn.execute, are ProfiledCursor"""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ProfiledJSONProvider(DefaultJSONProvider):
+    """Times jsonify() as the ``json`` span"""
+
+    def response(self, *args, **kwargs):
+        with span('json'):
+            return super().response(*args, **kwargs)
+
+
+class ProfileSampler:
+    """Runs cProfile on a random ``rate`` share of requests and dumps .prof files to ``directory``.
+
+    Only one capture runs at a time; requests sampled while another is running
+    are skipped rather than queued.
+    """
+
+    def __init__(self, directory, rate):
+        self.directory = directory
+        self.rate = rate
+        self._busy = threading.Lock()
+        self._counter = 0
+
+    def start(self):
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler is already active on this interpreter
+            self._busy.release()
+            return None
+        return profiler
+
+    def stop(self, profiler, name):
+        """Stop ``profiler`` and write its stats; returns the file path"""
+        try:
+            profiler.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            self._counter += 1
+            safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name or 'request')
+            path = os.path.join(self.directory,
+                                f'{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{self._counter}-{safe_name}.prof')
+            profiler.dump_stats(path)
+            return path
+        finally:
+            self._busy.release()
@@ -0,0 +1,126 @@
+"""Hourly and daily rollups of report and task activity, read by /api/stats/timeseries.
+
+Triggers append one row per event (a report filed, a status change, a task
+completed) to a queue table in the same transaction as the write. A
+RollupAggregator thread folds the queue every ``interval`` seconds into
+counts per (bucket, metric, key). A time-series query then reads only the
+buckets in its range, however large reports and tasks grow.
+
+Medians cannot be added up across buckets, so completion times are kept as
+histograms with BINS_PER_DOUBLING log-spaced bins. The median of any range
+is then estimated from the merged bins, to within about 4%.
+
+This module holds the bucketing and histogram arithmetic and the thread. The
+SQL is in app.py.
+"""
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Bucket key format and step per granularity; keys sort in time order as text
+GRANULARITIES = {
+    'hour': ('%Y-%m-%d %H:00', timedelta(hours=1)),
+    'day': ('%Y-%m-%d', timedelta(days=1)),
+}
+BINS_PER_DOUBLING = 8
+FIRST_BIN_SECONDS = 60  # bin 0 holds everything under a minute
+
+
+def bucket_key(timestamp, granularity):
+    """'2024-05-01 13:45:10' -> '2024-05-01 13:00' (hour) or '2024-05-01' (day)"""
+    timestamp = timestamp.replace('T', ' ')
+    return timestamp[:13] + ':00' if granularity == 'hour' else timestamp[:10]
+
+
+def bucket_range(start, end, granularity):
+    """Every bucket key from the one holding datetime ``start`` to the one holding ``end``"""
+    key_format, step = GRANULARITIES[granularity]
+    moment = datetime.strptime(start.strftime(key_format), key_format)
+    keys = []
+    while moment <= end:
+        keys.append(moment.strftime(key_format))
+        moment += step
+    return keys
+
+
+def duration_bin(seconds):
+    if seconds < FIRST_BIN_SECONDS:
+        return 0
+    return 1 + int(BINS_PER_DOUBLING * math.log2(seconds / FIRST_BIN_SECONDS))
+
+
+def bin_bounds(index):
+    """(low, high) seconds covered by histogram bin ``index``"""
+    if index == 0:
+        return 0.0, float(FIRST_BIN_SECONDS)
+    return (FIRST_BIN_SECONDS * 2 ** ((index - 1) / BINS_PER_DOUBLING),
+            FIRST_BIN_SECONDS * 2 ** (index / BINS_PER_DOUBLING))
+
+
+def histogram_median(bins):
+    """Median in seconds of a {bin index: count} histogram, None if it is empty.
+
+    Interpolates geometrically inside the bin holding the middle value, which
+    suits the log-spaced bins.
+    """
+    total = sum(bins.values())
+    if not total:
+        return None
+    half = total / 2
+    seen = 0
+    for index in sorted(bins):
+        count = bins[index]
+        if seen + count >= half:
+            low, high = bin_bounds(index)
+            fraction = (half - seen) / count
+            if low == 0:
+                return high * fraction
+            return low * (high / low) ** fraction
+        seen += count
+    return bin_bounds(max(bins))[1]
+
+
+class RollupAggregator:
+    """Calls ``aggregate()`` on a daemon thread every ``interval`` seconds.
+
+    ``aggregate`` folds whatever is queued and returns how many events it
+    folded. Errors such as a locked database or a schema that is not migrated
+    yet are logged and retried on the next tick.
+    """
+
+    def __init__(self, interval, aggregate):
+        self.interval = interval
+        self.aggregate = aggregate
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the thread unless it runs already in this process (a forked child has none)"""
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self.interval <= 0 or self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='rollups', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.aggregate()
+            except Exception:
+                logger.exception('Rollup aggregation failed; retrying in %s s', self.interval)
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            thread, self._thread, self._pid = self._thread, None, None
+        if thread is not None:
+            thread.join()
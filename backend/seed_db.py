@@ -1,18 +1,52 @@
+import argparse
+import random
 import sqlite3
-import os
+import time
+from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
+from app import app, init_db, aggregate_rollups, backfill_rewards, ROLLUP_TABLES
+
+# Synthetic data (seed_synthetic). Weights are rough shares of real traffic.
+ROLE_WEIGHTS = {'citizen': 85, 'volunteer': 12, 'moderator': 3}
+STATUS_WEIGHTS = {'pending': 15, 'invalid': 5, 'valid': 25, 'assigned': 10, 'in_progress': 10, 'completed': 35}
+CATEGORY_WEIGHTS = {'Litter': 40, 'Plastic Waste': 28, 'Illegal Dumping': 15, 'Organic Waste': 12, 'Hazardous Waste': 5}
+SEVERITY_WEIGHTS = {'low': 45, 'medium': 40, 'high': 15}
+# (name, lat, lng, weight): most reports cluster around these, the rest land anywhere in the city
+HOTSPOTS = [
+    ('Central Park', 40.785091, -73.968285, 20),
+    ('Times Square', 40.758000, -73.985500, 15),
+    ('Riverside Walk', 40.748817, -73.968428, 10),
+    ('Market Square', 40.750500, -73.993400, 10),
+    ('Brooklyn Bridge Park', 40.700300, -73.996900, 12),
+    ('Harlem 125th Street', 40.809000, -73.948000, 8),
+    ('Queens Plaza', 40.749800, -73.937300, 8),
+    ('Coney Island Boardwalk', 40.572400, -73.979200, 7),
+]
+CITY_BOUNDS = (40.55, -74.05, 40.90, -73.75)  # min lat, min lng, max lat, max lng
+HOTSPOT_SPREAD_DEG = 0.006  # ~600 m standard deviation
+BACKGROUND_SHARE = 0.1
+SEED_PHOTOS = [f'uploads/seed/report{i}.png' for i in range(1, 6)]
+SYNTHETIC_EPOCH = datetime(2025, 1, 1)  # fixed, so a given seed always yields the same rows
 
 def seed_database():
     """Seed database with sample data"""
-    db_path = os.path.join(os.path.dirname(__file__), 'database.db')
+    with app.app_context():
+        init_db()
+    db_path = app.config['DATABASE']
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     # Clear existing data (optional - comment out if you want to keep existing data)
+    cursor.execute('DELETE FROM rewards')
     cursor.execute('DELETE FROM proofs')
     cursor.execute('DELETE FROM tasks')
     cursor.execute('DELETE FROM reports')
     cursor.execute('DELETE FROM users')
+    # Rollups and import keys describe the rows just deleted; the rollups are refolded below
+    cursor.execute('DELETE FROM rollup_events')
+    for table in ROLLUP_TABLES.values():
+        cursor.execute(f'DELETE FROM {table}')
+    cursor.execute('DELETE FROM import_keys')
     
     # Create sample users
     users = [
@@ -76,8 +110,12 @@ def seed_database():
         INSERT INTO proofs (task_id, volunteer_id, proof_photo_path, notes)
         VALUES (?, ?, ?, ?)
     ''', (task_ids[4], user_ids[3], 'uploads/seed/proof1.png', 'Cleanup completed successfully. All waste removed and area sanitized.'))
+
+    # Seeded reports skip complete_task, so derive completed_count/rewards from them
+    backfill_rewards(cursor)
     
     conn.commit()
+    aggregate_rollups(conn)  # fold the rollup events the inserts queued
     conn.close()
     print("Database seeded successfully!")
     print("\nTest Credentials:")
@@ -87,6 +125,113 @@ def seed_database():
     print("Volunteer 1: volunteer1@example.com / password123")
     print("Volunteer 2: volunteer2@example.com / password123")
 
-if __name__ == '__main__':
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def _location(rng):
+    if rng.random() < BACKGROUND_SHARE:
+        min_lat, min_lng, max_lat, max_lng = CITY_BOUNDS
+        return 'Street corner', rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)
+    name, lat, lng, _ = rng.choices(HOTSPOTS, weights=[h[3] for h in HOTSPOTS])[0]
+    return name, rng.gauss(lat, HOTSPOT_SPREAD_DEG), rng.gauss(lng, HOTSPOT_SPREAD_DEG)
+
+def _insert_batches(conn, sql, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        conn.executemany(sql, rows[start:start + batch_size])
+        conn.commit()
+
+def seed_synthetic(users=1000, reports=10000, days=365, seed=42, batch_size=20000):
+    """Add a large, repeatable data set on top of the demo accounts.
+
+    Synthetic users all log in with password123. Tasks follow each report's
+    status, completed tasks get a proof and rewards are derived afterwards, so
+    the counters kept by triggers stay consistent.
+    """
     seed_database()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    conn = sqlite3.connect(app.config['DATABASE'])
+    cursor = conn.cursor()
+
+    # One shared hash: hashing per user would dominate the run
+    password_hash = generate_password_hash('password123')
+    roles = [_weighted(rng, ROLE_WEIGHTS) for _ in range(users)]
+    cursor.executemany('''
+        INSERT INTO users (name, email, password_hash, role)
+        VALUES (?, ?, ?, ?)
+    ''', [(f'Synthetic {role.title()} {i}', f'{role}{i}@synthetic.example', password_hash, role)
+          for i, role in enumerate(roles)])
+    conn.commit()
+    rows = cursor.execute("SELECT id, role FROM users WHERE email LIKE '%@synthetic.example' ORDER BY id").fetchall()
+    citizens = [user_id for user_id, role in rows if role == 'citizen'] or [1]
+    volunteers = [user_id for user_id, role in rows if role == 'volunteer'] or [4]
+
+    # Heavy-tailed: a few citizens file most of the reports
+    citizen_ids = rng.choices(citizens, weights=[rng.paretovariate(1.2) for _ in citizens], k=reports)
+    next_report_id = (cursor.execute('SELECT MAX(id) FROM reports').fetchone()[0] or 0) + 1
+    next_task_id = (cursor.execute('SELECT MAX(id) FROM tasks').fetchone()[0] or 0) + 1
+    report_rows, task_rows, proof_rows = [], [], []
+    for i in range(reports):
+        report_id, task_id = next_report_id + i, next_task_id + i
+        status = _weighted(rng, STATUS_WEIGHTS)
+        category = _weighted(rng, CATEGORY_WEIGHTS)
+        place, lat, lng = _location(rng)
+        created = SYNTHETIC_EPOCH - timedelta(days=days * rng.random() ** 1.5)  # skewed towards recent
+        report_rows.append((report_id, citizen_ids[i], category, f'{category} near {place} (synthetic #{i})',
+                            _weighted(rng, SEVERITY_WEIGHTS), place, round(lat, 6), round(lng, 6),
+                            SEED_PHOTOS[i % len(SEED_PHOTOS)], status, 1 if rng.random() < 0.1 else 0,
+                            _timestamp(created), _timestamp(created)))
+
+        volunteer_id = assigned_at = completed_at = None
+        task_status = 'pending'
+        if status in ('assigned', 'in_progress', 'completed'):
+            task_status = status
+            volunteer_id = rng.choice(volunteers)
+            assigned = created + timedelta(hours=rng.uniform(1, 72))
+            assigned_at = _timestamp(assigned)
+            if status == 'completed':
+                completed_at = _timestamp(assigned + timedelta(hours=rng.uniform(1, 48)))
+                proof_rows.append((task_id, volunteer_id, SEED_PHOTOS[(i + 2) % len(SEED_PHOTOS)],
+                                   'Area cleaned up.', completed_at))
+        task_rows.append((task_id, report_id, volunteer_id, task_status, assigned_at, completed_at))
+
+    _insert_batches(conn, '''
+        INSERT INTO reports (id, citizen_id, category, description, severity, location_text,
+                             latitude, longitude, photo_path, status, is_anonymous, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', report_rows, batch_size)
+    _insert_batches(conn, '''
+        INSERT INTO tasks (id, report_id, assigned_volunteer_id, status, assigned_at, completed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', task_rows, batch_size)
+    _insert_batches(conn, '''
+        INSERT INTO proofs (task_id, volunteer_id, proof_photo_path, notes, uploaded_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', proof_rows, batch_size)
+
+    backfill_rewards(cursor)
+    conn.commit()
+    aggregate_rollups(conn)  # fold the rollup events the inserts queued
+    cursor.execute('ANALYZE')  # planner statistics as a database this size would have them
+    conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"\nSynthetic data: {users} users, {reports} reports with tasks, {len(proof_rows)} proofs "
+          f"in {elapsed:.1f}s ({reports / elapsed:.0f} reports/s)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Seed the database with demo data, optionally at scale')
+    parser.add_argument('--synthetic', action='store_true', help='also generate users and reports')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--reports', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365, help='how far back report dates are spread')
+    parser.add_argument('--seed', type=int, default=42, help='same seed, same data')
+    args = parser.parse_args()
 
+    if args.synthetic:
+        seed_synthetic(args.users, args.reports, args.days, args.seed)
+    else:
+        seed_database()
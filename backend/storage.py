@@ -0,0 +1,222 @@
+"""Content-addressed storage for uploaded photos.
+
+Files live at ``<root>/<ab>/<cd>/<sha256>.<ext>`` so identical bytes are stored
+once and no single directory grows without bound. Reference counts are kept in
+the database (see the ``uploads`` table in app.py), not here.
+
+Originals are served publicly, so EXIF, XMP, IPTC and text metadata (GPS
+positions included) are cut out before hashing. Only the marker segments or
+chunks that carry metadata are dropped; pixel data is copied as-is, and a
+JPEG's EXIF orientation is kept so the photo still displays upright.
+"""
+import hashlib
+import os
+import re
+import struct
+import tempfile
+from collections import namedtuple
+
+CHUNK_SIZE = 64 * 1024
+
+# Magic bytes -> canonical extension. The extension is derived from content, not
+# the client's filename, so the same bytes always map to the same path.
+IMAGE_SIGNATURES = {
+    b'\x89PNG\r\n\x1a\n': 'png',
+    b'\xff\xd8\xff': 'jpg',
+}
+
+SHARDED_PATH = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z]+$')
+
+StoredFile = namedtuple('StoredFile', ['sha256', 'path', 'size'])
+
+
+# JPEG segments kept ahead of the scan data: JFIF (APP0), ICC profiles (APP2)
+# and Adobe colour transforms (APP14) are needed to decode correctly. Other
+# APPn segments and comments are metadata.
+JPEG_KEPT_APP_MARKERS = {0xE0, 0xE2, 0xEE}
+JPEG_SOS = 0xDA
+JPEG_COM = 0xFE
+EXIF_ORIENTATION = 0x0112
+# PNG chunks that carry metadata rather than pixels
+PNG_METADATA_CHUNKS = {b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+
+
+class UnsupportedUpload(ValueError):
+    """Raised when the uploaded bytes are not a PNG or JPEG image"""
+
+
+def sniff_extension(head):
+    for signature, ext in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise UnsupportedUpload('Image is truncated')
+    return data
+
+
+def exif_orientation(payload):
+    """Orientation tag (1-8) from an APP1 Exif payload; 1 if absent or unreadable"""
+    if not payload.startswith(b'Exif\x00\x00'):
+        return 1
+    tiff = payload[6:]
+    order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if order is None:
+        return 1
+    try:
+        offset = struct.unpack(order + 'I', tiff[4:8])[0]
+        count = struct.unpack(order + 'H', tiff[offset:offset + 2])[0]
+        for entry in range(offset + 2, offset + 2 + 12 * count, 12):
+            tag, kind = struct.unpack(order + 'HH', tiff[entry:entry + 4])
+            if tag == EXIF_ORIENTATION and kind == 3:
+                value = struct.unpack(order + 'H', tiff[entry + 8:entry + 10])[0]
+                return value if 1 <= value <= 8 else 1
+    except struct.error:
+        pass
+    return 1
+
+
+def orientation_segment(orientation):
+    """APP1 segment holding an Exif block with nothing but the orientation tag"""
+    payload = (b'Exif\x00\x00MM\x00\x2a' + struct.pack('>I', 8)
+               + struct.pack('>HHHIHH', 1, EXIF_ORIENTATION, 3, 1, orientation, 0) + struct.pack('>I', 0))
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+def strip_jpeg(stream, chunk_size=CHUNK_SIZE):
+    """Yield the JPEG in ``stream`` without metadata segments"""
+    yield _read_exact(stream, 2)  # SOI
+    while True:
+        marker = _read_exact(stream, 2)
+        while marker[1] == 0xFF:  # fill bytes before a marker
+            marker = marker[1:] + _read_exact(stream, 1)
+        if marker[0] != 0xFF:
+            raise UnsupportedUpload('Malformed JPEG')
+        code = marker[1]
+        if code == JPEG_SOS:
+            # Entropy-coded data and everything after it is copied unchanged
+            yield marker
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                yield chunk
+            return
+        length = _read_exact(stream, 2)
+        payload = _read_exact(stream, struct.unpack('>H', length)[0] - 2)
+        if code == 0xE1:
+            orientation = exif_orientation(payload)
+            if orientation != 1:
+                yield orientation_segment(orientation)
+        elif code == JPEG_COM or (0xE0 <= code <= 0xEF and code not in JPEG_KEPT_APP_MARKERS):
+            continue
+        else:
+            yield marker + length + payload
+
+
+def strip_png(stream):
+    """Yield the PNG in ``stream`` without metadata chunks"""
+    yield _read_exact(stream, 8)  # signature
+    while True:
+        header = stream.read(8)
+        if len(header) != 8:
+            return
+        length, kind = struct.unpack('>I4s', header)
+        body = stream.read(length + 4)  # data and CRC
+        if len(body) != length + 4:
+            return  # a cut-off trailing chunk is dropped, whatever it held
+        if kind not in PNG_METADATA_CHUNKS:
+            yield header + body
+        if kind == b'IEND':
+            return
+
+
+METADATA_STRIPPERS = {
+    'jpg': strip_jpeg,
+    'png': strip_png,
+}
+
+
+class UploadStore:
+    def __init__(self, root, url_prefix='uploads', chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.chunk_size = chunk_size
+
+    def relpath(self, sha256, ext):
+        return f'{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}'
+
+    def abspath(self, path):
+        """Filesystem path for a stored ``uploads/...`` path"""
+        prefix = self.url_prefix + '/'
+        rel = path[len(prefix):] if path.startswith(prefix) else path
+        return os.path.join(self.root, *rel.split('/'))
+
+    def is_stored(self, path):
+        prefix = self.url_prefix + '/'
+        return path.startswith(prefix) and bool(SHARDED_PATH.match(path[len(prefix):]))
+
+    def save(self, stream):
+        """Copy ``stream`` to disk in chunks, strip its metadata while hashing it, then move it into place.
+
+        Returns a StoredFile whose ``path`` is what gets stored in the database.
+        """
+        tmp_dir = os.path.join(self.root, '.tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, raw_path = tempfile.mkstemp(dir=tmp_dir)
+        tmp_path = raw_path + '.stripped'
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if len(head) < 16:
+                        head += chunk[:16 - len(head)]
+                    out.write(chunk)
+
+            ext = sniff_extension(head)
+            if ext is None:
+                raise UnsupportedUpload('Only JPG or PNG images are accepted')
+
+            with open(raw_path, 'rb') as raw, open(tmp_path, 'wb') as out:
+                for chunk in METADATA_STRIPPERS[ext](raw):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            os.remove(raw_path)
+
+            sha256 = digest.hexdigest()
+            rel = self.relpath(sha256, ext)
+            final_path = os.path.join(self.root, *rel.split('/'))
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            for leftover in (raw_path, tmp_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+
+        return StoredFile(sha256, f'{self.url_prefix}/{rel}', size)
+
+    def delete(self, path):
+        try:
+            os.remove(self.abspath(path))
+        except FileNotFoundError:
+            pass
+
+    def iter_stored(self):
+        """Yield the ``uploads/...`` path of every file in the sharded layout"""
+        for dirpath, _, filenames in os.walk(self.root):
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, '/')
+            for filename in filenames:
+                rel = f'{rel_dir}/{filename}'
+                if SHARDED_PATH.match(rel):
+                    yield f'{self.url_prefix}/{rel}'
@@ -0,0 +1,100 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from app import app, init_db
+
+
+def prepare_database(db_path, tasks, volunteers):
+    """Create a throwaway database with open tasks and volunteer accounts"""
+    app.config['DATABASE'] = db_path
+    with app.app_context():
+        init_db()
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO users (name, email, password_hash, role)
+        VALUES ('Stress Citizen', 'stress-citizen@example.com', 'x', 'citizen')
+    ''')
+    citizen_id = cursor.lastrowid
+    cursor.executemany('''
+        INSERT INTO users (name, email, password_hash, role)
+        VALUES (?, ?, 'x', 'volunteer')
+    ''', [(f'Stress Volunteer {i}', f'stress-volunteer{i}@example.com') for i in range(volunteers)])
+    volunteer_ids = [row[0] for row in cursor.execute("SELECT id FROM users WHERE role = 'volunteer' ORDER BY id")]
+
+    task_ids = []
+    for i in range(tasks):
+        cursor.execute('''
+            INSERT INTO reports (citizen_id, category, description, severity, location_text, photo_path, status)
+            VALUES (?, 'Litter', ?, 'low', 'Stress Street', 'uploads/seed/report1.png', 'valid')
+        ''', (citizen_id, f'Stress report {i}'))
+        cursor.execute("INSERT INTO tasks (report_id, status) VALUES (?, 'pending')", (cursor.lastrowid,))
+        task_ids.append(cursor.lastrowid)
+    conn.commit()
+    conn.close()
+    return volunteer_ids, task_ids
+
+
+def run_stress(tasks=200, volunteers=16):
+    """Every volunteer thread tries to claim every task at the same time.
+
+    Returns (winners per task, claims/s, statuses seen).
+    """
+    tmp = tempfile.mkdtemp(prefix='greentrack-stress-')
+    volunteer_ids, task_ids = prepare_database(os.path.join(tmp, 'stress.db'), tasks, volunteers)
+
+    winners = Counter()
+    statuses = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(volunteer_ids))
+
+    def worker(volunteer_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = volunteer_id
+            sess['user_name'] = f'Volunteer {volunteer_id}'
+            sess['user_email'] = f'volunteer{volunteer_id}@example.com'
+            sess['user_role'] = 'volunteer'
+        barrier.wait()
+        for task_id in task_ids:
+            response = client.post(f'/api/tasks/{task_id}/claim')
+            with lock:
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    winners[task_id] += 1
+
+    threads = [threading.Thread(target=worker, args=(vid,)) for vid in volunteer_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    attempts = sum(statuses.values())
+    return winners, task_ids, attempts / elapsed, statuses
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent claim stress test for /api/tasks/<id>/claim')
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--volunteers', type=int, default=16)
+    args = parser.parse_args()
+
+    winners, task_ids, throughput, statuses = run_stress(args.tasks, args.volunteers)
+    double_claims = [task_id for task_id in task_ids if winners[task_id] > 1]
+    unclaimed = [task_id for task_id in task_ids if winners[task_id] == 0]
+
+    print(f'Claim attempts/s: {throughput:.0f}')
+    print(f'Responses: {dict(statuses)}')
+    print(f'Tasks with exactly one winner: {len(task_ids) - len(double_claims) - len(unclaimed)}/{len(task_ids)}')
+    if double_claims or unclaimed:
+        print(f'FAIL: double-claimed {double_claims[:10]}, unclaimed {unclaimed[:10]}')
+        raise SystemExit(1)
+    print('OK: every task has exactly one winner')
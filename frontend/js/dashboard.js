@@ -9,7 +9,10 @@ const state = {
         status: '',
         category: '',
         q: ''
-    }
+    },
+    lists: {},
+    near: null,
+    live: false
 };
 
 const accessMatrix = {
@@ -94,7 +97,7 @@ const renderReports = (reports = []) => {
                 <p><strong>Location:</strong> ${escapeHtml(report.location_text)}</p>
                 <p><strong>Severity:</strong> ${escapeHtml(report.severity)}</p>
                 ${report.moderator_notes ? `<p><strong>Moderator Notes:</strong> ${escapeHtml(report.moderator_notes)}</p>` : ''}
-                ${report.photo_path ? `<img src="../${report.photo_path}" class="photo-thumb" alt="Report photo">` : ''}
+                ${report.photo_path ? `<img src="../${photoUrl(report.photo_path, report.photo_variants, 'thumb')}" class="photo-thumb" alt="Report photo" loading="lazy">` : ''}
             </div>
         `)
         .join('');
@@ -199,8 +202,8 @@ const renderTaskList = (tasks = [], selector, type = 'available') => {
             const rawStatus = task.task_status || task.status || '';
             const status = rawStatus.toLowerCase();
             const statusLabel = rawStatus.replace('_', ' ');
-            const reportPhoto = task.photo_path;
-            const proofPhoto = task.proof_photo_path;
+            const reportPhoto = task.photo_path && photoUrl(task.photo_path, task.photo_variants, 'thumb');
+            const proofPhoto = task.proof_photo_path && photoUrl(task.proof_photo_path, task.proof_photo_variants, 'thumb');
 
             const actions = type === 'available'
                 ? `<button class="btn btn-secondary" data-task-id="${task.task_id}" data-action="claim">Claim Task</button>`
@@ -223,9 +226,10 @@ const renderTaskList = (tasks = [], selector, type = 'available') => {
                 </div>
                 <p>${escapeHtml(task.description)}</p>
                 <p><strong>Location:</strong> ${escapeHtml(task.location_text)}</p>
+                ${task.distance_km != null ? `<p><strong>Distance:</strong> ${task.distance_km.toFixed(1)} km</p>` : ''}
                 <p><strong>Severity:</strong> ${escapeHtml(task.severity || 'n/a')}</p>
-                ${reportPhoto ? `<p style="margin-top:0.5rem;font-size:0.85rem;color:var(--muted);">Report photo:</p><img src="../${reportPhoto}" class="photo-thumb" alt="Report photo">` : ''}
-                ${proofPhoto ? `<p style="margin-top:0.5rem;font-size:0.85rem;color:var(--muted);">Proof photo:</p><img src="../${proofPhoto}" class="photo-thumb" alt="Proof photo">` : ''}
+                ${reportPhoto ? `<p style="margin-top:0.5rem;font-size:0.85rem;color:var(--muted);">Report photo:</p><img src="../${reportPhoto}" class="photo-thumb" alt="Report photo" loading="lazy">` : ''}
+                ${proofPhoto ? `<p style="margin-top:0.5rem;font-size:0.85rem;color:var(--muted);">Proof photo:</p><img src="../${proofPhoto}" class="photo-thumb" alt="Proof photo" loading="lazy">` : ''}
                 ${actions}
             </div>
         `;
@@ -249,7 +253,7 @@ const renderPendingReports = (reports = []) => {
                     <h4>${escapeHtml(report.category)}</h4>
                     <span class="badge">${escapeHtml(report.severity)}</span>
                 </div>
-                ${report.photo_path ? `<img src="../${report.photo_path}" alt="Evidence" style="width:100%;height:220px;object-fit:cover;border-radius:12px;margin:1rem 0;">` : ''}
+                ${report.photo_path ? `<img src="../${photoUrl(report.photo_path, report.photo_variants, 'medium')}" alt="Evidence" loading="lazy" style="width:100%;height:220px;object-fit:cover;border-radius:12px;margin:1rem 0;">` : ''}
                 <p>${escapeHtml(report.description)}</p>
                 <p><strong>Report ID:</strong> #${report.id}</p>
                 <p><strong>Location:</strong> ${escapeHtml(report.location_text)}</p>
@@ -357,7 +361,7 @@ const handleTaskAction = async (taskId, action) => {
                     body: formData
                 });
                 setAlert('Task marked as completed!', 'success');
-                refreshDataByRole();
+                refreshUnlessLive();
             };
             input.click();
             return;
@@ -370,7 +374,7 @@ const handleTaskAction = async (taskId, action) => {
 
         await fetchWithAuth(endpoints[action], { method: 'POST' });
         setAlert(`Task ${action === 'start' ? 'progress updated' : 'claimed'} successfully.`, 'success');
-        refreshDataByRole();
+        refreshUnlessLive();
     } catch (error) {
         setAlert(error.message, 'error');
     }
@@ -411,7 +415,7 @@ const setupModeratorActions = () => {
                         assignField.value = reportId;
                     }
                 }
-                refreshDataByRole();
+                refreshUnlessLive();
             } catch (error) {
                 setAlert(error.message, 'error');
             }
@@ -437,7 +441,7 @@ const setupModeratorActions = () => {
                 setAlert('Task assigned successfully.', 'success');
                 assignForm.reset();
                 populateVolunteerSelect();
-                refreshDataByRole();
+                refreshUnlessLive();
             } catch (error) {
                 setAlert(error.message, 'error');
             }
@@ -478,25 +482,88 @@ const setupReportForm = () => {
         formData.append('photo', photo);
 
         try {
-            await fetchWithAuth('/api/reports', { method: 'POST', body: formData });
-            setAlert('Report submitted successfully.', 'success');
+            const result = await fetchWithAuth('/api/reports', { method: 'POST', body: formData });
+            setAlert(result.duplicate_of
+                ? `Report submitted. It looks like report #${result.duplicate_of}; a moderator will check both.`
+                : 'Report submitted successfully.', 'success');
             form.reset();
-            refreshDataByRole();
+            refreshUnlessLive();
         } catch (error) {
             setAlert(error.message, 'error');
         }
     });
 };
 
-const loadCitizenData = () => fetchWithAuth('/api/reports/my').then(renderReports).catch(() => {});
+// Resized, metadata-free variant when the server offers one; the route falls back to the original
+const photoUrl = (path, variants, size) => (variants && variants[size]) || path;
+
+const withCursor = (url, cursor) =>
+    cursor ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}` : url;
+
+const renderLoadMore = containerId => {
+    const container = document.getElementById(containerId);
+    if (!container) return;
+    const list = state.lists[containerId];
+    let button = document.getElementById(`${containerId}-more`);
+    if (!button) {
+        button = document.createElement('button');
+        button.id = `${containerId}-more`;
+        button.className = 'btn btn-outline';
+        button.style.marginTop = '1rem';
+        button.textContent = 'Load more';
+        button.addEventListener('click', () => loadPage(containerId, { append: true }).catch(() => {}));
+        container.insertAdjacentElement('afterend', button);
+    }
+    button.hidden = !list || !list.next;
+};
+
+// Lists are fetched a page at a time; "Load more" appends the next page using the
+// server's next_cursor instead of re-downloading everything.
+const loadPage = async (containerId, { url, render, append = false } = {}) => {
+    const list = state.lists[containerId] || { items: [], next: null };
+    if (url) list.url = url;
+    if (render) list.render = render;
+    const page = await fetchWithAuth(append ? withCursor(list.url, list.next) : list.url);
+    list.items = append ? list.items.concat(page.items) : page.items;
+    list.next = page.next_cursor;
+    state.lists[containerId] = list;
+    list.render(list.items);
+    renderLoadMore(containerId);
+    return list.items;
+};
+
+const loadCitizenData = () => loadPage('my-reports', { url: '/api/reports/my', render: renderReports }).catch(() => {});
 const loadRewards = () => fetchWithAuth('/api/rewards').then(renderRewards).catch(() => {});
-const loadAvailableTasks = () => fetchWithAuth(`/api/tasks/available?q=${encodeURIComponent(document.getElementById('available-search')?.value || '')}`).then(data => renderTaskList(data, '#available-tasks', 'available')).catch(() => {});
-const loadMyTasks = () => fetchWithAuth('/api/tasks/my').then(data => renderTaskList(data, '#my-tasks', 'mine')).catch(() => {});
-const loadPendingReports = () => fetchWithAuth('/api/reports/pending').then(renderPendingReports).catch(() => {});
-const loadVolunteers = () => fetchWithAuth('/api/users/volunteers').then(list => { state.volunteers = list; populateVolunteerSelect(); });
+const availableTasksUrl = () => {
+    const query = new URLSearchParams({ q: document.getElementById('available-search')?.value || '' });
+    if (state.near) {
+        query.set('lat', state.near.lat);
+        query.set('lng', state.near.lng);
+        query.set('radius_km', 5);
+    }
+    return `/api/tasks/available?${query.toString()}`;
+};
+const loadAvailableTasks = () => loadPage('available-tasks', {
+    url: availableTasksUrl(),
+    render: data => renderTaskList(data, '#available-tasks', 'available')
+}).catch(() => {});
+const loadMyTasks = () => loadPage('my-tasks', { url: '/api/tasks/my', render: data => renderTaskList(data, '#my-tasks', 'mine') }).catch(() => {});
+const loadPendingReports = () => loadPage('pending-reports', { url: '/api/reports/pending', render: renderPendingReports }).catch(() => {});
+const loadVolunteers = async () => {
+    // The assignment dropdown needs every volunteer, so walk all pages.
+    let volunteers = [];
+    let cursor = null;
+    do {
+        const page = await fetchWithAuth(withCursor('/api/users/volunteers?limit=100', cursor));
+        volunteers = volunteers.concat(page.items);
+        cursor = page.next_cursor;
+    } while (cursor);
+    state.volunteers = volunteers;
+    populateVolunteerSelect();
+};
 const loadGlobalTasks = () => {
     const query = new URLSearchParams(state.filters);
-    return fetchWithAuth(`/api/tasks/manage?${query.toString()}`).then(renderGlobalTasks).catch(() => {});
+    return loadPage('global-tasks', { url: `/api/tasks/manage?${query.toString()}`, render: renderGlobalTasks }).catch(() => {});
 };
 const loadAnalytics = () => fetchWithAuth('/api/stats').then(renderAnalytics).catch(() => {});
 
@@ -515,6 +582,111 @@ const refreshDataByRole = () => {
     }
 };
 
+// After our own actions the change comes back over /api/events, so only refetch
+// when the stream is down.
+const refreshUnlessLive = () => {
+    if (!state.live) refreshDataByRole();
+};
+
+// How each list reacts to a pushed report/task state: keep it if it still belongs,
+// drop it if not. Lists narrowed by full-text search or location are simply
+// reloaded, since matching those needs the server.
+const listRules = {
+    'my-reports': {
+        key: 'id',
+        matches: item => item.citizen_id === state.user.id
+    },
+    'pending-reports': {
+        key: 'id',
+        // Like the server listing, leave likely duplicates out of the default queue
+        matches: item => item.status === 'pending' && !item.duplicate_of
+    },
+    'available-tasks': {
+        key: 'task_id',
+        filtered: () => Boolean(state.near || document.getElementById('available-search')?.value),
+        matches: item => item.status === 'valid' && item.task_status === 'pending' && !item.assigned_volunteer_id
+    },
+    'my-tasks': {
+        key: 'task_id',
+        matches: item => Boolean(item.task_id) && item.assigned_volunteer_id === state.user.id
+    },
+    'global-tasks': {
+        key: 'task_id',
+        filtered: () => Boolean(state.filters.q),
+        matches: item => Boolean(item.task_id)
+            && (!state.filters.status || item.task_status === state.filters.status)
+            && (!state.filters.category || item.category === state.filters.category),
+        shape: item => ({ ...item, status: item.task_status })
+    }
+};
+
+let analyticsTimer;
+
+// A bare { task_id, removed } means the task is no longer open to us; the assignee's own copy follows it
+const volunteerTaskLists = ['available-tasks', 'my-tasks'];
+
+const applyChange = item => {
+    if (item.removed) {
+        volunteerTaskLists.forEach(containerId => {
+            const list = state.lists[containerId];
+            const index = list ? list.items.findIndex(existing => existing.task_id === item.task_id) : -1;
+            if (index >= 0) {
+                list.items.splice(index, 1);
+                list.render(list.items);
+            }
+        });
+        return;
+    }
+    Object.entries(listRules).forEach(([containerId, rule]) => {
+        const list = state.lists[containerId];
+        if (!list) return;
+        if (rule.filtered && rule.filtered()) {
+            loadPage(containerId).catch(() => {});
+            return;
+        }
+        const index = list.items.findIndex(existing => existing[rule.key] === item[rule.key]);
+        if (rule.matches(item)) {
+            const entry = rule.shape ? rule.shape(item) : item;
+            if (index >= 0) {
+                list.items[index] = { ...list.items[index], ...entry };
+            } else {
+                list.items.unshift(entry);
+            }
+        } else if (index >= 0) {
+            list.items.splice(index, 1);
+        } else {
+            return;
+        }
+        list.render(list.items);
+    });
+
+    if (item.task_status === 'completed' && item.citizen_id === state.user.id) {
+        loadRewards();
+    }
+    if (['moderator', 'admin'].includes(state.user.role)) {
+        // Counters move with every change; one refetch per burst is enough
+        clearTimeout(analyticsTimer);
+        analyticsTimer = setTimeout(loadAnalytics, 2000);
+    }
+};
+
+const connectEvents = () => {
+    if (!window.EventSource) return;
+    const source = new EventSource(`${API_BASE}/api/events`, { withCredentials: true });
+    source.addEventListener('open', () => {
+        state.live = true;
+    });
+    source.addEventListener('error', () => {
+        // EventSource reconnects by itself and resumes from the last event id
+        state.live = false;
+    });
+    ['report.created', 'report.updated', 'task.updated'].forEach(type => {
+        source.addEventListener(type, event => applyChange(JSON.parse(event.data).item));
+    });
+    // Sent when events were missed (server restart, or we fell too far behind)
+    source.addEventListener('reset', () => refreshDataByRole());
+};
+
 const handleTabChange = role => {
     if (!state.user) return;
     const allowed = accessMatrix[state.user.role] || ['citizen'];
@@ -552,6 +724,33 @@ const initSearchDebounce = () => {
     });
 };
 
+const initNearMe = () => {
+    const toggle = document.getElementById('available-near');
+    if (!toggle) return;
+    toggle.addEventListener('change', () => {
+        if (!toggle.checked) {
+            state.near = null;
+            loadAvailableTasks();
+            return;
+        }
+        if (!navigator.geolocation) {
+            toggle.checked = false;
+            setAlert('Location is not available in this browser.', 'error');
+            return;
+        }
+        navigator.geolocation.getCurrentPosition(
+            position => {
+                state.near = { lat: position.coords.latitude, lng: position.coords.longitude };
+                loadAvailableTasks();
+            },
+            () => {
+                toggle.checked = false;
+                setAlert('Could not read your location.', 'error');
+            }
+        );
+    });
+};
+
 const initDashboard = async () => {
     try {
         setupLogout();
@@ -560,12 +759,14 @@ const initDashboard = async () => {
         setupReportForm();
         initTabs();
         initSearchDebounce();
+        initNearMe();
 
         const user = await fetchWithAuth('/api/me');
         state.user = user;
         document.getElementById('user-info').textContent = `${user.name} (${user.role})`;
 
         handleTabChange(defaultTabs[user.role] || 'citizen');
+        connectEvents();
         refreshDataByRole();
     } catch (error) {
         window.location.href = 'auth.html';